@@ -0,0 +1,179 @@
+"""
+Library backups for GxLauncher
+Streams backup files one record at a time in both directions
+"""
+
+import json
+import os
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from core.record import to_json
+from core.storage import LibraryReader
+
+# Called with (done, total), returning False cancels the operation
+ProgressCallback = Callable[[int, int], bool]
+
+class ImportReport:
+    """Outcome of a library import, with per-record problems"""
+    
+    def __init__(self):
+        self.added = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.cancelled = False
+        self.failed = False
+        # (record number in the file, counting from 1, message)
+        self.errors: List[Tuple[int, str]] = []
+        self.warnings: List[Tuple[int, str]] = []
+    
+    @property
+    def ok(self) -> bool:
+        return not self.cancelled and not self.failed
+    
+    @property
+    def skipped(self) -> int:
+        return len(self.errors)
+    
+    def summary(self) -> str:
+        return (f"{self.added} adicionados, {self.updated} atualizados, "
+                f"{self.unchanged} sem alterações, {self.skipped} ignorados")
+
+
+class ImportCancelled(Exception):
+    """Raised inside an import to roll it back when progress asks to stop"""
+
+
+def write_backup(path: str, games: List[Dict[str, Any]],
+                 progress: Optional[ProgressCallback] = None, step: int = 500) -> bool:
+    """Write games as a JSON array, one record at a time
+    
+    The output is byte-for-byte what json.dump(games, indent=4) writes.
+    It goes to a temporary file first, so a cancelled or failed backup
+    never replaces an existing one.
+    """
+    total = len(games)
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            if not games:
+                f.write("[]")
+            else:
+                f.write("[\n")
+                for i, game in enumerate(games, start=1):
+                    text = json.dumps(game, indent=4, ensure_ascii=False, default=to_json)
+                    f.write("    " + text.replace("\n", "\n    "))
+                    f.write(",\n" if i < total else "\n]")
+                    if progress is not None and i % step == 0 and not progress(i, total):
+                        raise ImportCancelled()
+        os.replace(tmp_path, path)
+    except ImportCancelled:
+        _remove(tmp_path)
+        return False
+    except (IOError, OSError, TypeError, ValueError) as e:
+        print(f"Error exporting library: {e}")
+        _remove(tmp_path)
+        return False
+    
+    if progress is not None:
+        progress(total, total)
+    return True
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def iter_backup(path: str, chunk_size: int = 1 << 20) -> Iterator[Tuple[Any, int, int]]:
+    """Parse a backup lazily, yielding (record, bytes read, file size)
+    
+    Plain arrays and games.json files (with their schema header) are both
+    accepted. Raises json.JSONDecodeError on malformed files and IOError
+    when the file cannot be read.
+    """
+    return iter(LibraryReader(path, chunk_size))
+
+
+def check_record(game: Dict[str, Any]) -> List[str]:
+    """Check that a record's executable and cover exist, returning warnings"""
+    warnings = []
+    path = game.get("path", "")
+    if not os.path.exists(path):
+        warnings.append(f"executável não encontrado: {path}")
+    cover = game.get("cover", "")
+    if cover and not os.path.exists(cover):
+        warnings.append(f"capa não encontrada: {cover}")
+    return warnings
+
+
+def check_records(games: List[Dict[str, Any]]) -> List[List[str]]:
+    """check_record() over a slice of records, one worker pool task per slice"""
+    return [check_record(game) for game in games]
+
+
+def record_error(game: Any) -> Optional[str]:
+    """Describe why an imported record cannot be used, None if it can"""
+    if not isinstance(game, dict):
+        return "registro não é um objeto"
+    path = game.get("path")
+    if not isinstance(path, str) or not path:
+        return "registro sem caminho"
+    tags = game.get("tags") or []
+    if not isinstance(tags, list) or not all(isinstance(t, str) for t in tags):
+        return "tags inválidas"
+    for field in ("playtime", "last_played", "added"):
+        value = game.get(field) or 0
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            return f"{field} inválido"
+    return None
+
+
+def merge_record(existing: Dict[str, Any], incoming: Dict[str, Any]) -> Dict[str, Any]:
+    """Get the updates that fold a backup record into the library one
+    
+    Counters keep the larger value, the earliest added date wins,
+    favorites and tags are combined and empty text fields are filled in.
+    Id and path always stay as they are in the library.
+    """
+    updates: Dict[str, Any] = {}
+    for field in ("playtime", "last_played"):
+        value = incoming.get(field, 0) or 0
+        if value > (existing.get(field, 0) or 0):
+            updates[field] = value
+    added = incoming.get("added", 0) or 0
+    if added and added < (existing.get("added", 0) or added + 1):
+        updates["added"] = added
+    if incoming.get("favorite") and not existing.get("favorite"):
+        updates["favorite"] = True
+    
+    tags = list(existing.get("tags", []) or [])
+    known = {t.casefold() for t in tags}
+    for tag in incoming.get("tags", []) or []:
+        if tag.casefold() not in known:
+            known.add(tag.casefold())
+            tags.append(tag)
+    if len(tags) != len(existing.get("tags", []) or []):
+        updates["tags"] = tags
+    
+    for field, value in incoming.items():
+        if field in ("id", "path") or field in updates:
+            continue
+        if value and not existing.get(field) and isinstance(value, str):
+            updates[field] = value
+        elif field not in existing:
+            updates[field] = value
+    return updates
+
+
+def iter_batches(records: Iterable[Tuple[Any, int, int]],
+                 size: int) -> Iterator[List[Tuple[Any, int, int]]]:
+    """Group iter_backup() output into lists of size items"""
+    batch = []
+    for item in records:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
\ No newline at end of file
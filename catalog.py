@@ -0,0 +1,235 @@
+"""
+Shared game catalog for GxLauncher
+Mounts a read-only library published on a network share
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from typing import List, Dict, Optional, Any, Callable
+from core.record import COLD_FIELDS, SCHEMA_VERSION, migrate_records
+from core.storage import StorageBackend, LibraryReader, Change, atomic_dump, library_document
+from core.shards import SHARD_FIELD
+from core.utils import normalize_path
+
+_MISSING = object()
+
+class CatalogStorage(StorageBackend):
+    """A catalog on a share, read through a local copy, with a per-machine overlay
+    
+    The share holds games.json, the covers it points to and optionally a
+    version file. A background thread compares that stamp (else the size
+    and mtime of games.json) with the cached one every REFRESH_SECONDS
+    and copies the catalog and its covers to cache_dir only when it
+    changed. Loading reads the local copy, so a slow or missing share
+    never holds anything up. The share is never written: overlay.json
+    keeps what this machine changed, the fields that differ per game
+    (playtime, favorites...), the games removed and the games added here.
+    Catalog ids are namespaced with ID_PREFIX so they stay apart from the
+    main library's; a game the library still had to rename keeps its new
+    id in the overlay like any other edited field.
+    """
+    
+    CATALOG_FILE = "games.json"
+    VERSION_FILE = "version"
+    REFRESH_SECONDS = 60
+    ID_PREFIX = "cat-"
+    
+    def __init__(self, share: str, cache_dir: str):
+        self.share = share
+        self.cache_dir = cache_dir
+        self.path = os.path.join(cache_dir, self.CATALOG_FILE)
+        self.overlay_path = os.path.join(cache_dir, "overlay.json")
+        self._stamp_path = os.path.join(cache_dir, "stamp")
+        self._lock = threading.Lock()
+        # Stamps of the cached copy and of the copy last loaded; compared
+        # directly since the library may restat the files after a refresh
+        self._copied = self._cached_stamp()
+        self._loaded: Optional[str] = None
+        # Catalog records by id as of the last load, the overlay is relative to them
+        self._catalog: Dict[str, Dict[str, Any]] = {}
+        # Why the share could not be read, "" while it can
+        self.error = ""
+        # Called from the refresh thread while a new copy waits to be loaded
+        self.on_refresh: Optional[Callable[[], Any]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        os.makedirs(cache_dir, exist_ok=True)
+    
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+    
+    def source_files(self) -> List[str]:
+        return [self.path, self.overlay_path]
+    
+    def stale(self) -> bool:
+        return self._copied != self._loaded
+    
+    def _stamp(self) -> str:
+        """Read the catalog's version stamp from the share"""
+        version = os.path.join(self.share, self.VERSION_FILE)
+        if os.path.exists(version):
+            with open(version, 'r', encoding='utf-8') as f:
+                return f.read().strip()
+        stat = os.stat(os.path.join(self.share, self.CATALOG_FILE))
+        return f"{stat.st_mtime_ns}:{stat.st_size}"
+    
+    def _cached_stamp(self) -> Optional[str]:
+        try:
+            with open(self._stamp_path, 'r', encoding='utf-8') as f:
+                return f.read().strip()
+        except IOError:
+            return None
+    
+    def refresh(self) -> bool:
+        """Copy the catalog to the local cache if its stamp changed, True if it did"""
+        try:
+            stamp = self._stamp()
+            if stamp == self._copied and os.path.exists(self.path):
+                self.error = ""
+                return False
+            games = [game for game, _, _ in LibraryReader(os.path.join(self.share, self.CATALOG_FILE))
+                     if isinstance(game, dict) and game.get("path")]
+        except (json.JSONDecodeError, IOError, OSError) as e:
+            if not self.error:
+                print(f"Catalog {self.share} unavailable, using the cached copy: {e}")
+            self.error = str(e)
+            return False
+        
+        for game in games:
+            if game.get("id"):
+                game["id"] = f"{self.ID_PREFIX}{game['id']}"
+            else:
+                # Every machine must give the game the same id
+                key = normalize_path(game["path"]).encode("utf-8")
+                game["id"] = self.ID_PREFIX + hashlib.blake2b(key, digest_size=8).hexdigest()
+            for field in COLD_FIELDS:
+                # Per-machine, kept in the local detail store
+                game.pop(field, None)
+            game.pop(SHARD_FIELD, None)
+        records = [record.to_dict() for record in migrate_records(games)]
+        for record in records:
+            if record.get("cover"):
+                record["cover"] = self._cache_cover(record["cover"])
+        
+        try:
+            with self._lock:
+                atomic_dump(self.path, library_document(records))
+                # Stamped last, an interrupted copy is redone next time
+                with open(self._stamp_path, 'w', encoding='utf-8') as f:
+                    f.write(stamp)
+                self._copied = stamp
+        except IOError as e:
+            print(f"Error caching catalog: {e}")
+            return False
+        self.error = ""
+        print(f"Catalog {self.share} updated to version {stamp}")
+        return True
+    
+    def _cache_cover(self, cover: str) -> str:
+        """Copy a cover stored on the share into the cache, returning the path to use"""
+        source = cover if os.path.isabs(cover) else os.path.join(self.share, cover)
+        try:
+            relative = os.path.relpath(source, self.share)
+        except ValueError:
+            # On another drive
+            return cover
+        if relative.startswith(".."):
+            return cover
+        target = os.path.abspath(os.path.join(self.cache_dir, "covers", relative))
+        try:
+            stat = os.stat(source)
+            if (not os.path.exists(target) or os.path.getsize(target) != stat.st_size
+                    or int(os.path.getmtime(target)) != int(stat.st_mtime)):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.copy2(source, target)
+        except OSError as e:
+            print(f"Error caching cover {source}: {e}")
+            return target if os.path.exists(target) else source
+        return target
+    
+    @staticmethod
+    def _read(path: str, default: Any) -> Any:
+        if not os.path.exists(path):
+            return default
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"Error loading catalog: {e}")
+            return None
+    
+    def load(self) -> Optional[List[Dict[str, Any]]]:
+        """Read the cached catalog with this machine's overlay applied"""
+        with self._lock:
+            document = self._read(self.path, library_document([]))
+            overlay = self._read(self.overlay_path, {})
+            copied = self._copied
+        if not isinstance(document, dict) or not isinstance(overlay, dict):
+            return None
+        self.schema = document.get("schema")
+        
+        catalog = {str(g.get("id")): g for g in document.get("games", []) if isinstance(g, dict)}
+        changed = overlay.get("changed", {})
+        removed = set(overlay.get("removed", []))
+        games = [dict(game, **changed.get(game_id, {}))
+                 for game_id, game in catalog.items() if game_id not in removed]
+        games.extend(game for game in overlay.get("added", []) if isinstance(game, dict))
+        self._catalog = catalog
+        self._loaded = copied
+        self._start_refresh()
+        return games
+    
+    def write(self, games: List[Dict[str, Any]], changes: Optional[List[Change]] = None) -> bool:
+        """Store how this machine's games differ from the catalog"""
+        catalog = self._catalog
+        changed: Dict[str, Dict[str, Any]] = {}
+        added = []
+        kept = set()
+        ids = {str(game.get("id")) for game in games}
+        paths: Optional[Dict[str, str]] = None
+        for game in games:
+            game_id = str(game.get("id"))
+            if game_id not in catalog:
+                # Renamed by the library when its id was taken: still the catalog game
+                if paths is None:
+                    paths = {normalize_path(g.get("path", "")): i for i, g in catalog.items()}
+                game_id = paths.get(normalize_path(game.get("path", "")), "")
+                if not game_id or game_id in ids or game_id in kept:
+                    added.append(game)
+                    continue
+            base = catalog[game_id]
+            kept.add(game_id)
+            fields = {key: value for key, value in game.items()
+                      if key != SHARD_FIELD and base.get(key, _MISSING) != value}
+            if fields:
+                changed[game_id] = fields
+        overlay = {"changed": changed, "removed": [i for i in catalog if i not in kept],
+                   "added": added}
+        try:
+            with self._lock:
+                atomic_dump(self.overlay_path, overlay)
+            return True
+        except IOError as e:
+            print(f"Error saving catalog overlay: {e}")
+            return False
+    
+    def _start_refresh(self) -> None:
+        if self._thread is None and not self._stop.is_set():
+            self._thread = threading.Thread(target=self._refresh_loop, name="catalog-refresh",
+                                            daemon=True)
+            self._thread.start()
+    
+    def _refresh_loop(self) -> None:
+        while not self._stop.is_set():
+            # Also retried while an earlier copy could not be applied yet
+            if (self.refresh() or self.stale()) and self.on_refresh is not None \
+                    and not self._stop.is_set():
+                self.on_refresh()
+            self._stop.wait(self.REFRESH_SECONDS)
+    
+    def close(self) -> None:
+        # The thread may be stuck on the share, it is a daemon and is not waited for
+        self._stop.set()
\ No newline at end of file
@@ -0,0 +1,257 @@
+"""
+Columnar library snapshot for GxLauncher
+Numeric game fields as NumPy arrays for vectorized sort, filter and stats
+"""
+
+import copy
+from typing import Callable, Dict, Iterable, List, Optional, Any
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+class ColumnarSnapshot:
+    """Read-only column view of the library at one mutation generation
+    
+    Row i describes games[i]. Tags are stored as (row, tag id) pairs and
+    names as their rank in the natural name order, so every supported
+    sort is a numeric argsort. Edits to games already in the view are
+    applied by patched() instead of a full rebuild.
+    """
+    
+    SORT_FIELDS = ("name", "playtime", "last_played", "added")
+    NUMERIC_FIELDS = ("playtime", "last_played", "added", "favorite")
+    
+    def __init__(self, games: List[Dict[str, Any]], generation: int, name_order: Iterable[str],
+                 ordinal: Optional[Callable[[str], int]] = None):
+        self.generation = generation
+        self.games = list(games)
+        self.ids = [g.get("id") for g in self.games]
+        # Names as of this view, records are edited in place
+        self.names = [g.get("name", "") for g in self.games]
+        self._rows = {game_id: row for row, game_id in enumerate(self.ids)}
+        n = len(self.games)
+        # Bitmap index ordinal of every row, see bitmap_mask()
+        self._ordinal = ordinal
+        self.ordinals = None
+        if ordinal is not None:
+            self.ordinals = np.fromiter((ordinal(game_id) for game_id in self.ids), np.int64, n)
+        
+        self.playtime = np.fromiter((int(g.get("playtime", 0) or 0) for g in self.games), np.int64, n)
+        self.last_played = np.fromiter((int(g.get("last_played", 0) or 0) for g in self.games), np.int64, n)
+        self.added = np.fromiter((int(g.get("added", 0) or 0) for g in self.games), np.int64, n)
+        self.favorite = np.fromiter((bool(g.get("favorite", False)) for g in self.games), np.bool_, n)
+        
+        self.tag_names: Dict[str, int] = {}
+        self.tag_rows, self.tag_values = self._tag_pairs(range(n))
+        self.name_rank = self._name_rank(name_order)
+        
+        self._id_rank = None
+        self._orders: Dict[str, Any] = {}
+        self._tag_masks: Dict[str, Any] = {}
+    
+    def __len__(self) -> int:
+        return len(self.games)
+    
+    def _tag_pairs(self, rows: Iterable[int]):
+        """(row, tag id) arrays for the tags of the given rows, new tags get an id"""
+        tag_rows: List[int] = []
+        tag_values: List[int] = []
+        for row in rows:
+            for tag in {t.casefold() for t in self.games[row].get("tags", []) or []}:
+                tag_rows.append(row)
+                tag_values.append(self.tag_names.setdefault(tag, len(self.tag_names)))
+        return np.array(tag_rows, dtype=np.int64), np.array(tag_values, dtype=np.int32)
+    
+    def _name_rank(self, name_order: Iterable[str]):
+        n = len(self.games)
+        name_rank = np.full(n, n, dtype=np.int64)
+        rows = [self._rows[game_id] for game_id in name_order if game_id in self._rows]
+        name_rank[rows] = np.arange(len(rows))
+        return name_rank
+    
+    def covers(self, game_ids: Iterable[str]) -> bool:
+        """True if every id already has a row, so patched() can take them"""
+        rows = self._rows
+        return all(game_id in rows for game_id in game_ids)
+    
+    def patched(self, games: Dict[str, Dict[str, Any]], generation: int,
+                name_order: Callable[[], Iterable[str]]) -> "ColumnarSnapshot":
+        """A copy at generation with the rows of the given games re-read
+        
+        Every game must already have a row (see covers()). Columns and
+        cached sorts the edits did not touch are shared with this view,
+        which stays as it was for readers still holding it.
+        """
+        columns = copy.copy(self)
+        columns.generation = generation
+        if not games:
+            return columns
+        
+        rows = np.fromiter((self._rows[game_id] for game_id in games), np.int64, len(games))
+        row_list = rows.tolist()
+        columns.games = list(self.games)
+        for row, game in zip(row_list, games.values()):
+            columns.games[row] = game
+        columns._orders = dict(self._orders)
+        if self._ordinal is not None:
+            # An id dropped and added again may come back under another ordinal
+            columns.ordinals = self.ordinals.copy()
+            columns.ordinals[rows] = np.fromiter(map(self._ordinal, games), np.int64, len(games))
+        
+        for field in self.NUMERIC_FIELDS:
+            old = getattr(self, field)
+            if field == "favorite":
+                values = np.fromiter((bool(g.get(field, False)) for g in games.values()), np.bool_, len(games))
+            else:
+                values = np.fromiter((int(g.get(field, 0) or 0) for g in games.values()), np.int64, len(games))
+            if np.array_equal(old[rows], values):
+                continue
+            column = old.copy()
+            column[rows] = values
+            setattr(columns, field, column)
+            columns._orders.pop(field, None)
+        
+        # Tags: drop the pairs of the edited rows and add them again
+        touched = np.isin(self.tag_rows, rows)
+        columns.tag_names = dict(self.tag_names)
+        tag_rows, tag_values = columns._tag_pairs(row_list)
+        if (sorted(zip(self.tag_rows[touched].tolist(), self.tag_values[touched].tolist()))
+                != sorted(zip(tag_rows.tolist(), tag_values.tolist()))):
+            columns.tag_rows = np.concatenate((self.tag_rows[~touched], tag_rows))
+            columns.tag_values = np.concatenate((self.tag_values[~touched], tag_values))
+            columns._tag_masks = {}
+        
+        names = [g.get("name", "") for g in games.values()]
+        if any(self.names[row] != name for row, name in zip(row_list, names)):
+            columns.names = list(self.names)
+            for row, name in zip(row_list, names):
+                columns.names[row] = name
+            columns.name_rank = columns._name_rank(name_order())
+            columns._orders.pop("name", None)
+        return columns
+    
+    def _column(self, field: str):
+        if field == "name":
+            return self.name_rank
+        return getattr(self, field)
+    
+    def _order(self, by: str):
+        """Rows sorted by (field, id), the same order the sorted indexes keep"""
+        order = self._orders.get(by)
+        if order is None:
+            if by == "name":
+                order = np.argsort(self.name_rank, kind="stable")
+            else:
+                if self._id_rank is None:
+                    self._id_rank = np.empty(len(self.ids), dtype=np.int64)
+                    self._id_rank[sorted(range(len(self.ids)), key=self.ids.__getitem__)] = \
+                        np.arange(len(self.ids))
+                order = np.lexsort((self._id_rank, self._column(by)))
+            self._orders[by] = order
+        return order
+    
+    def order(self, by: str = "name", reverse: bool = False, mask=None) -> List[Dict[str, Any]]:
+        """Get the games selected by mask (all if None) sorted by a field"""
+        if by not in self.SORT_FIELDS:
+            by = "name"
+        order = self._order(by)
+        if mask is not None:
+            order = order[mask[order]]
+        if reverse:
+            order = order[::-1]
+        games = self.games
+        return [games[row] for row in order.tolist()]
+    
+    def tag_mask(self, tag: str):
+        """Boolean mask of the rows carrying tag"""
+        tag = tag.casefold()
+        mask = self._tag_masks.get(tag)
+        if mask is None:
+            mask = np.zeros(len(self.games), dtype=np.bool_)
+            tag_id = self.tag_names.get(tag)
+            if tag_id is not None:
+                mask[self.tag_rows[self.tag_values == tag_id]] = True
+            self._tag_masks[tag] = mask
+        return mask
+    
+    def filter_mask(self, favorites_only: bool = False, tags: Optional[List[str]] = None,
+                    match_all: bool = False):
+        """Boolean mask for a tag/favorite filter, tags match any (or all) of the given ones"""
+        mask = np.ones(len(self.games), dtype=np.bool_)
+        if tags:
+            masks = [self.tag_mask(tag) for tag in tags]
+            combined = np.logical_and.reduce(masks) if match_all else np.logical_or.reduce(masks)
+            mask &= combined
+        if favorites_only:
+            mask &= self.favorite
+        return mask
+    
+    def ids_mask(self, game_ids: Iterable[str]):
+        """Boolean mask of the rows with the given ids"""
+        mask = np.zeros(len(self.games), dtype=np.bool_)
+        rows = self._rows
+        mask[[rows[game_id] for game_id in game_ids if game_id in rows]] = True
+        return mask
+    
+    def bitmap_mask(self, bitmap):
+        """Boolean mask of the rows whose ordinal is set in a bitmap index result"""
+        bits = bitmap.bits
+        data = np.frombuffer(bits.to_bytes((bits.bit_length() + 7) // 8, "little"), np.uint8)
+        flags = np.unpackbits(data, bitorder="little").view(np.bool_)
+        mask = np.zeros(len(self.games), dtype=np.bool_)
+        inside = self.ordinals < flags.size
+        mask[inside] = flags[self.ordinals[inside]]
+        return mask
+    
+    def aggregate(self, mask=None) -> Dict[str, int]:
+        """Count, played/unplayed, total playtime and most recent last_played"""
+        playtime, last_played = self.playtime, self.last_played
+        if mask is not None:
+            playtime, last_played = playtime[mask], last_played[mask]
+        count = int(playtime.size)
+        played = int(np.count_nonzero((playtime > 0) | (last_played > 0)))
+        return {
+            "count": count,
+            "played": played,
+            "unplayed": count - played,
+            "total_playtime": int(playtime.sum()),
+            "last_played": int(last_played.max()) if count else 0
+        }
+
+
+class ColumnChanges:
+    """Games edited since the column view was last brought up to date
+    
+    Registered with the library's secondary indexes, so it hears about
+    every change to the fields the view keeps. An id discarded and not
+    added back, or the indexes being cleared, means rows came or went
+    and the view has to be rebuilt.
+    """
+    
+    FIELDS = frozenset({"name", "tags", "playtime", "last_played", "added", "favorite"})
+    
+    def __init__(self):
+        self.games: Dict[str, Dict[str, Any]] = {}
+        self.removed = set()
+        self.rebuild = True
+    
+    def clear(self) -> None:
+        self.reset()
+        self.rebuild = True
+    
+    def reset(self) -> None:
+        self.games.clear()
+        self.removed.clear()
+        self.rebuild = False
+    
+    def add(self, game: Dict[str, Any]) -> None:
+        game_id = game.get("id")
+        self.removed.discard(game_id)
+        self.games[game_id] = game
+    
+    def discard(self, game_id: str) -> None:
+        self.games.pop(game_id, None)
+        self.removed.add(game_id)
\ No newline at end of file
@@ -4,7 +4,7 @@ Configuration management for GxLauncher
 
 import json
 import os
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Set, Tuple
 
 class Config:
     """Manages application configuration"""
@@ -24,30 +24,99 @@ class Config:
         "last_update_check": 0,
         "auto_check_updates": True,
         "show_sidebar": True,
-        "theme": "dark"
+        "theme": "dark",
+        "storage_backend": "json",
+        "write_behind": True,
+        # Keep daily and on-exit snapshots of the library in history/
+        "library_history": True,
+        # Extra library files merged with games.json, one per drive or source:
+        # {"name": "Steam (D:)", "path": "D:/SteamLibrary/gxlauncher.json", "root": "D:/SteamLibrary"}
+        # New games under root are stored in that file, ".db" paths use SQLite
+        # A read-only catalog shared by several machines is mounted with
+        # {"name": "Catálogo", "catalog": "//servidor/gxlauncher"}
+        "libraries": [],
+        # Sync with another launcher: listen on sync_host:sync_port (0 = off)
+        # and/or connect to sync_peer ("host:porta"), both sides use the same
+        # sync_key and nothing syncs while it is empty. Set sync_host to
+        # "0.0.0.0" to accept other machines on the network
+        "sync_host": "127.0.0.1",
+        "sync_port": 0,
+        "sync_peer": "",
+        "sync_key": "",
+        # Saved views shown in the filter bar, queries use the search box language
+        "smart_collections": [
+            {"name": "Jogados recentemente", "query": "last:<14d"},
+            {"name": "Nunca jogados", "query": "last:never"},
+            {"name": "Favoritos com +20h", "query": "fav:sim playtime>20h"},
+            {"name": "Adicionados nesta semana", "query": "added:<7d"}
+        ]
     }
     
     def __init__(self):
+        # Keys set here since the last load or save, they win over external edits
+        self._dirty: Set[str] = set()
+        self._stat: Optional[Tuple[int, int]] = None
         self.config = self._load()
     
-    def _load(self) -> Dict[str, Any]:
-        """Load configuration from file"""
+    def _file_stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.CONFIG_FILE)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+    
+    def _read(self) -> Optional[Dict[str, Any]]:
+        """Read config.json, None if it is missing or unreadable"""
         if os.path.exists(self.CONFIG_FILE):
             try:
                 with open(self.CONFIG_FILE, 'r', encoding='utf-8') as f:
-                    loaded = json.load(f)
-                    # Merge with defaults to ensure all keys exist
-                    return {**self.DEFAULT_CONFIG, **loaded}
+                    return json.load(f)
             except (json.JSONDecodeError, IOError) as e:
                 print(f"Error loading config: {e}")
+        return None
+    
+    def _load(self) -> Dict[str, Any]:
+        """Load configuration from file"""
+        self._stat = self._file_stat()
+        loaded = self._read()
+        if loaded is not None:
+            # Merge with defaults to ensure all keys exist
+            return {**self.DEFAULT_CONFIG, **loaded}
         
         return self.DEFAULT_CONFIG.copy()
     
+    def changed_on_disk(self) -> bool:
+        """Check if config.json changed since we last read or wrote it"""
+        return self._file_stat() != self._stat
+    
+    def reload(self) -> Set[str]:
+        """Pick up an external edit of config.json, returning the keys that changed
+        
+        Keys set here and not saved yet keep their local value.
+        """
+        if not self.changed_on_disk():
+            return set()
+        stat = self._file_stat()
+        loaded = self._read()
+        if loaded is None:
+            # Deleted or half written, keep what we have and retry on the next change
+            return set()
+        self._stat = stat
+        changed = set()
+        for key, value in {**self.DEFAULT_CONFIG, **loaded}.items():
+            if key not in self._dirty and self.config.get(key) != value:
+                self.config[key] = value
+                changed.add(key)
+        return changed
+    
     def save(self) -> bool:
-        """Save configuration to file"""
+        """Save configuration to file, keeping keys another program changed meanwhile"""
+        self.reload()
         try:
             with open(self.CONFIG_FILE, 'w', encoding='utf-8') as f:
                 json.dump(self.config, f, indent=4, ensure_ascii=False)
+            self._dirty.clear()
+            self._stat = self._file_stat()
             return True
         except IOError as e:
             print(f"Error saving config: {e}")
@@ -60,12 +129,15 @@ class Config:
     def set(self, key: str, value: Any) -> None:
         """Set configuration value"""
         self.config[key] = value
+        self._dirty.add(key)
     
     def update(self, values: Dict[str, Any]) -> None:
         """Update multiple configuration values"""
         self.config.update(values)
+        self._dirty.update(values)
     
     def reset(self) -> None:
         """Reset to default configuration"""
         self.config = self.DEFAULT_CONFIG.copy()
+        self._dirty.update(self.config)
         self.save()
\ No newline at end of file
@@ -3,194 +3,1489 @@ Database management for GxLauncher
 Handles game library storage and operations
 """
 
+import functools
 import json
 import os
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import threading
 import time
-from typing import List, Dict, Optional, Any
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Any, Callable, Iterable, Iterator, Set, Tuple
+from core.storage import (StorageBackend, JsonStorage, JournalStorage, SqliteStorage,
+                          SnapshotCache, Change, file_stats)
+from core.utils import normalize_path, natural_key
+from core.search_index import TrigramIndex
+from core.indexes import Bitmap, OrdinalIndex, TagIndex, StatsIndex, SortedIndex, CollectionIndex
+from core.record import GameRecord, SCHEMA_VERSION, COLD_FIELDS, cold_fields, migrate_records
+from core.columnar import ColumnarSnapshot, ColumnChanges, HAS_NUMPY
+from core.query import Query, parse_query
+from core.writer import BackgroundWriter
+from core.sessions import SessionStore
+from core.details import DetailStore
+from core.reconcile import LibraryDiff, changed_fields
+from core.backup import (ImportReport, ImportCancelled, ProgressCallback, write_backup,
+                         iter_backup, iter_batches, check_records, record_error, merge_record)
+from core.rwlock import RWLock
+from core.shards import ShardedStorage, LibraryShard, ONLINE, SHARD_FIELD
+from core.catalog import CatalogStorage
+from core.history import LibraryHistory
+from core.sync import LibrarySync
+
+def synchronized(method):
+    """Run a Database method while holding the library lock for writing"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+def shared(method):
+    """Run a Database method while holding the library lock for reading"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        lock = self._lock
+        lock.acquire_read()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            lock.release_read()
+    return wrapper
+
+class LibrarySnapshot:
+    """The game list as readers see it at one generation, never changed once built
+    
+    Sorted views are added the first time they are asked for. Records
+    are shared with the library, not copied.
+    """
+    
+    __slots__ = ("generation", "games", "sorted")
+    
+    def __init__(self, generation: int, games: Iterable[Dict[str, Any]]):
+        self.generation = generation
+        self.games: Tuple[Dict[str, Any], ...] = tuple(games)
+        self.sorted: Dict[Tuple[str, bool], Tuple[Dict[str, Any], ...]] = {}
 
 class Database:
-    """Manages game library database"""
+    """Manages game library database
+    
+    Safe to use from several threads: mutations hold the library lock
+    for writing, lookups hold it for reading and may run side by side.
+    Listings come from a LibrarySnapshot that is built once per change
+    and shared by every reader until the next one. libraries lists extra
+    library files ({"name", "path", "root"}) merged into one view, see
+    ShardedStorage; an entry with "catalog" instead of "path" mounts a
+    read-only catalog from that folder, see CatalogStorage. With history,
+    snapshots of the library are kept on close and daily, see take_snapshot().
+    With sync, edits and playtime can be exchanged with another launcher,
+    see LibrarySync.
+    """
     
     DB_FILE = "games.json"
+    SQLITE_FILE = "games.db"
+    SESSIONS_FILE = "sessions.db"
+    DETAILS_FILE = "details.db"
+    # Local copies of shared catalogs, one folder per catalog
+    CATALOG_DIR = "catalogs"
+    HISTORY_DIR = "history"
+    SYNC_FILE = "sync.db"
+    
+    def __init__(self, backend: str = "json", write_behind: bool = False, autoload: bool = True,
+                 libraries: Optional[List[Dict[str, str]]] = None, history: bool = False,
+                 sync: bool = False):
+        self.games: List[GameRecord] = []
+        self._lock = RWLock()
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._by_path: Dict[str, Dict[str, Any]] = {}
+        self._path_keys: Dict[str, str] = {}
+        # Secondary indexes, each exposes FIELDS, add(game), discard(game_id) and clear()
+        self.ordinals = OrdinalIndex()
+        self.text_index = TrigramIndex()
+        self.tag_index = TagIndex(self.ordinals)
+        self.stats_index = StatsIndex()
+        self.sorted_indexes: Dict[str, SortedIndex] = {
+            "name": SortedIndex("name", lambda g: natural_key(g.get("name", ""))),
+            "playtime": SortedIndex("playtime", lambda g: g.get("playtime", 0)),
+            "last_played": SortedIndex("last_played", lambda g: g.get("last_played", 0)),
+            "added": SortedIndex("added", lambda g: g.get("added", 0))
+        }
+        # Smart collections, see set_collections()
+        self.collections = CollectionIndex()
+        # Ordinals come first, the bitmap indexes need them when adding
+        self._indexes = [self.ordinals, self.text_index, self.tag_index, self.stats_index,
+                         self.collections, *self.sorted_indexes.values()]
+        # What changed since the column view was built, see columns()
+        self._column_changes = ColumnChanges()
+        if HAS_NUMPY:
+            self._indexes.append(self._column_changes)
+        self._queries: Dict[str, Query] = {}
+        # compile_query() runs on concurrent readers
+        self._queries_lock = threading.Lock()
+        # Bumped on every index change, the columnar snapshot is refreshed when it moves
+        self._generation = 0
+        self._columns: Optional[ColumnarSnapshot] = None
+        self._columns_lock = threading.Lock()
+        self._snapshot: Optional[LibrarySnapshot] = None
+        # Transaction state, see batch()
+        self._batch_depth = 0
+        self._pending: List[Change] = []
+        self._pending_full = False
+        self._batch_games: List[Dict[str, Any]] = []
+        self._batch_records: Dict[int, tuple] = {}
+        self._batch_base: Set[str] = set()
+        self._batch_details: Dict[str, Dict[str, Any]] = {}
+        # Play history changes held until the batch commits, see _change_sessions()
+        self._batch_sessions: List[Callable[[], bool]] = []
+        self._last_commit_ok = True
+        # Streaming load state, see iter_load()
+        self.loading = False
+        self.load_ok = True
+        self._hold_writes = False
+        self._held: List[Change] = []
+        self._held_full = False
+        self._migrated = False
+        # Called when a library shard comes online or goes offline after loading
+        self.on_shard_change: Optional[Callable[[], None]] = None
+        self.storage = self._create_storage(backend)
+        # Extra library files around the main one, None without any
+        self.shards = self._create_shards(self.storage, libraries or [])
+        if self.shards is not None:
+            self.storage = self.shards
+        # Binary copy of the loaded library, skips parsing on the next start
+        sources = self.storage.source_files()
+        self._cache = SnapshotCache(self.DB_FILE + ".cache", sources) if sources else None
+        self._write_failed = False
+        # External change detection, see check_external()
+        self._sources = sources
+        self._disk_stats: Optional[list] = None
+        # Records changed here since the last write, as they were on disk (None if absent)
+        self._base: Dict[str, Optional[Dict[str, Any]]] = {}
+        # Called with a LibraryDiff when another program changed the library files,
+        # possibly from the background writer thread
+        self.on_external_change: Optional[Callable[[LibraryDiff], None]] = None
+        # Outcome of the latest import_library() call
+        self.last_import: Optional[ImportReport] = None
+        # Per-session play history with daily and weekly rollups
+        self.sessions = SessionStore(self.SESSIONS_FILE)
+        # Cold fields such as notes, read per game by get_details()
+        self.details = DetailStore(self.DETAILS_FILE)
+        self.text_index.notes_loader = lambda: self.details.iter_field("notes")
+        # Rolling snapshots to restore from, see take_snapshot()
+        self.history = LibraryHistory(self.HISTORY_DIR) if history else None
+        # Runs auto_snapshot() off the calling thread
+        self._history_thread: Optional[threading.Thread] = None
+        self.sync = LibrarySync(self, self.SYNC_FILE) if sync else None
+        self._closed = False
+        # Write-behind mode: mutations only mark the store dirty
+        self._writer: Optional[BackgroundWriter] = None
+        if write_behind:
+            self._writer = BackgroundWriter(self._write_snapshot)
+        if autoload:
+            self.load()
+    
+    def _create_storage(self, backend: str) -> StorageBackend:
+        """Create the storage engine, migrating games.json into SQLite on first start"""
+        if backend == "journal":
+            return JournalStorage(self.DB_FILE)
+        if backend != "sqlite":
+            return JsonStorage(self.DB_FILE)
+        
+        storage = SqliteStorage(self.SQLITE_FILE)
+        if not storage.get_meta("migrated_from_json"):
+            self._migrate_json(storage)
+        return storage
     
-    def __init__(self):
-        self.games: List[Dict[str, Any]] = []
-        self._ensure_db_exists()
-        self.load()
+    def _create_shards(self, main: StorageBackend,
+                       libraries: List[Dict[str, str]]) -> Optional[ShardedStorage]:
+        """Wrap the main storage with the extra library files listed in the config"""
+        shards: List[LibraryShard] = []
+        names = {""}
+        for entry in libraries:
+            if not isinstance(entry, dict):
+                entry = {}
+            name = str(entry.get("name") or "").strip()
+            path, share = entry.get("path"), entry.get("catalog")
+            if not name or not (path or share) or name in names:
+                print(f"Ignoring library {entry!r}, it needs a unique name and a path")
+                continue
+            names.add(name)
+            if share:
+                cache = path or os.path.join(self.CATALOG_DIR, re.sub(r"[^\w.-]+", "_", name))
+                catalog = CatalogStorage(share, cache)
+                catalog.on_refresh = functools.partial(self._catalog_refreshed, name)
+                shards.append(LibraryShard(name, share, storage=catalog))
+            else:
+                shards.append(LibraryShard(name, path, entry.get("root") or ""))
+        if not shards:
+            return None
+        storage = ShardedStorage(main, shards)
+        storage.on_late_load = self._attach_shard
+        return storage
     
-    def _ensure_db_exists(self) -> None:
-        """Create database file if it doesn't exist"""
-        if not os.path.exists(self.DB_FILE):
-            with open(self.DB_FILE, 'w', encoding='utf-8') as f:
-                json.dump([], f)
+    def _migrate_json(self, storage: SqliteStorage) -> None:
+        """Copy an existing games.json into a fresh SQLite database"""
+        if os.path.exists(self.DB_FILE):
+            games = JsonStorage(self.DB_FILE).load()
+            if games is None:
+                # Keep games.json untouched and retry on next start
+                return
+            games = [GameRecord.with_defaults(g) for g in games]
+            # Rows are keyed by id, so duplicated ids must not collapse
+            self._dedupe_ids(games)
+            if not storage.write(games):
+                return
+            print(f"Migrated {len(games)} games from {self.DB_FILE} to {self.SQLITE_FILE}")
+        storage.set_meta("migrated_from_json", str(int(time.time())))
     
     def load(self) -> bool:
         """Load games from database"""
-        try:
-            with open(self.DB_FILE, 'r', encoding='utf-8') as f:
-                self.games = json.load(f)
-                # Ensure all games have required fields
-                for game in self.games:
-                    self._ensure_game_fields(game)
-            return True
-        except (json.JSONDecodeError, IOError) as e:
-            print(f"Error loading database: {e}")
+        for _ in self.iter_load(batch_size=5000):
+            pass
+        return self.load_ok
+    
+    def iter_load(self, batch_size: int = 500) -> Iterator[Tuple[int, int]]:
+        """Load games in batches, yielding (loaded, estimated total) after each one
+        
+        The library is usable between batches. Mutations made meanwhile
+        apply in memory right away but are only written once the load
+        completes, so a partial library never overwrites the full one.
+        """
+        with self._lock:
+            self.loading = True
+            self._hold_writes = True
+            self.load_ok = False
             self.games = []
-            return False
+            self._rebuild_indexes()
+        
+        completed = ok = renamed = False
+        self._migrated = False
+        # Taken first, so files edited while loading still count as changed afterwards
+        stats = file_stats(self._sources)
+        try:
+            for batch, total in self._load_batches(batch_size):
+                if batch is None:
+                    break
+                with self._lock:
+                    for game in batch:
+                        game_id = self._unique_id(game["id"])
+                        if game_id != game["id"]:
+                            game["id"] = game_id
+                            renamed = True
+                        self.games.append(game)
+                        self._index_game(game)
+                    if self._move_details(batch):
+                        # Rewrite the files without the moved fields
+                        renamed = True
+                    loaded = len(self.games)
+                yield loaded, max(total, loaded)
+            else:
+                ok = True
+            completed = True
+        finally:
+            with self._lock:
+                self.loading = False
+                self.load_ok = ok
+                if not completed:
+                    # Abandoned half way, writing now could drop unloaded games
+                    print("Library only partially loaded, changes will not be saved")
+                else:
+                    if not ok:
+                        self.games = []
+                        self._rebuild_indexes()
+                    if ok:
+                        self._base.clear()
+                        self._disk_stats = stats
+                        if self._cache is not None and file_stats(self._sources) == stats:
+                            self._cache.mark_synced()
+                    if renamed or (ok and self._migrated):
+                        # Store new ids so row and journal keys match memory, and
+                        # rewrite older files once in the current schema
+                        self._held_full = True
+                    self._release_writes()
     
+    def _load_batches(self, batch_size: int) -> Iterator[Tuple[Optional[List[GameRecord]], int]]:
+        """Yield batches of records from the snapshot cache, or from storage when it is stale"""
+        cached = self._cache.load() if self._cache is not None else None
+        if cached is not None:
+            if self.shards is not None:
+                self.shards.loaded_from_cache(cached)
+            for start in range(0, len(cached), batch_size):
+                yield cached[start:start + batch_size], len(cached)
+            return
+        for batch, total in self.storage.iter_load(batch_size):
+            if batch is None:
+                yield None, 0
+                return
+            if self.storage.schema != SCHEMA_VERSION and not self._migrated:
+                print(f"Migrating library from schema {self.storage.schema} to {SCHEMA_VERSION}")
+                self._migrated = True
+            yield self._records(batch, self.storage.schema), total
+    
+    @staticmethod
+    def _records(batch: List[Dict[str, Any]], schema: Optional[int]) -> List[GameRecord]:
+        if schema == SCHEMA_VERSION:
+            # Written by this version, every record is already complete
+            return [GameRecord(g) for g in batch]
+        return migrate_records(batch)
+    
+    def _attach_shard(self, shard: LibraryShard, games: Optional[List[Dict[str, Any]]]) -> None:
+        """Add the games of a shard that finished loading after the rest of the library
+        
+        Runs on the shard's loading thread. The shard only turns online
+        once background writes copied before its games arrived are on
+        disk, so none of them can empty its file.
+        """
+        diff = LibraryDiff()
+        if games is not None:
+            with self._lock:
+                records = self._records(games, shard.storage.schema)
+                # Nothing read means nothing to migrate, as for a shard the cache held
+                rewrite = bool(records) and shard.storage.schema != SCHEMA_VERSION
+                for game in records:
+                    game_id = self._unique_id(game["id"])
+                    if game_id != game["id"]:
+                        game["id"] = game_id
+                        rewrite = True
+                    self.games.append(game)
+                    self._index_game(game)
+                    diff.added.append(game_id)
+                if self._move_details(records):
+                    rewrite = True
+            self.flush()
+            with self._lock:
+                shard.status = ONLINE
+                if rewrite or shard.dirty:
+                    # Edits made while it was loading were not written
+                    shard.dirty = False
+                    self._write(None)
+        if diff:
+            self._notify(diff)
+        if self.on_shard_change is not None:
+            self.on_shard_change()
+    
+    def _release_writes(self) -> None:
+        """Write everything held back while loading"""
+        changes, full = self._held, self._held_full
+        self._hold_writes = False
+        self._held, self._held_full = [], False
+        if full:
+            self._write(None)
+        elif changes:
+            self._write(changes)
+    
+    @synchronized
     def save(self) -> bool:
         """Save games to database"""
-        try:
-            with open(self.DB_FILE, 'w', encoding='utf-8') as f:
-                json.dump(self.games, f, indent=4, ensure_ascii=False)
+        if self._batch_depth:
+            self._pending_full = True
             return True
-        except IOError as e:
-            print(f"Error saving database: {e}")
+        return self._write(None)
+    
+    def _persist(self, changes: List[Change]) -> bool:
+        """Persist only the records touched by a mutation"""
+        if not changes:
+            # Such as an edit of cold fields only, already in the detail store
+            return True
+        if self._batch_depth:
+            self._pending.extend(changes)
+            return True
+        return self._write(changes)
+    
+    def _write(self, changes: Optional[List[Change]]) -> bool:
+        """Hand changes to the background writer, or write them right away"""
+        if self._hold_writes:
+            if changes is None:
+                self._held_full = True
+            else:
+                self._held.extend(changes)
+            return True
+        if self._writer is not None:
+            self._writer.submit(changes)
+            return True
+        return self._store(self.games, self._prepare_write(changes))
+    
+    def _write_snapshot(self, changes: Optional[List[Change]]) -> bool:
+        """Write from the background thread using copies taken under the lock"""
+        with self._lock:
+            changes = self._prepare_write(changes)
+            copies = {id(g): dict(g) for g in self.games}
+            games = list(copies.values())
+            if changes is not None:
+                changes = [
+                    (c[0], copies.get(id(c[1])) or dict(c[1])) + tuple(c[2:])
+                    if c[0] != "delete" else c
+                    for c in changes
+                ]
+        return self._store(games, changes)
+    
+    def _prepare_write(self, changes: Optional[List[Change]]) -> Optional[List[Change]]:
+        """Fold in external edits before writing over them, called with the lock held
+        
+        Returns the changes to write, or None for a full write when the
+        files had been changed by someone else.
+        """
+        # Only the files about to be written, other shards are left alone
+        if self._disk_changed(self.storage.target_files(changes)):
+            diff = self._reconcile()
+            if diff:
+                self._notify(diff)
+            # Unreadable or merged, either way memory is now the full picture
+            changes = None
+        self._base.clear()
+        return changes
+    
+    def _move_details(self, games: List[Dict[str, Any]], remember: bool = True) -> bool:
+        """Move cold fields found in records into the detail store
+        
+        Records keep their cold fields when the store cannot be written,
+        so they are never dropped from the library files. Returns True if
+        any record changed.
+        """
+        moved = [(game, cold_fields(game)) for game in games]
+        moved = [(game, fields) for game, fields in moved if fields]
+        if not moved:
+            return False
+        if remember:
+            for game, _ in moved:
+                self._remember_details(game.get("id"))
+        if not self.details.put_many((game.get("id"), fields) for game, fields in moved):
             return False
+        for game, fields in moved:
+            for field in fields:
+                del game[field]
+            if "notes" in fields:
+                self.text_index.set_notes(game.get("id"), fields["notes"])
+        return True
     
-    def _ensure_game_fields(self, game: Dict[str, Any]) -> None:
-        """Ensure game has all required fields"""
-        defaults = {
-            "id": str(int(time.time() * 1000)),
-            "name": "Unknown Game",
-            "path": "",
-            "cover": "",
-            "playtime": 0,
-            "last_played": 0,
-            "added": int(time.time()),
-            "favorite": False,
-            "tags": [],
-            "notes": ""
-        }
+    def _store(self, games: List[Dict[str, Any]], changes: Optional[List[Change]]) -> bool:
+        """Write to the storage engine, remembering failures
         
-        for key, value in defaults.items():
-            if key not in game:
-                game[key] = value
+        The write itself may run on the background writer, the outcome is
+        published under the lock as check_external() reads it there.
+        """
+        files = self.storage.target_files(changes)
+        ok = self.storage.write(games, changes)
+        with self._lock:
+            if not ok:
+                # Memory and disk now differ, the snapshot cache must not be refreshed
+                self._write_failed = True
+            else:
+                self._disk_stats = self._restat(files)
+                if self._cache is not None:
+                    self._cache.mark_synced(self._disk_stats)
+        return ok
     
-    def add_game(self, game_data: Dict[str, Any]) -> bool:
-        """Add a new game to the library"""
-        # Check if game already exists
-        if self.get_game_by_path(game_data.get("path", "")):
+    def _restat(self, files: Iterable[str]) -> list:
+        """Source file stats with only the given files read again
+        
+        Files of shards not written keep their recorded stats, a slow
+        drive is only touched when its own library changed.
+        """
+        if self._disk_stats is None:
+            return file_stats(self._sources)
+        files = set(files)
+        return [file_stats([source])[0] if source in files else stat
+                for source, stat in zip(self._sources, self._disk_stats)]
+    
+    def _disk_changed(self, paths: Optional[Iterable[str]] = None) -> bool:
+        """Check if the library files changed since our last load or write
+        
+        With paths (files or folders reported changed) only the source
+        files among or inside them are looked at.
+        """
+        if self._disk_stats is None:
             return False
+        if self.storage.stale():
+            return True
+        if paths is None:
+            return bool(self._sources) and file_stats(self._sources) != self._disk_stats
+        changed = {os.path.abspath(path) for path in paths}
+        files = [source for source in self._sources
+                 if os.path.abspath(source) in changed or os.path.dirname(os.path.abspath(source)) in changed]
+        return self._restat(files) != self._disk_stats
+    
+    @synchronized
+    def check_external(self, paths: Optional[Iterable[str]] = None) -> Optional[LibraryDiff]:
+        """Pick up changes another program made to the library files
+        
+        Only the records that differ from memory are touched. A record
+        also edited here and not written yet is a conflict: the local
+        version is kept and written back over the file. paths limits the
+        files checked for changes to the ones reported (see _disk_changed).
+        Returns None when nothing changed or the files cannot be read
+        right now.
+        """
+        if self.loading or self._hold_writes or self._batch_depth or not self._disk_changed(paths):
+            return None
+        return self._apply_external(self._reconcile())
+    
+    def _catalog_refreshed(self, name: str) -> None:
+        """Apply a new copy of a catalog, called from its refresh thread
+        
+        The copy is read before taking the lock and only that catalog's
+        games are reconciled, the rest of the library is not read again.
+        """
+        if self.loading or self._hold_writes:
+            return
+        files = next(shard for shard in self.shards.shards if shard.name == name).source_files()
+        fresh = dict(zip(files, file_stats(files)))
+        loaded = self.shards.load_shard(name)
+        if loaded is None:
+            return
+        with self._lock:
+            if (self.loading or self._hold_writes or self._batch_depth
+                    or self._disk_stats is None):
+                return
+            stats = [fresh.get(source, stat) for source, stat in zip(self._sources, self._disk_stats)]
+            self._apply_external(self._reconcile(loaded, name, stats))
+    
+    def _apply_external(self, diff: Optional[LibraryDiff]) -> Optional[LibraryDiff]:
+        """Finish check_external() once the files were reconciled, called with the lock held"""
+        if diff is None:
+            return None
+        if self._base or not diff.fields().isdisjoint(COLD_FIELDS):
+            # Local edits win, write them over the merged library; cold
+            # fields added to the file were moved out and must go from it too
+            self._write(None)
+        if diff:
+            self._notify(diff)
+        return diff
+    
+    def _notify(self, diff: LibraryDiff) -> None:
+        if self.on_external_change is not None:
+            self.on_external_change(diff)
+    
+    def _reconcile(self, loaded: Optional[List[Dict[str, Any]]] = None, owner: Optional[str] = None,
+                   stats: Optional[list] = None) -> Optional[LibraryDiff]:
+        """Apply the on-disk library to memory record by record
+        
+        loaded and stats, if given, were read beforehand from the shard
+        named owner, and only its games are compared with them.
+        """
+        if loaded is None:
+            stats = file_stats(self._sources)
+            loaded = self.storage.load()
+            if loaded is None:
+                # Probably caught half written, the next change retries
+                return None
+        disk = [GameRecord.with_defaults(g) for g in loaded if isinstance(g, dict)]
+        self._dedupe_ids(disk)
+        on_disk = {g["id"]: g for g in disk}
+        
+        diff = LibraryDiff()
+        moved = {g["id"]: set(cold_fields(g)) for g in disk
+                 if g["id"] not in self._base and cold_fields(g)}
+        if moved:
+            self._move_details([on_disk[game_id] for game_id in moved])
+        removed = []
+        for game in self.games:
+            if owner is not None and (game.get(SHARD_FIELD) or "") != owner:
+                continue
+            game_id = game.get("id")
+            other = on_disk.pop(game_id, None)
+            if game_id in self._base:
+                if (dict(other) if other is not None else None) != self._base[game_id]:
+                    diff.conflicts.append(game_id)
+                continue
+            if other is None:
+                removed.append(game)
+                continue
+            fields = changed_fields(game, other)
+            if game_id in moved:
+                diff.changed[game_id] = set(moved[game_id])
+            if fields:
+                indexes = self._indexes_for(fields)
+                self._unindex_game(game, indexes)
+                game.clear()
+                game.update(other)
+                self._index_game(game, indexes)
+                diff.changed.setdefault(game_id, set()).update(fields)
+        
+        if removed:
+            for game in removed:
+                self._unindex_game(game)
+                diff.removed.append(game.get("id"))
+            gone = {id(g) for g in removed}
+            self.games = [g for g in self.games if id(g) not in gone]
+        
+        renamed = False
+        for game_id, game in on_disk.items():
+            if game_id in self._base:
+                # Deleted or renamed here, the local change wins
+                if dict(game) != self._base[game_id]:
+                    diff.conflicts.append(game_id)
+                continue
+            if owner is not None and game_id in self._by_id:
+                # Taken by a game of another library file, renamed as on a full load
+                game["id"] = game_id = self._unique_id(game_id)
+                renamed = True
+            self.games.append(game)
+            self._index_game(game)
+            diff.added.append(game_id)
+        
+        self._disk_stats = stats
+        if renamed:
+            self._write(None)
+        elif not self._base and self._cache is not None:
+            self._cache.mark_synced(stats)
+        return diff
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every pending background write has reached the disk"""
+        if self._writer is None:
+            return True
+        return self._writer.flush(timeout)
+    
+    def writer_metrics(self) -> Optional[Dict[str, Any]]:
+        """Get background writer statistics (pending writes, last write duration)"""
+        if self._writer is None:
+            return None
+        return self._writer.metrics()
+    
+    @contextmanager
+    def batch(self) -> Iterator["Database"]:
+        """Group mutations into one transaction
+        
+        Nothing is written until the outermost batch exits. If the block
+        raises, every change made inside it is rolled back in memory.
+        """
+        self._lock.acquire()
+        try:
+            outermost = self._batch_depth == 0
+            if outermost:
+                self._batch_games = list(self.games)
+                self._batch_records = {}
+                self._batch_base = set(self._base)
+                self._batch_details = {}
+                self._batch_sessions = []
+                self._pending = []
+                self._pending_full = False
+            self._batch_depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._batch_depth -= 1
+                if outermost:
+                    self._rollback()
+                raise
+            self._batch_depth -= 1
+            if outermost:
+                self._last_commit_ok = self._commit()
+        finally:
+            self._lock.release()
+    
+    def _remember(self, game: Dict[str, Any]) -> None:
+        """Keep a copy of a record before it is edited, for rollback and conflict checks"""
+        self._track(game.get("id"), game)
+        if self._batch_depth and id(game) not in self._batch_records:
+            self._batch_records[id(game)] = (game, dict(game))
+    
+    def _track(self, game_id: str, game: Optional[Dict[str, Any]]) -> None:
+        """Note the last written state of a record about to change here"""
+        if game_id not in self._base:
+            self._base[game_id] = dict(game) if game is not None else None
+    
+    def _change_sessions(self, change: Callable[[], bool]) -> None:
+        """Run a play history change now, or once the running batch has committed
+        
+        The session store has no rollback, so a batch that fails must not
+        have renamed or deleted anything in it.
+        """
+        if self._batch_depth:
+            self._batch_sessions.append(change)
+        else:
+            change()
+    
+    def _remember_details(self, game_id: str) -> None:
+        """Keep the stored cold fields of a game before they change inside a batch"""
+        if self._batch_depth and game_id not in self._batch_details:
+            # Games not in the library yet have nothing stored
+            self._batch_details[game_id] = self.details.get(game_id) if game_id in self._by_id else {}
+    
+    def _commit(self) -> bool:
+        """Write everything collected by the finished batch"""
+        changes, full = self._pending, self._pending_full
+        self._pending, self._pending_full = [], False
+        self._batch_games, self._batch_records = [], {}
+        self._batch_details = {}
+        ok = True
+        if full:
+            ok = self._write(None)
+        elif changes:
+            ok = self._write(changes)
+        sessions, self._batch_sessions = self._batch_sessions, []
+        for change in sessions:
+            change()
+        return ok
+    
+    def _rollback(self) -> None:
+        """Restore the library as it was when the batch started"""
+        for game, original in self._batch_records.values():
+            game.clear()
+            game.update(original)
+        self.games = self._batch_games
+        self._pending, self._pending_full = [], False
+        self._batch_games, self._batch_records = [], {}
+        # The detail store is written right away, put the old values back
+        for game_id, original in self._batch_details.items():
+            current = self.details.get(game_id)
+            self.details.put(game_id, {field: original.get(field, "")
+                                       for field in current.keys() | original.keys()})
+            self.text_index.set_notes(game_id, original.get("notes", ""))
+        self._batch_details = {}
+        # The session store was not touched yet, its changes are just dropped
+        self._batch_sessions = []
+        # Records only touched by the rolled back batch are back to their written state
+        for game_id in set(self._base) - self._batch_base:
+            del self._base[game_id]
+        self._rebuild_indexes()
+    
+    def close(self) -> None:
+        """Flush pending writes and close the storage engine, once"""
+        if self._closed:
+            return
+        self._closed = True
+        if self.sync is not None:
+            # No session may start once the stores close
+            self.sync.close()
+        if self._history_thread is not None:
+            self._history_thread.join()
+            self._history_thread = None
+        if self._writer is not None:
+            self._writer.stop()
+            self._writer = None
+        if not self._write_failed:
+            # Needs the detail store, closed below
+            self.take_snapshot("shutdown")
+        self.storage.close()
+        self.sessions.close()
+        self.details.close()
+        # Memory matches the files only after a complete load and clean writes
+        if (self._cache is not None and self.load_ok and not self._hold_writes
+                and not self._write_failed
+                and (self.shards is None or self.shards.complete())):
+            self._cache.save(self.games)
+    
+    @staticmethod
+    def _dedupe_ids(games: List[Dict[str, Any]]) -> bool:
+        """Give games sharing an id a stable unique suffix, return True if any changed"""
+        seen = set()
+        renamed = False
+        for game in games:
+            game_id = game["id"]
+            suffix = 1
+            while game_id in seen:
+                game_id = f"{game['id']}_{suffix}"
+                suffix += 1
+            if game_id != game["id"]:
+                game["id"] = game_id
+                renamed = True
+            seen.add(game_id)
+        return renamed
+    
+    def _unique_id(self, game_id: str) -> str:
+        """Return game_id, suffixed if another game already uses it"""
+        candidate = game_id
+        suffix = 1
+        while candidate in self._by_id:
+            candidate = f"{game_id}_{suffix}"
+            suffix += 1
+        return candidate
+    
+    def _rebuild_indexes(self) -> None:
+        """Rebuild all indexes from scratch"""
+        self._by_id.clear()
+        self._by_path.clear()
+        self._path_keys.clear()
+        self._generation += 1
+        for index in self._indexes:
+            index.clear()
+        for game in self.games:
+            self._index_game(game)
+    
+    def _index_game(self, game: Dict[str, Any], indexes: Optional[List[Any]] = None) -> None:
+        """Add a game to the id and path indexes and to the secondary indexes"""
+        game_id = game.get("id")
+        key = normalize_path(game.get("path", ""))
+        self._by_id.setdefault(game_id, game)
+        self._by_path.setdefault(key, game)
+        self._path_keys[game_id] = key
+        self._generation += 1
+        for index in self._indexes if indexes is None else indexes:
+            index.add(game)
+    
+    def _unindex_game(self, game: Dict[str, Any], indexes: Optional[List[Any]] = None) -> None:
+        """Remove a game from the id and path indexes and from the secondary indexes"""
+        game_id = game.get("id")
+        # Use the key stored at index time, the record may have been edited in place
+        key = self._path_keys.pop(game_id, None)
+        if self._by_id.get(game_id) is game:
+            del self._by_id[game_id]
+        if key is not None and self._by_path.get(key) is game:
+            del self._by_path[key]
+        self._generation += 1
+        for index in self._indexes if indexes is None else indexes:
+            index.discard(game_id)
+    
+    def _indexes_for(self, fields: Iterable[str]) -> List[Any]:
+        """Get the secondary indexes that depend on any of the given fields"""
+        if "id" in fields:
+            return self._indexes
+        return [index for index in self._indexes if not index.FIELDS.isdisjoint(fields)]
+    
+    def _add(self, game_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Add a game in memory, returning the stored record or None if it already exists"""
+        if self.get_game_by_path(game_data.get("path", "")):
+            return None
         
-        game = game_data.copy()
-        self._ensure_game_fields(game)
+        game = GameRecord.with_defaults(game_data)
+        if not self.storage.claim(game):
+            return None
+        game["id"] = self._unique_id(game["id"])
+        self._track(game["id"], None)
+        self._move_details([game])
         self.games.append(game)
-        return self.save()
+        self._index_game(game)
+        return game
+    
+    def _update(self, game: Dict[str, Any], updates: Dict[str, Any]) -> Optional[List[Change]]:
+        """Apply updates in memory, returning the changes to persist or None if refused"""
+        game_id = game.get("id")
+        if "path" in updates:
+            # Refuse to turn this game into a duplicate of another one
+            other = self.get_game_by_path(updates["path"])
+            if other is not None and other is not game:
+                return None
+        if "id" in updates and updates["id"] != game_id and updates["id"] in self._by_id:
+            return None
+        
+        details = cold_fields(updates)
+        if details or ("id" in updates and updates["id"] != game_id):
+            leftover = any(field in game for field in details)
+            if not self._update_details(game, updates.get("id", game_id), details):
+                return None
+            updates = {k: v for k, v in updates.items() if k not in details}
+            if not updates:
+                return [("put", game)] if leftover else []
+        
+        self._remember(game)
+        if "id" in updates and updates["id"] != game_id:
+            self._track(updates["id"], None)
+            self._change_sessions(functools.partial(self.sessions.rename_game, game_id, updates["id"]))
+        indexes = self._indexes_for(updates)
+        self._unindex_game(game, indexes)
+        game.update(updates)
+        self._index_game(game, indexes)
+        if game.get("id") != game_id:
+            return [("delete", game_id), ("put", game)]
+        return [("update", game, dict(updates))]
+    
+    def _update_details(self, game: Dict[str, Any], new_id: str, details: Dict[str, Any]) -> bool:
+        """Write cold field updates to the detail store, following an id change"""
+        game_id = game.get("id")
+        self._remember_details(game_id)
+        if new_id != game_id:
+            self._remember_details(new_id)
+            if not self.details.rename(game_id, new_id):
+                return False
+            self.text_index.set_notes(game_id, "")
+            self.text_index.set_notes(new_id, self.details.get(new_id).get("notes", ""))
+        if details:
+            if not self.details.put(new_id, details):
+                return False
+            if "notes" in details:
+                self.text_index.set_notes(new_id, details["notes"])
+            # Left over from a failed move, the store has the current value now
+            for field in details:
+                if field in game:
+                    self._remember(game)
+                    del game[field]
+        return True
+    
+    @synchronized
+    def add_game(self, game_data: Dict[str, Any]) -> bool:
+        """Add a new game to the library"""
+        game = self._add(game_data)
+        if game is None:
+            return False
+        return self._persist([("put", game)])
     
+    @synchronized
+    def add_games(self, games_data: Iterable[Dict[str, Any]]) -> int:
+        """Add several games in one write, returning how many were new"""
+        changes = []
+        with self.batch():
+            for game_data in games_data:
+                game = self._add(game_data)
+                if game is not None:
+                    changes.append(("put", game))
+            self._persist(changes)
+        return len(changes)
+    
+    @synchronized
     def update_game(self, game_id: str, updates: Dict[str, Any]) -> bool:
         """Update an existing game"""
         game = self.get_game_by_id(game_id)
         if game:
-            game.update(updates)
-            return self.save()
+            changes = self._update(game, updates)
+            if changes is None:
+                return False
+            return self._persist(changes)
         return False
     
+    @synchronized
+    def update_many(self, game_ids: Iterable[str], updates: Dict[str, Any]) -> int:
+        """Apply the same updates to several games in one write, returning how many changed"""
+        changes = []
+        updated = 0
+        with self.batch():
+            for game_id in game_ids:
+                game = self.get_game_by_id(game_id)
+                if game is None:
+                    continue
+                # Give every record its own copy of list values such as tags
+                own = {k: list(v) if isinstance(v, list) else v for k, v in updates.items()}
+                result = self._update(game, own)
+                if result is not None:
+                    changes.extend(result)
+                    updated += 1
+            self._persist(changes)
+        return updated
+    
+    def set_favorite(self, game_ids: Iterable[str], favorite: bool = True) -> int:
+        """Mark or unmark several games as favorites"""
+        return self.update_many(game_ids, {"favorite": favorite})
+    
+    def add_tags(self, game_ids: Iterable[str], tags: List[str]) -> int:
+        """Add tags to several games"""
+        return self._retag(game_ids, lambda current: current + [t for t in tags if t not in current])
+    
+    def remove_tags(self, game_ids: Iterable[str], tags: List[str]) -> int:
+        """Remove tags from several games"""
+        return self._retag(game_ids, lambda current: [t for t in current if t not in tags])
+    
+    @synchronized
+    def _retag(self, game_ids: Iterable[str], transform) -> int:
+        """Replace the tags of several games in one write"""
+        changes = []
+        with self.batch():
+            for game_id in game_ids:
+                game = self.get_game_by_id(game_id)
+                if game is None:
+                    continue
+                current = game.get("tags", [])
+                new_tags = transform(current)
+                if new_tags != current:
+                    changes.extend(self._update(game, {"tags": new_tags}))
+            self._persist(changes)
+        return len(changes)
+    
+    @synchronized
     def remove_game(self, game_id: str) -> bool:
         """Remove a game from the library"""
-        self.games = [g for g in self.games if g.get("id") != game_id]
-        return self.save()
+        game = self._by_id.get(game_id)
+        if game is not None:
+            self._track(game_id, game)
+            self._remove_details([game_id])
+            self._unindex_game(game)
+            self.games.remove(game)
+        ok = self._persist([("delete", game_id)])
+        if game is not None:
+            self._change_sessions(functools.partial(self.sessions.remove_games, [game_id]))
+        return ok
+    
+    @synchronized
+    def remove_many(self, game_ids: Iterable[str]) -> int:
+        """Remove several games in one pass and one write"""
+        removed = [self._by_id[game_id] for game_id in set(game_ids) if game_id in self._by_id]
+        if not removed:
+            return 0
+        
+        self._remove_details([g.get("id") for g in removed])
+        for game in removed:
+            self._track(game.get("id"), game)
+            self._unindex_game(game)
+        gone = {id(g) for g in removed}
+        self.games = [g for g in self.games if id(g) not in gone]
+        self._persist([("delete", g.get("id")) for g in removed])
+        self._change_sessions(functools.partial(self.sessions.remove_games,
+                                                [g.get("id") for g in removed]))
+        return len(removed)
     
+    def _remove_details(self, game_ids: List[str]) -> None:
+        for game_id in game_ids:
+            self._remember_details(game_id)
+            self.text_index.set_notes(game_id, "")
+        self.details.remove_games(game_ids)
+    
+    @shared
     def get_game_by_id(self, game_id: str) -> Optional[Dict[str, Any]]:
         """Get game by ID"""
-        for game in self.games:
-            if game.get("id") == game_id:
-                return game
-        return None
+        return self._by_id.get(game_id)
     
+    @shared
+    def get_details(self, game_id: str) -> Dict[str, Any]:
+        """Get the cold fields of a game (notes), read from the detail store"""
+        details = {field: "" for field in COLD_FIELDS}
+        details.update(self.details.get(game_id))
+        game = self._by_id.get(game_id)
+        if game is not None:
+            details.update(cold_fields(game))
+        return details
+    
+    @shared
     def get_game_by_path(self, path: str) -> Optional[Dict[str, Any]]:
-        """Get game by executable path"""
-        for game in self.games:
-            if game.get("path") == path:
-                return game
-        return None
+        """Get game by executable path (case, separators and shortcuts are normalized)"""
+        return self._by_path.get(normalize_path(path))
     
-    def get_all_games(self) -> List[Dict[str, Any]]:
-        """Get all games"""
-        return self.games.copy()
+    def _current_snapshot(self) -> LibrarySnapshot:
+        """Get the snapshot of the current generation, called with the lock held"""
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.generation != self._generation:
+            snapshot = self._snapshot = LibrarySnapshot(self._generation, self.games)
+        return snapshot
     
-    def search_games(self, query: str) -> List[Dict[str, Any]]:
-        """Search games by name"""
-        query = query.lower()
-        return [g for g in self.games if query in g.get("name", "").lower()]
+    @shared
+    def snapshot(self) -> LibrarySnapshot:
+        """Get an immutable view of the library as it is now"""
+        return self._current_snapshot()
     
-    def filter_games(self, favorites_only: bool = False, tags: List[str] = None) -> List[Dict[str, Any]]:
-        """Filter games by criteria"""
-        filtered = self.games.copy()
-        
-        if favorites_only:
-            filtered = [g for g in filtered if g.get("favorite", False)]
+    @shared
+    def get_all_games(self) -> Tuple[Dict[str, Any], ...]:
+        """Get all games, as a tuple shared by every caller until the library changes"""
+        return self._current_snapshot().games
+    
+    @shared
+    def search_games(self, query: str, limit: int = 0) -> List[Dict[str, Any]]:
+        """Fuzzy search over name, notes and tags, best matches first"""
+        return [self._by_id[game_id] for game_id, _ in self.text_index.search(query, limit)
+                if game_id in self._by_id]
+    
+    @shared
+    def filter_games(self, favorites_only: bool = False, tags: List[str] = None,
+                     match_all: bool = False) -> List[Dict[str, Any]]:
+        """Filter games by criteria, tags match any (or all) of the given ones"""
+        if not favorites_only and not tags:
+            return list(self._current_snapshot().games)
         
-        if tags:
-            filtered = [g for g in filtered if any(t in g.get("tags", []) for t in tags)]
+        # Bitmap order is ordinal order, keep library order instead
+        ids = self.filter_ids(favorites_only, tags, match_all)
+        return [g for g in self.games if g.get("id") in ids]
+    
+    @shared
+    def filter_ids(self, favorites_only: bool = False, tags: List[str] = None,
+                   match_all: bool = False) -> Set[str]:
+        """Get the ids matching a tag/favorite filter using the bitmap indexes"""
+        return set(self.ordinals.ids(self._filter_bitmap(favorites_only, tags, match_all)))
+    
+    def _filter_bitmap(self, favorites_only: bool, tags: Optional[List[str]], match_all: bool) -> Bitmap:
+        tags = tags or []
+        return self.tag_index.select(
+            all_tags=tags if match_all else (),
+            any_tags=() if match_all else tags,
+            favorite=True if favorites_only else None
+        )
+    
+    @shared
+    def filter_mask(self, columns: ColumnarSnapshot, favorites_only: bool = False,
+                    tags: List[str] = None, match_all: bool = False):
+        """Row mask of a column view for a tag/favorite filter, from the bitmap indexes"""
+        if columns.generation != self._generation or columns.ordinals is None:
+            return columns.ids_mask(self.filter_ids(favorites_only, tags, match_all))
+        return columns.bitmap_mask(self._filter_bitmap(favorites_only, tags, match_all))
+    
+    def compile_query(self, text: str) -> Query:
+        """Parse a search box query, reusing recently compiled ones"""
+        with self._queries_lock:
+            query = self._queries.get(text)
+        if query is None:
+            query = parse_query(text)
+            with self._queries_lock:
+                if len(self._queries) >= 64:
+                    self._queries.clear()
+                query = self._queries.setdefault(text, query)
+        return query
+    
+    @shared
+    def query(self, text: str) -> List[Dict[str, Any]]:
+        """Run a query such as 'tag:rpg fav:yes playtime>10h last:<30d "xenoverse"'"""
+        return self.compile_query(text).execute(self)
+    
+    @shared
+    def explain(self, text: str) -> str:
+        """Describe the plan used for a query, for debugging slow searches"""
+        return self.compile_query(text).explain(self)
+    
+    @synchronized
+    def set_collections(self, definitions: Iterable[Dict[str, str]]) -> List[str]:
+        """Define the smart collections from {"name", "query"} entries, as kept in config
         
-        return filtered
+        Each query uses the search box language and must be decidable one
+        game at a time: plain words (fuzzy search) are refused. Returns
+        the names of the collections that were accepted.
+        """
+        queries: Dict[str, Query] = {}
+        for definition in definitions:
+            name = definition.get("name", "")
+            query = parse_query(definition.get("query", ""))
+            if not name or not query.clauses:
+                print(f"Ignoring smart collection {name!r}: empty name or query")
+            elif not query.local():
+                print(f"Ignoring smart collection {name!r}: fuzzy search is not supported")
+            else:
+                queries[name] = query
+        self.collections.define(queries, self.games)
+        return list(queries)
+    
+    @shared
+    def collection_ids(self, name: str) -> Set[str]:
+        """Get the ids of the games in a smart collection"""
+        self.collections.refresh()
+        return self.collections.members(name)
+    
+    @shared
+    def get_collection(self, name: str, by: str = "name", reverse: bool = False) -> List[Dict[str, Any]]:
+        """Get the games in a smart collection, sorted"""
+        ids = self.collection_ids(name)
+        return [g for g in self._sorted_view(by, reverse) if g.get("id") in ids]
+    
+    @shared
+    def get_collection_counts(self) -> Dict[str, int]:
+        """Get the number of games in every smart collection, in definition order"""
+        self.collections.refresh()
+        return self.collections.counts()
     
     def sort_games(self, by: str = "name", reverse: bool = False) -> List[Dict[str, Any]]:
         """Sort games by specified field"""
-        sort_keys = {
-            "name": lambda g: g.get("name", "").lower(),
-            "playtime": lambda g: g.get("playtime", 0),
-            "last_played": lambda g: g.get("last_played", 0),
-            "added": lambda g: g.get("added", 0)
-        }
+        return list(self._sorted_view(by, reverse))
+    
+    def iter_sorted(self, by: str = "name", reverse: bool = False) -> Iterator[Dict[str, Any]]:
+        """Iterate games in the order kept by a sorted index (name, playtime, last_played, added)"""
+        return iter(self._sorted_view(by, reverse))
+    
+    @shared
+    def _sorted_view(self, by: str, reverse: bool) -> Tuple[Dict[str, Any], ...]:
+        """Get the snapshot's games in sorted order, built on first use"""
+        if by not in self.sorted_indexes:
+            by = "name"
+        snapshot = self._current_snapshot()
+        view = snapshot.sorted.get((by, reverse))
+        if view is None:
+            by_id = self._by_id
+            view = tuple(by_id[game_id] for game_id in self.sorted_indexes[by].ids(reverse)
+                         if game_id in by_id)
+            snapshot.sorted[(by, reverse)] = view
+        return view
+    
+    @shared
+    def order_games(self, games: List[Dict[str, Any]], by: str = "name",
+                    reverse: bool = False) -> List[Dict[str, Any]]:
+        """Order a subset of the library using the cached sort keys"""
+        index = self.sorted_indexes.get(by, self.sorted_indexes["name"])
+        if len(games) * 8 >= len(index):
+            # Large subsets: walk the sorted view and keep the members
+            wanted = {g.get("id") for g in games}
+            return [self._by_id[game_id] for game_id in index.ids(reverse) if game_id in wanted]
+        entries = index._entries
+        return sorted(games, key=lambda g: entries[g.get("id")], reverse=reverse)
+    
+    @shared
+    def columns(self) -> Optional[ColumnarSnapshot]:
+        """Get the NumPy column view of the library, or None without NumPy
         
-        key_func = sort_keys.get(by, sort_keys["name"])
-        return sorted(self.games, key=key_func, reverse=reverse)
+        The snapshot is brought up to date lazily. Edits to games already
+        in it only patch their rows, adding or removing games rebuilds it.
+        """
+        if not HAS_NUMPY:
+            return None
+        with self._columns_lock:
+            columns, changes = self._columns, self._column_changes
+            if columns is None or columns.generation != self._generation:
+                name_index = self.sorted_indexes["name"]
+                if columns is None or changes.rebuild or changes.removed or not columns.covers(changes.games):
+                    columns = ColumnarSnapshot(self.games, self._generation, name_index.ids(),
+                                               self.ordinals.ordinal)
+                else:
+                    columns = columns.patched(changes.games, self._generation, name_index.ids)
+                changes.reset()
+                self._columns = columns
+            return columns
     
+    @synchronized
     def update_playtime(self, game_id: str, seconds: int) -> bool:
         """Update game playtime"""
         game = self.get_game_by_id(game_id)
         if game:
-            game["playtime"] = game.get("playtime", 0) + seconds
-            game["last_played"] = int(time.time())
-            return self.save()
+            return self._add_playtime(game, seconds, int(time.time()))
         return False
     
+    def _add_playtime(self, game: Dict[str, Any], seconds: int, last_played: int) -> bool:
+        self._remember(game)
+        indexes = self._indexes_for(("playtime", "last_played"))
+        self._unindex_game(game, indexes)
+        game["playtime"] = game.get("playtime", 0) + seconds
+        game["last_played"] = last_played
+        self._index_game(game, indexes)
+        return self._persist([("playtime", game, seconds)])
+    
+    @synchronized
+    def record_session(self, game_id: str, start: float, end: float,
+                       exit_code: Optional[int] = None) -> bool:
+        """Store a finished play session and add its length to the game's playtime"""
+        game = self.get_game_by_id(game_id)
+        if game is None:
+            return False
+        start, end = int(start), int(end)
+        if not self.sessions.add_session(game_id, start, end, exit_code):
+            return False
+        return self._add_playtime(game, end - start, end)
+    
+    def get_recent_sessions(self, game_id: Optional[str] = None, limit: int = 10) -> List[Dict[str, Any]]:
+        """Get the latest sessions (start, end, duration, exit_code), newest first"""
+        return self.sessions.recent_sessions(game_id, limit)
+    
+    def get_playtime_by_game(self, days: int = 30) -> Dict[str, int]:
+        """Get seconds played per game over the last days, from the daily rollup"""
+        return self.sessions.playtime_by_game(days)
+    
+    def get_daily_playtime(self, game_id: Optional[str] = None, days: int = 30) -> List[Tuple[str, int, int]]:
+        """Get (day, seconds, sessions) for the last days, for one game or the library"""
+        return self.sessions.daily(game_id, days)
+    
+    def get_weekly_playtime(self, game_id: Optional[str] = None, weeks: int = 12) -> List[Tuple[str, int, int]]:
+        """Get (week start, seconds, sessions) for the last weeks, for one game or the library"""
+        return self.sessions.weekly(game_id, weeks)
+    
+    def get_sessions_by_weekday(self, game_id: Optional[str] = None) -> List[Tuple[int, int]]:
+        """Get (sessions, seconds) per weekday, Monday first"""
+        return self.sessions.by_weekday(game_id)
+    
+    def get_play_history(self, game_id: str) -> Dict[str, Any]:
+        """Summarize a game's sessions for the details panel"""
+        sessions, seconds = self.sessions.totals(game_id)
+        return {
+            "sessions": sessions,
+            "recorded": seconds,
+            "last_30_days": sum(s for _, s, _ in self.sessions.daily(game_id, 30)),
+            "weekly": self.sessions.weekly(game_id, 8),
+            "recent": self.sessions.recent_sessions(game_id, 5)
+        }
+    
     def get_total_playtime(self) -> int:
         """Get total playtime across all games"""
-        return sum(g.get("playtime", 0) for g in self.games)
+        return self.stats_index.total_playtime
     
-    def export_library(self, filepath: str) -> bool:
-        """Export library to file"""
-        try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(self.games, f, indent=4, ensure_ascii=False)
-            return True
-        except IOError as e:
-            print(f"Error exporting library: {e}")
+    @shared
+    def get_stats(self, game_ids: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """Get count, played/unplayed, total playtime and most recent last_played
+        
+        Without game_ids the running library totals are returned as is,
+        otherwise the subset is aggregated from the index's cached values.
+        """
+        if game_ids is not None:
+            return self.stats_index.aggregate(game_ids)
+        stats = self.stats_index
+        return {
+            "count": stats.count,
+            "played": stats.played,
+            "unplayed": stats.count - stats.played,
+            "total_playtime": stats.total_playtime,
+            "last_played": self.sorted_indexes["last_played"].last_key(0)
+        }
+    
+    @shared
+    def library_status(self) -> List[Dict[str, Any]]:
+        """Get name, path, status, game count and error of every library file
+        
+        Empty without extra libraries. The main library has an empty name.
+        """
+        if self.shards is None:
+            return []
+        counts = Counter(g.get(SHARD_FIELD) or "" for g in self.games)
+        return [{"name": shard.name, "path": shard.path, "status": shard.status,
+                 "games": counts[shard.name],
+                 # A catalog stays online on its cached copy when the share is unreachable
+                 "error": shard.error or getattr(shard.storage, "error", "")}
+                for shard in self.shards.shards]
+    
+    @shared
+    def get_tag_stats(self) -> Dict[str, Tuple[int, int]]:
+        """Get (game count, total playtime) per tag"""
+        return self.stats_index.tag_stats()
+    
+    def backup_records(self) -> List[Dict[str, Any]]:
+        """The library as backups hold it"""
+        games = self.snapshot().games
+        # Backups are complete records, cold fields included
+        details = self.details.all()
+        if details:
+            games = [dict(g, **details[g.get("id")]) if g.get("id") in details else g
+                     for g in games]
+        if self.shards is not None:
+            # Which file holds a game only means something on this machine
+            games = [{k: v for k, v in g.items() if k != SHARD_FIELD} if SHARD_FIELD in g else g
+                     for g in games]
+        return list(games)
+    
+    def export_library(self, filepath: str, progress: Optional[ProgressCallback] = None) -> bool:
+        """Export library to file, streaming one record at a time
+        
+        progress is called with (exported, total) and may return False
+        to cancel, leaving any existing file at filepath untouched.
+        """
+        return write_backup(filepath, self.backup_records(), progress)
+    
+    def take_snapshot(self, reason: str = "manual") -> bool:
+        """Add the library as it is now to the history, unless nothing changed
+        
+        Skipped while loading or with a library file offline, the games
+        missing from memory would be recorded as removed.
+        """
+        if (self.history is None or self.loading or not self.load_ok
+                or (self.shards is not None and not self.shards.complete())):
+            return False
+        return self.history.take(self.backup_records(), reason)
+    
+    def auto_snapshot(self) -> bool:
+        """Take the daily snapshot in the background if the last one is a day old
+        
+        Returns True if one was started. When none is due the newest
+        snapshot is read instead, so the one close() takes stays quick.
+        """
+        if self.history is None or self._closed:
+            return False
+        if self._history_thread is not None and self._history_thread.is_alive():
+            return False
+        due = self.history.due()
+        self._history_thread = threading.Thread(target=self._auto_snapshot, args=(due,),
+                                                name="library-history", daemon=True)
+        self._history_thread.start()
+        return due
+    
+    def _auto_snapshot(self, due: bool) -> None:
+        if due:
+            self.take_snapshot("daily")
+        else:
+            self.history.prime()
+    
+    def restore_snapshot(self, snapshot_time: int,
+                         progress: Optional[ProgressCallback] = None) -> bool:
+        """Replace the library with the history snapshot taken at snapshot_time
+        
+        The library is snapshotted first, so a restore can be undone.
+        Runs like a replacing import_library(), see last_import.
+        """
+        self.last_import = None
+        games = self.history.restore(snapshot_time) if self.history is not None else None
+        if games is None:
             return False
+        self.take_snapshot("restore")
+        total = len(games)
+        return self._import(((game, n, total) for n, game in enumerate(games, start=1)),
+                            False, progress)
     
-    def import_library(self, filepath: str, merge: bool = True) -> bool:
-        """Import library from file"""
+    def import_library(self, filepath: str, merge: bool = True,
+                       progress: Optional[ProgressCallback] = None,
+                       batch_size: int = 500, workers: int = 8) -> bool:
+        """Import library from file
+        
+        The file is parsed one record at a time. With merge, records are
+        upserted by id, then path: playtime and last_played keep the larger
+        value and tags are combined (see merge_record). Otherwise the
+        library is replaced. Executable and cover paths are checked on a
+        worker pool. progress is called with (bytes read, file size) and
+        may return False to cancel, which rolls the whole import back.
+        Counts and per-record problems are left in last_import.
+        """
+        return self._import(iter_backup(filepath), merge, progress, batch_size, workers)
+    
+    @synchronized
+    def _import(self, records: Iterable[Tuple[Any, int, int]], merge: bool,
+                progress: Optional[ProgressCallback], batch_size: int = 500,
+                workers: int = 8) -> bool:
+        """Import (record, done, total) tuples, see import_library()"""
+        report = self.last_import = ImportReport()
+        replacement: List[GameRecord] = []
+        position = 0
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                imported = json.load(f)
-            
-            if not isinstance(imported, list):
-                return False
-            
-            if merge:
-                # Merge with existing, skip duplicates
-                existing_paths = {g.get("path") for g in self.games}
-                for game in imported:
-                    if game.get("path") not in existing_paths:
-                        self._ensure_game_fields(game)
-                        self.games.append(game)
-            else:
-                # Replace entirely
-                self.games = imported
-                for game in self.games:
-                    self._ensure_game_fields(game)
-            
-            return self.save()
-        except (json.JSONDecodeError, IOError) as e:
+            with ThreadPoolExecutor(max_workers=workers) as pool, self.batch():
+                for batch in iter_batches(records, batch_size):
+                    valid = []
+                    for game, _, _ in batch:
+                        position += 1
+                        error = record_error(game)
+                        if error is None:
+                            valid.append((position, game))
+                        else:
+                            report.errors.append((position, error))
+                    
+                    games = [game for _, game in valid]
+                    step = max(1, -(-len(games) // workers))
+                    slices = pool.map(check_records, [games[i:i + step] for i in range(0, len(games), step)])
+                    checks = [warnings for part in slices for warnings in part]
+                    for (position, game), warnings in zip(valid, checks):
+                        report.warnings.extend((position, w) for w in warnings)
+                        if merge:
+                            self._merge_imported(game, report, position)
+                        else:
+                            record = GameRecord.with_defaults(game)
+                            if not self.storage.claim(record):
+                                report.errors.append((position, "biblioteca indisponível"))
+                                continue
+                            replacement.append(record)
+                            report.added += 1
+                    
+                    _, read, size = batch[-1]
+                    if progress is not None and not progress(read, size):
+                        raise ImportCancelled()
+                
+                if not merge:
+                    # Replace entirely
+                    self.games = replacement
+                    self._dedupe_ids(self.games)
+                    # Nothing can fail after this point, the old details are not kept
+                    self.details.clear()
+                    self.text_index.clear_notes()
+                    self._move_details(self.games, remember=False)
+                    self._rebuild_indexes()
+                    self.save()
+        except ImportCancelled:
+            report.cancelled = True
+            return False
+        except (json.JSONDecodeError, IOError, OSError) as e:
             print(f"Error importing library: {e}")
+            report.failed = True
             return False
+        
+        if not self._last_commit_ok:
+            report.failed = True
+        return report.ok
     
+    def _merge_imported(self, game: Dict[str, Any], report: ImportReport, position: int) -> None:
+        """Upsert one imported record inside the running import batch"""
+        existing = self.get_game_by_id(game.get("id")) or self.get_game_by_path(game["path"])
+        if existing is None:
+            added = self._add(game)
+            if added is None:
+                # Belongs to a library file that is offline
+                report.errors.append((position, "biblioteca indisponível"))
+                return
+            self._persist([("put", added)])
+            report.added += 1
+            return
+        
+        updates = merge_record(dict(existing, **self.get_details(existing.get("id"))), game)
+        changes = self._update(existing, updates) if updates else None
+        if changes:
+            self._persist(changes)
+            report.updated += 1
+        else:
+            report.unchanged += 1
+    
+    @synchronized
     def reset_stats(self) -> bool:
         """Reset all playtime statistics"""
-        for game in self.games:
-            game["playtime"] = 0
-            game["last_played"] = 0
-        return self.save()
\ No newline at end of file
+        played = [g.get("id") for g in self.games if g.get("playtime") or g.get("last_played")]
+        self.update_many(played, {"playtime": 0, "last_played": 0})
+        return self.sessions.clear() and self._last_commit_ok
\ No newline at end of file
@@ -0,0 +1,121 @@
+"""
+Cold game fields for GxLauncher
+Notes and other long text kept out of the in-memory library records
+"""
+
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+class DetailStore:
+    """Stores one row per game and cold field, read only when asked for
+    
+    Values are kept as JSON text. Empty values are not stored, writing
+    "" or None for a field deletes its row.
+    """
+    
+    def __init__(self, path: str = "details.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS details ("
+                "game_id TEXT NOT NULL, field TEXT NOT NULL, value TEXT NOT NULL, "
+                "PRIMARY KEY (game_id, field))"
+            )
+    
+    def _query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        try:
+            with self._lock:
+                return self.conn.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            print(f"Error reading details: {e}")
+            return []
+    
+    def get(self, game_id: str) -> Dict[str, Any]:
+        """Get the stored cold fields of a game"""
+        rows = self._query("SELECT field, value FROM details WHERE game_id = ?", (game_id,))
+        return {field: json.loads(value) for field, value in rows}
+    
+    def all(self) -> Dict[str, Dict[str, Any]]:
+        """Get the cold fields of every game that has any"""
+        details: Dict[str, Dict[str, Any]] = {}
+        for game_id, field, value in self._query("SELECT game_id, field, value FROM details"):
+            details.setdefault(game_id, {})[field] = json.loads(value)
+        return details
+    
+    def iter_field(self, field: str) -> Iterator[Tuple[str, Any]]:
+        """Yield (game_id, value) for every game with field set"""
+        for game_id, value in self._query(
+                "SELECT game_id, value FROM details WHERE field = ?", (field,)):
+            yield game_id, json.loads(value)
+    
+    def put(self, game_id: str, fields: Dict[str, Any]) -> bool:
+        """Store some cold fields of a game"""
+        return self.put_many([(game_id, fields)])
+    
+    def put_many(self, items: Iterable[Tuple[str, Dict[str, Any]]]) -> bool:
+        """Store the cold fields of several games in one transaction"""
+        stored, deleted = [], []
+        for game_id, fields in items:
+            for field, value in fields.items():
+                if value in ("", None):
+                    deleted.append((game_id, field))
+                else:
+                    stored.append((game_id, field, json.dumps(value, ensure_ascii=False)))
+        try:
+            with self._lock, self.conn:
+                self.conn.executemany(
+                    "DELETE FROM details WHERE game_id = ? AND field = ?", deleted
+                )
+                self.conn.executemany(
+                    "INSERT INTO details (game_id, field, value) VALUES (?, ?, ?) "
+                    "ON CONFLICT(game_id, field) DO UPDATE SET value = excluded.value", stored
+                )
+            return True
+        except sqlite3.Error as e:
+            print(f"Error saving details: {e}")
+            return False
+    
+    def rename(self, old_id: str, new_id: str) -> bool:
+        """Move a game's cold fields to its new id"""
+        try:
+            with self._lock, self.conn:
+                self.conn.execute("DELETE FROM details WHERE game_id = ?", (new_id,))
+                self.conn.execute("UPDATE details SET game_id = ? WHERE game_id = ?",
+                                  (new_id, old_id))
+            return True
+        except sqlite3.Error as e:
+            print(f"Error saving details: {e}")
+            return False
+    
+    def remove_games(self, game_ids: List[str]) -> bool:
+        """Forget the cold fields of removed games"""
+        try:
+            with self._lock, self.conn:
+                self.conn.executemany("DELETE FROM details WHERE game_id = ?",
+                                      ((game_id,) for game_id in game_ids))
+            return True
+        except sqlite3.Error as e:
+            print(f"Error removing details: {e}")
+            return False
+    
+    def clear(self) -> bool:
+        """Forget every cold field"""
+        try:
+            with self._lock, self.conn:
+                self.conn.execute("DELETE FROM details")
+            return True
+        except sqlite3.Error as e:
+            print(f"Error clearing details: {e}")
+            return False
+    
+    def close(self) -> None:
+        try:
+            self.conn.close()
+        except sqlite3.Error as e:
+            print(f"Error closing details: {e}")
\ No newline at end of file
@@ -3,12 +3,14 @@ Dialog windows for GxLauncher
 """
 
 import os
+import threading
+import time
 import webbrowser
 from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel,
                              QPushButton, QLineEdit, QSpinBox, QCheckBox,
                              QFileDialog, QMessageBox, QGroupBox, QComboBox,
-                             QTextEdit, QInputDialog)
-from PyQt6.QtCore import Qt
+                             QTextEdit, QInputDialog, QProgressDialog)
+from PyQt6.QtCore import Qt, pyqtSignal
 from PyQt6.QtGui import QFont
 from core.theme import Theme
 from core.utils import validate_game_path, resolve_shortcut
@@ -195,12 +197,20 @@ class AddGameDialog(QDialog):
 class SettingsDialog(QDialog):
     """Settings dialog"""
     
+    # SyncReport and the host synced with, from the sync thread
+    sync_finished = pyqtSignal(object, str)
+    # Progress (0-1000) and completion of the work run by _run_with_progress()
+    work_progress = pyqtSignal(int)
+    work_finished = pyqtSignal(object, object)
+    
     def __init__(self, config, db, parent=None):
         super().__init__(parent)
         self.config = config
         self.db = db
+        self.sync_finished.connect(self._on_sync_finished)
+        self.work_finished.connect(lambda finish, result: finish(result))
         self.setWindowTitle("Configurações")
-        self.setFixedSize(600, 700)
+        self.setFixedSize(600, 850)
         self._setup_ui()
         self._apply_styles()
     
@@ -252,6 +262,27 @@ class SettingsDialog(QDialog):
         self.auto_update_check.setChecked(self.config.get("auto_check_updates", True))
         func_layout.addWidget(self.auto_update_check)
         
+        self.write_behind_check = QCheckBox("Salvar biblioteca em segundo plano (requer reinício)")
+        self.write_behind_check.setChecked(self.config.get("write_behind", True))
+        func_layout.addWidget(self.write_behind_check)
+        
+        self.history_check = QCheckBox("Guardar versões diárias da biblioteca (requer reinício)")
+        self.history_check.setChecked(self.config.get("library_history", True))
+        func_layout.addWidget(self.history_check)
+        
+        storage_row = QHBoxLayout()
+        storage_row.addWidget(QLabel("Armazenamento (requer reinício):"))
+        self.storage_combo = QComboBox()
+        self.storage_combo.addItem("JSON", "json")
+        self.storage_combo.addItem("JSON + Journal", "journal")
+        self.storage_combo.addItem("SQLite", "sqlite")
+        self.storage_combo.setCurrentIndex(
+            max(0, self.storage_combo.findData(self.config.get("storage_backend", "json")))
+        )
+        storage_row.addWidget(self.storage_combo)
+        storage_row.addStretch()
+        func_layout.addLayout(storage_row)
+        
         func_group.setLayout(func_layout)
         layout.addWidget(func_group)
         
@@ -269,6 +300,19 @@ class SettingsDialog(QDialog):
         restore_btn.clicked.connect(self._restore_library)
         data_layout.addWidget(restore_btn)
         
+        history_btn = QPushButton("🕘 Voltar a uma Versão Anterior")
+        history_btn.setCursor(Qt.CursorShape.PointingHandCursor)
+        history_btn.clicked.connect(self._restore_snapshot)
+        history_btn.setEnabled(self.db.history is not None)
+        data_layout.addWidget(history_btn)
+        
+        self.sync_btn = QPushButton("🔁 Sincronizar Agora")
+        self.sync_btn.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.sync_btn.clicked.connect(self._sync_library)
+        self.sync_btn.setEnabled(self.db.sync is not None and bool(self.config.get("sync_peer")))
+        self.sync_btn.setToolTip(self.config.get("sync_peer", ""))
+        data_layout.addWidget(self.sync_btn)
+        
         reset_btn = QPushButton("🔄 Resetar Estatísticas")
         reset_btn.setCursor(Qt.CursorShape.PointingHandCursor)
         reset_btn.clicked.connect(self._reset_stats)
@@ -349,6 +393,9 @@ class SettingsDialog(QDialog):
         self.config.set("close_on_launch", self.close_on_launch_check.isChecked())
         self.config.set("track_playtime", self.track_playtime_check.isChecked())
         self.config.set("auto_check_updates", self.auto_update_check.isChecked())
+        self.config.set("write_behind", self.write_behind_check.isChecked())
+        self.config.set("library_history", self.history_check.isChecked())
+        self.config.set("storage_backend", self.storage_combo.currentData())
         self.accept()
     
     def _backup_library(self):
@@ -359,11 +406,17 @@ class SettingsDialog(QDialog):
             "JSON Files (*.json)"
         )
         
-        if filepath:
-            if self.db.export_library(filepath):
+        if not filepath:
+            return
+        
+        def done(ok, cancelled):
+            if ok:
                 QMessageBox.information(self, "Sucesso", "Backup criado com sucesso!")
-            else:
+            elif not cancelled:
                 QMessageBox.critical(self, "Erro", "Erro ao criar backup!")
+        
+        self._run_with_progress("Criando backup...",
+                                lambda progress: self.db.export_library(filepath, progress), done)
     
     def _restore_library(self):
         """Restore library"""
@@ -384,11 +437,137 @@ class SettingsDialog(QDialog):
                 return
             
             merge = reply == QMessageBox.StandardButton.Yes
-            
-            if self.db.import_library(filepath, merge):
-                QMessageBox.information(self, "Sucesso", "Biblioteca restaurada!")
-            else:
-                QMessageBox.critical(self, "Erro", "Erro ao restaurar biblioteca!")
+            self._run_with_progress(
+                "Restaurando biblioteca...",
+                lambda progress: self.db.import_library(filepath, merge, progress),
+                self._on_restored
+            )
+    
+    def _restore_snapshot(self):
+        """Restore the library from one of its automatic snapshots"""
+        snapshots = self.db.history.snapshots()
+        if not snapshots:
+            QMessageBox.information(self, "Histórico", "Nenhuma versão anterior guardada ainda.")
+            return
+        
+        reasons = {"shutdown": "ao fechar", "daily": "diária", "restore": "antes de restaurar"}
+        labels = [
+            f"{time.strftime('%d/%m/%Y %H:%M', time.localtime(s['time']))} — "
+            f"{s['games']} jogos ({reasons.get(s['reason'], s['reason'])})"
+            for s in snapshots
+        ]
+        label, ok = QInputDialog.getItem(self, "Histórico", "Restaurar a biblioteca de:",
+                                         labels, 0, False)
+        if not ok:
+            return
+        snapshot = snapshots[labels.index(label)]
+        
+        reply = QMessageBox.question(
+            self, "Confirmar",
+            "Substituir a biblioteca atual por esta versão? A versão atual fica guardada no histórico.",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+        
+        self._run_with_progress(
+            "Restaurando versão...",
+            lambda progress: self.db.restore_snapshot(snapshot["time"], progress),
+            self._on_restored
+        )
+    
+    def _on_restored(self, ok, cancelled):
+        report = self.db.last_import
+        if ok:
+            QMessageBox.information(
+                self, "Sucesso",
+                f"Biblioteca restaurada!\n\n{report.summary()}{self._report_details(report)}"
+            )
+        elif report is not None and report.cancelled:
+            QMessageBox.information(self, "Cancelado", "Restauração cancelada, nada foi alterado.")
+        else:
+            QMessageBox.critical(self, "Erro", "Erro ao restaurar biblioteca!")
+    
+    def _sync_library(self):
+        """Exchange changes with the launcher set in sync_peer"""
+        host, _, port = self.config.get("sync_peer", "").rpartition(":")
+        if not host or not port.isdigit():
+            host, port = self.config.get("sync_peer", ""), self.db.sync.DEFAULT_PORT
+        
+        key = self.config.get("sync_key", "")
+        
+        def run():
+            report = self.db.sync.sync_with(host, int(port), key)
+            try:
+                # Emitting is safe from any thread, the slot runs on the UI thread
+                self.sync_finished.emit(report, host)
+            except RuntimeError:
+                # The dialog was closed meanwhile
+                pass
+        
+        # A session can wait on the network for a while, keep the UI responsive
+        self.sync_btn.setEnabled(False)
+        self.sync_btn.setText("🔁 Sincronizando...")
+        threading.Thread(target=run, name="library-sync-client", daemon=True).start()
+    
+    def _on_sync_finished(self, report, host):
+        self.sync_btn.setText("🔁 Sincronizar Agora")
+        self.sync_btn.setEnabled(True)
+        if report.ok:
+            QMessageBox.information(self, "Sucesso", f"Biblioteca sincronizada!\n\n{report.summary()}")
+        else:
+            QMessageBox.critical(self, "Erro", f"Erro ao sincronizar com {host}:\n{report.error}")
+    
+    def _run_with_progress(self, label, work, done):
+        """Run work(progress) on a worker thread behind a cancellable progress dialog
+        
+        The database is never touched from the UI thread's event handlers
+        while an import holds it. done(result, cancelled) runs on the UI
+        thread once work returns.
+        """
+        dialog = QProgressDialog(label, "Cancelar", 0, 1000, self)
+        dialog.setWindowTitle("Aguarde")
+        dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        dialog.setMinimumDuration(300)
+        # Stays up until the work returns, even at 100%
+        dialog.setAutoReset(False)
+        dialog.setAutoClose(False)
+        dialog.setValue(0)
+        cancelled = threading.Event()
+        dialog.canceled.connect(cancelled.set)
+        self.work_progress.connect(dialog.setValue)
+        
+        def progress(count, total):
+            # Scaled to 0-1000, byte counts can exceed the range of a QProgressBar
+            self.work_progress.emit(int(count * 1000 / total) if total else 1000)
+            return not cancelled.is_set()
+        
+        def finish(result):
+            was_cancelled = cancelled.is_set()
+            self.work_progress.disconnect(dialog.setValue)
+            dialog.canceled.disconnect(cancelled.set)
+            dialog.close()
+            done(result, was_cancelled)
+        
+        def run():
+            result = work(progress)
+            try:
+                self.work_finished.emit(finish, result)
+            except RuntimeError:
+                # The dialog was closed meanwhile
+                pass
+        
+        threading.Thread(target=run, name="library-transfer", daemon=True).start()
+    
+    @staticmethod
+    def _report_details(report, limit=5):
+        """List the first problems found while importing"""
+        problems = [f"Registro {n}: {message}" for n, message in report.errors[:limit]]
+        problems += [f"Registro {n}: {message}" for n, message in report.warnings[:limit - len(problems)]]
+        more = len(report.errors) + len(report.warnings) - len(problems)
+        if more > 0:
+            problems.append(f"... e mais {more} avisos")
+        return "\n\n" + "\n".join(problems) if problems else ""
     
     def _reset_stats(self):
         """Reset all statistics"""
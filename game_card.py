@@ -14,8 +14,10 @@ from core.utils import format_playtime, launch_game
 class GameCard(QWidget):
     """Interactive game card with hover animations"""
     
-    clicked = pyqtSignal(dict)
-    launch_requested = pyqtSignal(dict)
+    clicked = pyqtSignal(object)
+    launch_requested = pyqtSignal(object)
+    # game, start, end, exit code (None if still running when the launcher closed)
+    session_finished = pyqtSignal(object, float, float, object)
     
     def __init__(self, game: dict, config: dict, parent=None):
         super().__init__(parent)
@@ -51,25 +53,25 @@ class GameCard(QWidget):
         card_layout.addWidget(self.cover_label)
         
         # Game name
-        name_label = QLabel(self.game.get("name", "Unknown"))
-        name_label.setWordWrap(True)
-        name_label.setFixedWidth(196)
-        name_label.setMaximumHeight(40)
-        name_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        name_label.setStyleSheet(f"""
+        self.name_label = QLabel(self.game.get("name", "Unknown"))
+        self.name_label.setWordWrap(True)
+        self.name_label.setFixedWidth(196)
+        self.name_label.setMaximumHeight(40)
+        self.name_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.name_label.setStyleSheet(f"""
             color: {Theme.FG};
             font-size: 13px;
             font-weight: 600;
             padding: 4px;
         """)
-        card_layout.addWidget(name_label)
+        card_layout.addWidget(self.name_label)
         
         # Playtime label
-        if self.config.get("show_playtime") and self.game.get("playtime", 0) > 0:
-            time_label = QLabel(f"⏱ {format_playtime(self.game['playtime'])}")
-            time_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            time_label.setStyleSheet(f"color: {Theme.FG_DIM}; font-size: 11px;")
-            card_layout.addWidget(time_label)
+        self.time_label = QLabel()
+        self.time_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.time_label.setStyleSheet(f"color: {Theme.FG_DIM}; font-size: 11px;")
+        card_layout.addWidget(self.time_label)
+        self._update_playtime_label()
         
         # Loading spinner
         self.spinner = QLabel("⏳")
@@ -213,14 +215,24 @@ class GameCard(QWidget):
         if self.process and self.process.poll() is None:
             QTimer.singleShot(1000, self._check_process)
         elif self.start_time:
-            elapsed = int(time.time() - self.start_time)
-            if elapsed > 5:  # Only count if played for more than 5 seconds
-                self.game["playtime"] = self.game.get("playtime", 0) + elapsed
-                self.game["last_played"] = int(time.time())
-            self.start_time = None
-            self.process = None
+            self.finish_session(self.process.returncode if self.process else None)
+    
+    def finish_session(self, exit_code=None):
+        """Report the tracked session so the database can store it"""
+        end = time.time()
+        if end - self.start_time > 5:  # Only count if played for more than 5 seconds
+            self.session_finished.emit(self.game, self.start_time, end, exit_code)
+        self.start_time = None
+        self.process = None
+    
+    def _update_playtime_label(self):
+        playtime = self.game.get("playtime", 0)
+        self.time_label.setText(f"⏱ {format_playtime(playtime)}" if playtime > 0 else "")
+        self.time_label.setVisible(bool(self.config.get("show_playtime")) and playtime > 0)
     
     def update_game_data(self, game: dict):
         """Update card with new game data"""
         self.game = game
+        self.name_label.setText(game.get("name", "Unknown"))
+        self._update_playtime_label()
         self._load_cover()
\ No newline at end of file
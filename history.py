@@ -0,0 +1,273 @@
+"""
+Library history for GxLauncher
+Rolling snapshots of the library stored as compressed deltas
+"""
+
+import json
+import os
+import threading
+import time
+import zlib
+from typing import List, Dict, Optional, Any, Iterable, Tuple
+from core.record import content_hash, to_json
+from core.storage import atomic_dump
+
+# Snapshot contents: records added or changed since the previous one, and ids removed
+Delta = Dict[str, Any]
+
+class LibraryHistory:
+    """Point-in-time copies of the library, each a zlib delta against the one before
+    
+    Every snapshot file holds {"put": [records], "delete": [ids]}. A full
+    snapshot puts every record and starts a new chain; the rest only hold
+    what changed, so a day of play costs a few hundred bytes whatever the
+    library size. A chain is closed with a new full snapshot after
+    MAX_CHAIN deltas or once its deltas outweigh the full one, which
+    bounds what a restore has to replay. index.json lists the snapshots
+    oldest first. Retention keeps everything from the last KEEP_ALL_DAYS,
+    then the newest per day up to KEEP_DAILY_DAYS and per week up to
+    KEEP_WEEKLY_DAYS; a dropped delta is folded into the next snapshot so
+    the ones kept still rebuild exactly. A digest of every record in the
+    newest snapshot is kept in memory, so taking the next one only reads
+    the chain back the first time.
+    """
+    
+    INDEX_FILE = "index.json"
+    DAY_SECONDS = 24 * 60 * 60
+    MAX_CHAIN = 100
+    KEEP_ALL_DAYS = 7
+    KEEP_DAILY_DAYS = 30
+    KEEP_WEEKLY_DAYS = 182
+    
+    def __init__(self, path: str = "history"):
+        self.path = path
+        self._index_path = os.path.join(path, self.INDEX_FILE)
+        self._lock = threading.Lock()
+        # {"time", "file", "full", "reason", "games", "size"}, oldest first
+        self._entries: List[Dict[str, Any]] = self._read_index()
+        # Record digests by id as of the newest snapshot, None until read
+        self._digests: Optional[Dict[str, int]] = None
+    
+    def _read_index(self) -> List[Dict[str, Any]]:
+        if not os.path.exists(self._index_path):
+            return []
+        try:
+            with open(self._index_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"Error loading library history: {e}")
+            return []
+        return [e for e in entries if isinstance(e, dict) and "time" in e and "file" in e]
+    
+    def snapshots(self) -> List[Dict[str, Any]]:
+        """Snapshots kept, newest first"""
+        with self._lock:
+            return [dict(entry) for entry in reversed(self._entries)]
+    
+    def size(self) -> int:
+        """Bytes used by every snapshot file"""
+        with self._lock:
+            return sum(entry.get("size", 0) for entry in self._entries)
+    
+    def due(self, now: Optional[float] = None) -> bool:
+        """True if the newest snapshot is more than a day old"""
+        now = time.time() if now is None else now
+        with self._lock:
+            return not self._entries or now - self._entries[-1]["time"] >= self.DAY_SECONDS
+    
+    def _read(self, entry: Dict[str, Any]) -> Delta:
+        with open(os.path.join(self.path, entry["file"]), 'rb') as f:
+            return json.loads(zlib.decompress(f.read()).decode("utf-8"))
+    
+    def _write(self, entry: Dict[str, Any], delta: Delta) -> None:
+        data = zlib.compress(json.dumps(delta, ensure_ascii=False, default=to_json).encode("utf-8"), 9)
+        path = os.path.join(self.path, entry["file"])
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        entry["size"] = len(data)
+    
+    def _state(self, position: int) -> Dict[str, Dict[str, Any]]:
+        """Rebuild the library as of the snapshot at position, records by id"""
+        start = position
+        while start > 0 and not self._entries[start].get("full"):
+            start -= 1
+        state: Dict[str, Dict[str, Any]] = {}
+        for entry in self._entries[start:position + 1]:
+            _apply(state, self._read(entry))
+        return state
+    
+    def _latest(self) -> Optional[Dict[str, int]]:
+        """Digests of the newest snapshot, None if there is none or it cannot be read"""
+        if self._digests is None and self._entries:
+            try:
+                state = self._state(len(self._entries) - 1)
+            except (json.JSONDecodeError, zlib.error, IOError, ValueError) as e:
+                # A damaged chain is ended, the next snapshot stands on its own
+                print(f"Error reading library history, starting a full snapshot: {e}")
+                return None
+            self._digests = {key: content_hash(record) for key, record in state.items()}
+        return self._digests
+    
+    def prime(self) -> None:
+        """Read the newest snapshot now, so the next take() only compares in memory"""
+        with self._lock:
+            self._latest()
+    
+    def take(self, games: Iterable[Dict[str, Any]], reason: str,
+             now: Optional[float] = None) -> bool:
+        """Snapshot games unless nothing changed since the last snapshot
+        
+        Only the records that changed are copied, games may still be
+        edited meanwhile from other threads.
+        """
+        games = list(games)
+        now = int(time.time() if now is None else now)
+        
+        with self._lock:
+            try:
+                os.makedirs(self.path, exist_ok=True)
+                previous = self._latest()
+                digests: Dict[str, int] = {}
+                put = []
+                for game in games:
+                    key = str(game.get("id"))
+                    digest = content_hash(game)
+                    if previous is None or previous.get(key) != digest:
+                        record = _plain(game)
+                        # Of the copy written, the game may have changed since
+                        digest = content_hash(record)
+                        put.append(record)
+                    digests[key] = digest
+                delta = {"put": put, "delete": []}
+                if previous is not None:
+                    delta["delete"] = [key for key in previous if key not in digests]
+                    if not delta["put"] and not delta["delete"]:
+                        return True
+                
+                entry = {"time": max(now, self._entries[-1]["time"] + 1) if self._entries else now,
+                         "full": previous is None or self._chain_full(), "reason": reason,
+                         "games": len(digests), "size": 0}
+                entry["file"] = f"{entry['time']}.snap"
+                if entry["full"] and previous is not None:
+                    # Unchanged records go in too
+                    copied = {str(record.get("id")): record for record in put}
+                    put = []
+                    for game in games:
+                        key = str(game.get("id"))
+                        record = copied.get(key)
+                        if record is None:
+                            record = _plain(game)
+                            digests[key] = content_hash(record)
+                        put.append(record)
+                    delta = {"put": put, "delete": []}
+                self._write(entry, delta)
+                self._entries.append(entry)
+                self._digests = digests
+                dropped = self._prune(now)
+                atomic_dump(self._index_path, self._entries)
+                for old in dropped:
+                    try:
+                        os.remove(os.path.join(self.path, old["file"]))
+                    except OSError:
+                        pass
+            except (json.JSONDecodeError, zlib.error, IOError, OSError) as e:
+                print(f"Error saving library snapshot: {e}")
+                return False
+        return True
+    
+    def _chain_full(self) -> bool:
+        """True when the next snapshot should be a full one"""
+        deltas = []
+        for entry in reversed(self._entries):
+            if entry.get("full"):
+                return (len(deltas) >= self.MAX_CHAIN
+                        or sum(e.get("size", 0) for e in deltas) > entry.get("size", 0))
+            deltas.append(entry)
+        return True
+    
+    def restore(self, snapshot_time: int) -> Optional[List[Dict[str, Any]]]:
+        """The library as it was at the snapshot taken at snapshot_time"""
+        with self._lock:
+            positions = [i for i, e in enumerate(self._entries) if e["time"] == snapshot_time]
+            if not positions:
+                return None
+            try:
+                return list(self._state(positions[0]).values())
+            except (json.JSONDecodeError, zlib.error, IOError, ValueError) as e:
+                print(f"Error restoring library snapshot: {e}")
+                return None
+    
+    def _prune(self, now: int) -> List[Dict[str, Any]]:
+        """Drop the snapshots retention no longer keeps, folding each into the next
+        
+        Returns the entries dropped, their files go once the index is saved.
+        """
+        kept = set()
+        buckets = set()
+        for position in range(len(self._entries) - 1, -1, -1):
+            age = now - self._entries[position]["time"]
+            bucket: Optional[Tuple[str, int]] = None
+            if position == len(self._entries) - 1 or age < self.KEEP_ALL_DAYS * self.DAY_SECONDS:
+                kept.add(position)
+                continue
+            if age < self.KEEP_DAILY_DAYS * self.DAY_SECONDS:
+                bucket = ("day", self._entries[position]["time"] // self.DAY_SECONDS)
+            elif age < self.KEEP_WEEKLY_DAYS * self.DAY_SECONDS:
+                bucket = ("week", self._entries[position]["time"] // (7 * self.DAY_SECONDS))
+            if bucket is not None and bucket not in buckets:
+                buckets.add(bucket)
+                kept.add(position)
+        
+        if len(kept) == len(self._entries):
+            return []
+        entries = []
+        # What the snapshots dropped so far changed, not yet folded into a kept one
+        carried: Optional[Delta] = None
+        carried_full = False
+        for position, entry in enumerate(self._entries):
+            delta = None
+            if carried is not None and not entry.get("full"):
+                delta = _compose(carried, self._read(entry))
+                if carried_full:
+                    # Folding a full snapshot forward makes this one full
+                    entry["full"] = True
+                    delta["delete"] = []
+            if position not in kept:
+                carried = delta if delta is not None else self._read(entry)
+                carried_full = bool(entry.get("full"))
+                continue
+            if delta is not None:
+                self._write(entry, delta)
+            carried = None
+            entries.append(entry)
+        
+        dropped = [entry for entry in self._entries if entry not in entries]
+        self._entries = entries
+        return dropped
+
+
+def _plain(game: Dict[str, Any]) -> Dict[str, Any]:
+    """A copy of a record holding only what JSON would store, lists copied"""
+    return {key: list(value) if isinstance(value, (list, tuple)) else value
+            for key, value in game.items()}
+
+
+def _apply(state: Dict[str, Dict[str, Any]], delta: Delta) -> None:
+    for key in delta.get("delete", []):
+        state.pop(key, None)
+    for record in delta.get("put", []):
+        state[str(record.get("id"))] = record
+
+
+def _compose(first: Delta, second: Delta) -> Delta:
+    """One delta with the effect of first followed by second"""
+    state = {str(r.get("id")): r for r in first.get("put", [])}
+    _apply(state, second)
+    put_ids = {str(r.get("id")) for r in second.get("put", [])}
+    deleted = [key for key in first.get("delete", []) if key not in put_ids]
+    deleted += [key for key in second.get("delete", []) if key not in deleted]
+    return {"put": list(state.values()), "delete": deleted}
\ No newline at end of file
@@ -0,0 +1,429 @@
+"""
+Secondary indexes for GxLauncher
+Each index exposes FIELDS, add(game), discard(game_id) and clear()
+"""
+
+import heapq
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from typing import Callable, Dict, Iterable, Iterator, Optional, Set, Tuple, Any, List
+
+# Positions of the set bits in every byte value, used to decode bitmaps quickly
+_BYTE_BITS = [tuple(i for i in range(8) if value >> i & 1) for value in range(256)]
+
+class Bitmap:
+    """Set of record ordinals stored as the bits of a Python int"""
+    
+    __slots__ = ("bits",)
+    
+    def __init__(self, bits: int = 0):
+        self.bits = bits
+    
+    @classmethod
+    def of(cls, ordinals: Iterable[int]) -> "Bitmap":
+        bits = 0
+        for ordinal in ordinals:
+            bits |= 1 << ordinal
+        return cls(bits)
+    
+    def add(self, ordinal: int) -> None:
+        self.bits |= 1 << ordinal
+    
+    def discard(self, ordinal: int) -> None:
+        self.bits &= ~(1 << ordinal)
+    
+    def __contains__(self, ordinal: int) -> bool:
+        return bool(self.bits >> ordinal & 1)
+    
+    def __and__(self, other: "Bitmap") -> "Bitmap":
+        return Bitmap(self.bits & other.bits)
+    
+    def __or__(self, other: "Bitmap") -> "Bitmap":
+        return Bitmap(self.bits | other.bits)
+    
+    def __sub__(self, other: "Bitmap") -> "Bitmap":
+        return Bitmap(self.bits & ~other.bits)
+    
+    def __bool__(self) -> bool:
+        return self.bits != 0
+    
+    def __len__(self) -> int:
+        return bin(self.bits).count("1")
+    
+    def __iter__(self) -> Iterator[int]:
+        """Iterate set ordinals in ascending order"""
+        data = self.bits.to_bytes((self.bits.bit_length() + 7) // 8, "little")
+        for offset, byte in enumerate(data):
+            if byte:
+                base = offset * 8
+                for bit in _BYTE_BITS[byte]:
+                    yield base + bit
+
+
+class OrdinalIndex:
+    """Assigns every game a small dense integer, reused after removal"""
+    
+    FIELDS = frozenset({"id"})
+    
+    def __init__(self):
+        self._ordinals: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = []
+        self._free: List[int] = []
+        self.live = Bitmap()
+    
+    def __len__(self) -> int:
+        return len(self._ordinals)
+    
+    def clear(self) -> None:
+        self._ordinals.clear()
+        self._ids.clear()
+        self._free.clear()
+        self.live = Bitmap()
+    
+    def add(self, game: Dict[str, Any]) -> None:
+        game_id = game.get("id")
+        if game_id in self._ordinals:
+            return
+        if self._free:
+            ordinal = self._free.pop()
+            self._ids[ordinal] = game_id
+        else:
+            ordinal = len(self._ids)
+            self._ids.append(game_id)
+        self._ordinals[game_id] = ordinal
+        self.live.add(ordinal)
+    
+    def discard(self, game_id: str) -> None:
+        ordinal = self._ordinals.pop(game_id, None)
+        if ordinal is None:
+            return
+        self._ids[ordinal] = None
+        self._free.append(ordinal)
+        self.live.discard(ordinal)
+    
+    def ordinal(self, game_id: str) -> int:
+        return self._ordinals[game_id]
+    
+    def ids(self, bitmap: Bitmap) -> List[str]:
+        """Translate a bitmap back into game ids"""
+        ids = self._ids
+        return [ids[ordinal] for ordinal in bitmap if ordinal < len(ids) and ids[ordinal] is not None]
+    
+    def bitmap(self, game_ids: Iterable[str]) -> Bitmap:
+        """Build a bitmap from game ids"""
+        ordinals = self._ordinals
+        return Bitmap.of(ordinals[game_id] for game_id in game_ids if game_id in ordinals)
+
+
+class TagIndex:
+    """Bitmap index over each tag (case-folded) and the favorite flag"""
+    
+    FIELDS = frozenset({"tags", "favorite"})
+    
+    def __init__(self, ordinals: OrdinalIndex):
+        self.ordinals = ordinals
+        self._tags: Dict[str, Bitmap] = {}
+        self.favorite_bitmap = Bitmap()
+        self._entries: Dict[str, Tuple[int, Tuple[str, ...], bool]] = {}
+    
+    def clear(self) -> None:
+        self._tags.clear()
+        self.favorite_bitmap = Bitmap()
+        self._entries.clear()
+    
+    def add(self, game: Dict[str, Any]) -> None:
+        game_id = game.get("id")
+        if game_id in self._entries:
+            self.discard(game_id)
+        
+        ordinal = self.ordinals.ordinal(game_id)
+        tags = tuple({t.casefold() for t in game.get("tags", []) or []})
+        favorite = bool(game.get("favorite", False))
+        self._entries[game_id] = (ordinal, tags, favorite)
+        for tag in tags:
+            bitmap = self._tags.get(tag)
+            if bitmap is None:
+                bitmap = self._tags[tag] = Bitmap()
+            bitmap.add(ordinal)
+        if favorite:
+            self.favorite_bitmap.add(ordinal)
+    
+    def discard(self, game_id: str) -> None:
+        entry = self._entries.pop(game_id, None)
+        if entry is None:
+            return
+        
+        ordinal, tags, favorite = entry
+        for tag in tags:
+            bitmap = self._tags.get(tag)
+            if bitmap is not None:
+                bitmap.discard(ordinal)
+                if not bitmap:
+                    del self._tags[tag]
+        if favorite:
+            self.favorite_bitmap.discard(ordinal)
+    
+    def bitmap(self, tag: str) -> Bitmap:
+        """Get the bitmap of games carrying tag"""
+        return self._tags.get(tag.casefold(), Bitmap())
+    
+    def select(self, all_tags: Iterable[str] = (), any_tags: Iterable[str] = (),
+               no_tags: Iterable[str] = (), favorite: Optional[bool] = None) -> Bitmap:
+        """Combine tag and favorite conditions with bitmap AND/OR/NOT"""
+        result = Bitmap(self.ordinals.live.bits)
+        for tag in all_tags:
+            result = result & self.bitmap(tag)
+        any_tags = list(any_tags)
+        if any_tags:
+            union = Bitmap()
+            for tag in any_tags:
+                union = union | self.bitmap(tag)
+            result = result & union
+        for tag in no_tags:
+            result = result - self.bitmap(tag)
+        if favorite is not None:
+            result = result & self.favorite_bitmap if favorite else result - self.favorite_bitmap
+        return result
+    
+    def games_with_tag(self, tag: str) -> Set[str]:
+        """Get the ids of games carrying tag"""
+        return set(self.ordinals.ids(self.bitmap(tag)))
+    
+    @property
+    def favorites(self) -> Set[str]:
+        """Get the ids of favorite games"""
+        return set(self.ordinals.ids(self.favorite_bitmap))
+    
+    def tags(self) -> List[str]:
+        """Get every known tag, sorted"""
+        return sorted(self._tags)
+
+
+class StatsIndex:
+    """Running library aggregates, adjusted by each add and discard"""
+    
+    FIELDS = frozenset({"playtime", "last_played", "tags"})
+    
+    def __init__(self):
+        self.count = 0
+        self.played = 0
+        self.total_playtime = 0
+        self._tag_count: Dict[str, int] = {}
+        self._tag_playtime: Dict[str, int] = {}
+        self._entries: Dict[str, Tuple[int, int, Tuple[str, ...]]] = {}
+    
+    def clear(self) -> None:
+        self.count = self.played = self.total_playtime = 0
+        self._tag_count.clear()
+        self._tag_playtime.clear()
+        self._entries.clear()
+    
+    def add(self, game: Dict[str, Any]) -> None:
+        game_id = game.get("id")
+        if game_id in self._entries:
+            self.discard(game_id)
+        
+        playtime = game.get("playtime", 0) or 0
+        last_played = game.get("last_played", 0) or 0
+        tags = tuple({t.casefold() for t in game.get("tags", []) or []})
+        self._entries[game_id] = (playtime, last_played, tags)
+        self._apply(playtime, last_played, tags, 1)
+    
+    def discard(self, game_id: str) -> None:
+        entry = self._entries.pop(game_id, None)
+        if entry is not None:
+            self._apply(*entry, -1)
+    
+    def _apply(self, playtime: int, last_played: int, tags: Tuple[str, ...], sign: int) -> None:
+        self.count += sign
+        self.total_playtime += sign * playtime
+        if playtime or last_played:
+            self.played += sign
+        for tag in tags:
+            count = self._tag_count.get(tag, 0) + sign
+            if count:
+                self._tag_count[tag] = count
+                self._tag_playtime[tag] = self._tag_playtime.get(tag, 0) + sign * playtime
+            else:
+                del self._tag_count[tag]
+                del self._tag_playtime[tag]
+    
+    def tag_stats(self) -> Dict[str, Tuple[int, int]]:
+        """Get (count, playtime) per tag, sorted by tag"""
+        return {tag: (count, self._tag_playtime[tag]) for tag, count in sorted(self._tag_count.items())}
+    
+    def aggregate(self, game_ids: Iterable[str]) -> Dict[str, int]:
+        """Aggregate a subset of games from the cached per-game values"""
+        count = played = total = last = 0
+        entries = self._entries
+        for game_id in game_ids:
+            entry = entries.get(game_id)
+            if entry is None:
+                continue
+            playtime, last_played = entry[0], entry[1]
+            count += 1
+            total += playtime
+            if playtime or last_played:
+                played += 1
+            if last_played > last:
+                last = last_played
+        return {"count": count, "played": played, "unplayed": count - played,
+                "total_playtime": total, "last_played": last}
+
+
+class SortedIndex:
+    """Keeps game ids ordered by a field, updated by bisect insertion"""
+    
+    def __init__(self, field: str, key_func: Callable[[Dict[str, Any]], Any]):
+        self.field = field
+        self.FIELDS = frozenset({field})
+        self.key_func = key_func
+        self._order: List[Tuple[Any, str]] = []
+        self._keys: List[Any] = []
+        self._entries: Dict[str, Tuple[Any, str]] = {}
+    
+    def __len__(self) -> int:
+        return len(self._order)
+    
+    def clear(self) -> None:
+        self._order.clear()
+        self._keys.clear()
+        self._entries.clear()
+    
+    def add(self, game: Dict[str, Any]) -> None:
+        game_id = game.get("id")
+        if game_id in self._entries:
+            self.discard(game_id)
+        
+        entry = (self.key_func(game), game_id)
+        self._entries[game_id] = entry
+        pos = bisect_left(self._order, entry)
+        self._order.insert(pos, entry)
+        self._keys.insert(pos, entry[0])
+    
+    def discard(self, game_id: str) -> None:
+        entry = self._entries.pop(game_id, None)
+        if entry is None:
+            return
+        
+        pos = bisect_left(self._order, entry)
+        del self._order[pos]
+        del self._keys[pos]
+    
+    def key(self, game_id: str) -> Any:
+        """Get the cached sort key of a game"""
+        return self._entries[game_id][0]
+    
+    def ids(self, reverse: bool = False) -> Iterator[str]:
+        """Iterate game ids in key order"""
+        order = reversed(self._order) if reverse else self._order
+        return (game_id for _, game_id in order)
+    
+    def _span(self, low: Any, high: Any) -> Tuple[int, int]:
+        return bisect_left(self._keys, low), bisect_right(self._keys, high)
+    
+    def count_range(self, low: Any, high: Any) -> int:
+        """Count games whose key lies in [low, high]"""
+        start, end = self._span(low, high)
+        return max(0, end - start)
+    
+    def range_ids(self, low: Any, high: Any) -> Set[str]:
+        """Get the ids of games whose key lies in [low, high]"""
+        start, end = self._span(low, high)
+        return {game_id for _, game_id in self._order[start:end]}
+    
+    def last_key(self, default: Any = None) -> Any:
+        """Get the largest key"""
+        return self._keys[-1] if self._keys else default
+
+
+class CollectionIndex:
+    """Members of the smart collections, kept current one record at a time
+    
+    Each collection is a compiled query that a single record can answer
+    (see Query.local), so an edit only re-tests the edited game. Clauses
+    on the age of last_played or added also change as time passes: the
+    time each game may flip is queued and refresh() re-tests the games
+    that are due.
+    """
+    
+    def __init__(self):
+        self.FIELDS = frozenset()
+        self._queries: Dict[str, Any] = {}
+        self._members: Dict[str, Set[str]] = {}
+        # Games waiting for a time-based recheck, with the time they are due
+        self._waiting: Dict[str, Tuple[Dict[str, Any], float]] = {}
+        self._due: List[Tuple[float, str]] = []
+        # refresh() may run from several readers at once
+        self._lock = threading.Lock()
+    
+    def define(self, queries: Dict[str, Any], games: Iterable[Dict[str, Any]]) -> None:
+        """Replace the collections and compute their members"""
+        self._queries = dict(queries)
+        fields: Set[str] = set()
+        for query in self._queries.values():
+            fields |= query.fields()
+        self.FIELDS = frozenset(fields)
+        self.clear()
+        for game in games:
+            self.add(game)
+    
+    def clear(self) -> None:
+        self._members = {name: set() for name in self._queries}
+        self._waiting.clear()
+        self._due.clear()
+    
+    def add(self, game: Dict[str, Any]) -> None:
+        if not self._queries:
+            return
+        game_id = game.get("id")
+        now = time.time()
+        due = None
+        for name, query in self._queries.items():
+            if query.test(game):
+                self._members[name].add(game_id)
+            else:
+                self._members[name].discard(game_id)
+            at = query.expires(game, now)
+            if at is not None and (due is None or at < due):
+                due = at
+        
+        if due is None:
+            self._waiting.pop(game_id, None)
+            return
+        self._waiting[game_id] = (game, due)
+        heapq.heappush(self._due, (due, game_id))
+        if len(self._due) > 2 * len(self._waiting) + 64:
+            # Drop the entries left behind by earlier edits
+            self._due = [(at, gid) for gid, (_, at) in self._waiting.items()]
+            heapq.heapify(self._due)
+    
+    def discard(self, game_id: str) -> None:
+        for members in self._members.values():
+            members.discard(game_id)
+        self._waiting.pop(game_id, None)
+    
+    def refresh(self) -> bool:
+        """Re-test the games whose time-based clauses are due, True if any was"""
+        now = time.time()
+        if not self._due or self._due[0][0] > now:
+            return False
+        with self._lock:
+            refreshed = False
+            while self._due and self._due[0][0] <= now:
+                at, game_id = heapq.heappop(self._due)
+                entry = self._waiting.get(game_id)
+                if entry is None or entry[1] != at:
+                    continue
+                self.add(entry[0])
+                refreshed = True
+            return refreshed
+    
+    def members(self, name: str) -> Set[str]:
+        """Get the ids in a collection, empty for unknown names"""
+        return set(self._members.get(name, ()))
+    
+    def counts(self) -> Dict[str, int]:
+        """Get the size of every collection, in definition order"""
+        return {name: len(self._members[name]) for name in self._queries}
\ No newline at end of file
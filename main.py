@@ -23,14 +23,27 @@ def main():
     app.setApplicationVersion("2.0.0")
     
     # Initialize core components
-    db = Database()
     config = Config()
+    db = Database(
+        backend=config.get("storage_backend", "json"),
+        write_behind=config.get("write_behind", True),
+        autoload=False,
+        libraries=config.get("libraries", []),
+        history=config.get("library_history", True),
+        sync=bool(config.get("sync_port") or config.get("sync_peer"))
+    )
+    if config.get("sync_port"):
+        db.sync.serve(config.get("sync_port"), config.get("sync_host", db.sync.DEFAULT_HOST),
+                      key=config.get("sync_key", ""))
     
-    # Create and show main window
+    # Create and show main window, the library streams in afterwards
     window = MainWindow(db, config)
     window.show()
+    window.start_loading()
     
-    sys.exit(app.exec())
+    exit_code = app.exec()
+    db.close()
+    sys.exit(exit_code)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
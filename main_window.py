@@ -17,11 +17,24 @@ from core.utils import format_playtime
 from core.updater import UpdateChecker
 from ui.game_card import GameCard
 from ui.sidebar import GameDetailsSidebar
+from ui.tag_filter import TagFilterBar
 from ui.dialogs import SettingsDialog, AddGameDialog, UpdateDialog
+from ui.watcher import LibraryWatcher
 
 class MainWindow(QMainWindow):
     """Main application window"""
     
+    SORT_MAP = {
+        "Nome": ("name", False),
+        "Tempo Jogado": ("playtime", True),
+        "Último Jogado": ("last_played", True),
+        "Data Adicionada": ("added", True)
+    }
+    
+    HISTORY_CHECK_MS = 60 * 60 * 1000
+    # Below this the indexes answer filtered views as fast as the column view
+    COLUMNAR_MIN_GAMES = 5000
+    
     def __init__(self, db: Database, config: Config):
         super().__init__()
         self.db = db
@@ -29,12 +42,31 @@ class MainWindow(QMainWindow):
         self.updater = UpdateChecker()
         self.current_filter = ""
         self.current_sort = "Nome"
+        # Name of the selected smart collection, "" shows every game
+        self.current_collection = ""
+        # Column view and row mask of the shown games when the NumPy path is in use
+        self._view_columns = None
+        self._view_mask = None
         self.sidebar_visible = False
+        # Batches still to load, see start_loading()
+        self._loader = None
         
+        self.db.set_collections(config.get("smart_collections", []))
         self._setup_window()
         self._setup_ui()
         self._load_games()
         
+        # Pick up edits other programs make to games.json and config.json
+        self.watcher = LibraryWatcher(db, config, self)
+        self.watcher.library_changed.connect(self._on_library_changed)
+        self.watcher.config_changed.connect(self._on_config_changed)
+        self.watcher.shards_changed.connect(self._update_library_status)
+        
+        # Daily library snapshot for launchers left open, see Database.auto_snapshot()
+        self._history_timer = QTimer(self)
+        self._history_timer.setInterval(self.HISTORY_CHECK_MS)
+        self._history_timer.timeout.connect(self.db.auto_snapshot)
+        
         # Check for updates
         if config.get("auto_check_updates"):
             QTimer.singleShot(2000, self._check_updates)
@@ -75,6 +107,11 @@ class MainWindow(QMainWindow):
         filter_bar = self._create_filter_bar()
         left_layout.addWidget(filter_bar)
         
+        # Tag and favorite filters
+        self.tag_filter = TagFilterBar()
+        self.tag_filter.filters_changed.connect(self._load_games)
+        left_layout.addWidget(self.tag_filter)
+        
         # Games grid
         self.scroll_area = QScrollArea()
         self.scroll_area.setWidgetResizable(True)
@@ -217,12 +254,21 @@ class MainWindow(QMainWindow):
         
         # Search box
         self.search_input = QLineEdit()
-        self.search_input.setPlaceholderText("🔍 Buscar jogos...")
+        self.search_input.setPlaceholderText("🔍 Buscar jogos...  (ex: tag:rpg fav:sim playtime>10h last:<30d)")
         self.search_input.setFixedHeight(40)
         self.search_input.textChanged.connect(self._on_search_changed)
         self.search_input.setStyleSheet(Theme.get_input_style())
         layout.addWidget(self.search_input)
         
+        # Smart collections
+        self.collection_combo = QComboBox()
+        self.collection_combo.setFixedHeight(40)
+        self.collection_combo.setFixedWidth(240)
+        self.collection_combo.setStyleSheet(Theme.get_input_style())
+        self._fill_collections()
+        self.collection_combo.currentIndexChanged.connect(self._on_collection_changed)
+        layout.addWidget(self.collection_combo)
+        
         # Sort by
         sort_label = QLabel("Ordenar:")
         sort_label.setStyleSheet(f"color: {Theme.FG_DIM};")
@@ -254,6 +300,17 @@ class MainWindow(QMainWindow):
         self.status_label.setStyleSheet(f"color: {Theme.FG_DIM}; font-size: 11px;")
         layout.addWidget(self.status_label)
         
+        self.loading_label = QLabel()
+        self.loading_label.setStyleSheet(f"color: {Theme.WARNING}; font-size: 11px;")
+        self.loading_label.hide()
+        layout.addWidget(self.loading_label)
+        
+        # State of each library file, only shown with more than one
+        self.library_label = QLabel()
+        self.library_label.setStyleSheet(f"color: {Theme.FG_DIM}; font-size: 11px; margin-left: 16px;")
+        self.library_label.hide()
+        layout.addWidget(self.library_label)
+        
         layout.addStretch()
         
         self.stats_label = QLabel()
@@ -283,7 +340,7 @@ class MainWindow(QMainWindow):
                 padding: 100px;
             """)
             self.grid_layout.addWidget(empty, 0, 0)
-            self.status_label.setText("Biblioteca vazia")
+            self.status_label.setText("Carregando..." if self._loader is not None else "Biblioteca vazia")
             self.stats_label.setText("")
             return
         
@@ -298,49 +355,236 @@ class MainWindow(QMainWindow):
             card = GameCard(game, self.config.config, self)
             card.clicked.connect(self._on_card_clicked)
             card.launch_requested.connect(self._on_game_launched)
+            card.session_finished.connect(self._on_session_finished)
             self.grid_layout.addWidget(card, row, col)
         
         # Update stats
         self._update_stats(games)
     
+    def start_loading(self, batch_size: int = 500):
+        """Load the library in batches, painting the first screenful right away"""
+        self._loader = self.db.iter_load(batch_size)
+        self._loaded_batches = 0
+        self.loading_label.setText("⏳ Carregando biblioteca...")
+        self.loading_label.show()
+        QTimer.singleShot(0, self._load_next_batch)
+    
+    def _load_next_batch(self):
+        """Load one batch and schedule the next"""
+        if self._loader is None:
+            return
+        try:
+            loaded, total = next(self._loader)
+        except StopIteration:
+            self._finish_loading()
+            return
+        
+        self._loaded_batches += 1
+        self.loading_label.setText(f"⏳ Carregando {loaded}/{total}")
+        # Show the first screenful, and keep searches current on the partial set
+        if self._loaded_batches == 1 or self._filtered():
+            self._load_games()
+        QTimer.singleShot(0, self._load_next_batch)
+    
+    def _finish_loading(self):
+        """Show the complete library once every batch is in"""
+        self._loader = None
+        self.loading_label.hide()
+        self._load_games()
+        self._update_library_status()
+        if not self.db.load_ok:
+            self.status_label.setText("Erro ao carregar a biblioteca")
+        self.db.auto_snapshot()
+        self._history_timer.start()
+    
+    def _update_library_status(self):
+        """Show which library files are online, offline or still loading"""
+        libraries = self.db.library_status()
+        if not libraries:
+            return
+        states = {"online": "", "offline": " (offline)", "loading": " (carregando...)"}
+        parts = [f"{lib['name'] or 'Principal'}: {lib['games']}{states.get(lib['status'], '')}"
+                 for lib in libraries]
+        self.library_label.setText("💾 " + "  •  ".join(parts))
+        self.library_label.setToolTip("\n".join(
+            f"{lib['name'] or 'Principal'} — {lib['path']}" + (f"\n    {lib['error']}" if lib['error'] else "")
+            for lib in libraries
+        ))
+        self.library_label.show()
+    
+    def _drain_loader(self):
+        """Load the remaining batches right away"""
+        if self._loader is not None:
+            for _ in self._loader:
+                pass
+            self._loader = None
+    
     def _get_filtered_sorted_games(self):
         """Get games with current filter and sort applied"""
-        games = self.db.get_all_games()
-        
-        # Apply search filter
-        if self.current_filter:
-            games = [g for g in games if self.current_filter.lower() in g.get("name", "").lower()]
-        
-        # Apply sort
-        sort_map = {
-            "Nome": ("name", False),
-            "Tempo Jogado": ("playtime", True),
-            "Último Jogado": ("last_played", True),
-            "Data Adicionada": ("added", True)
-        }
-        
-        sort_key, reverse = sort_map.get(self.current_sort, ("name", False))
-        
-        if sort_key == "name":
-            games = sorted(games, key=lambda g: g.get("name", "").lower(), reverse=reverse)
-        else:
-            games = sorted(games, key=lambda g: g.get(sort_key, 0), reverse=reverse)
-        
-        return games
+        sort_key, reverse = self.SORT_MAP.get(self.current_sort, ("name", False))
+        
+        self.tag_filter.set_tags(self.db.get_tag_stats())
+        self._update_collection_counts()
+        self._view_columns = self._view_mask = None
+        
+        # Filtered views of a large library sort faster over the column view,
+        # the sorted indexes already answer the whole library. While loading
+        # every batch would rebuild the columns, so they wait for the end.
+        if (self._filtered() and not self.db.loading
+                and len(self.db.games) >= self.COLUMNAR_MIN_GAMES):
+            columns = self.db.columns()
+            if columns is not None:
+                return self._get_columnar_games(columns, sort_key, reverse)
+        
+        # Smart collection and tag panel selection, answered by the indexes
+        ids = None
+        if self.current_collection:
+            ids = self.db.collection_ids(self.current_collection)
+        if self.tag_filter.is_active():
+            tags, favorites_only, match_all = self.tag_filter.selection()
+            tag_ids = self.db.filter_ids(favorites_only, tags, match_all)
+            ids = tag_ids if ids is None else ids & tag_ids
+        
+        # Without a search the sorted view already is the answer
+        if not self.current_filter.strip():
+            games = self.db.iter_sorted(sort_key, reverse)
+            if ids is None:
+                return list(games)
+            return [g for g in games if g.get("id") in ids]
+        
+        # Apply search filter (supports tag:, fav:, playtime>, last:, added:)
+        games = self.db.query(self.current_filter)
+        if ids is not None:
+            games = [g for g in games if g.get("id") in ids]
+        return self.db.order_games(games, sort_key, reverse)
+    
+    def _get_columnar_games(self, columns, sort_key, reverse):
+        """Filter with boolean masks and sort with argsort over the NumPy columns"""
+        mask = None
+        if self.current_collection:
+            mask = columns.ids_mask(self.db.collection_ids(self.current_collection))
+        if self.tag_filter.is_active():
+            # The tag panel still reads the bitmap indexes, only the result becomes a mask
+            tags, favorites_only, match_all = self.tag_filter.selection()
+            found = self.db.filter_mask(columns, favorites_only, tags, match_all)
+            mask = found if mask is None else mask & found
+        if self.current_filter.strip():
+            found = columns.ids_mask(g.get("id") for g in self.db.query(self.current_filter))
+            mask = found if mask is None else mask & found
+        
+        self._view_columns, self._view_mask = columns, mask
+        return columns.order(sort_key, reverse, mask)
+    
+    def _filtered(self):
+        """Whether the grid shows only part of the library"""
+        return bool(self.current_filter.strip() or self.current_collection
+                    or self.tag_filter.is_active())
+    
+    def _fill_collections(self):
+        """List the smart collections, keeping the selection when it still exists"""
+        self.collection_combo.blockSignals(True)
+        self.collection_combo.clear()
+        self.collection_combo.addItem("Todos os jogos", "")
+        for name in self.db.get_collection_counts():
+            self.collection_combo.addItem(name, name)
+        index = self.collection_combo.findData(self.current_collection)
+        if index < 0:
+            self.current_collection = ""
+            index = 0
+        self.collection_combo.setCurrentIndex(index)
+        self.collection_combo.blockSignals(False)
+        self._update_collection_counts()
+    
+    def _update_collection_counts(self):
+        """Show the current size of every smart collection"""
+        counts = self.db.get_collection_counts()
+        for i in range(1, self.collection_combo.count()):
+            name = self.collection_combo.itemData(i)
+            self.collection_combo.setItemText(i, f"{name} ({counts.get(name, 0)})")
     
     def _update_stats(self, games):
         """Update status bar statistics"""
-        count = len(games)
-        total_time = sum(g.get("playtime", 0) for g in games)
-        
-        self.status_label.setText(f"{count} {'jogo' if count == 1 else 'jogos'}")
-        self.stats_label.setText(f"Tempo total: {format_playtime(total_time)}")
+        # The whole library reads the running totals, filtered views aggregate the shown ids
+        if not self._filtered():
+            stats = self.db.get_stats()
+        elif self._view_mask is not None:
+            stats = self._view_columns.aggregate(self._view_mask)
+        else:
+            stats = self.db.get_stats(g.get("id") for g in games)
+        count = stats["count"]
+        
+        status = f"{count} {'jogo' if count == 1 else 'jogos'}"
+        if self.db.loading:
+            # Results only cover the games loaded so far
+            status += " (parcial)"
+        self.status_label.setText(status)
+        self.stats_label.setText(
+            f"Jogados: {stats['played']}/{count}  •  "
+            f"Tempo total: {format_playtime(stats['total_playtime'])}"
+        )
+    
+    def _cards(self):
+        """Get the game cards currently in the grid"""
+        cards = []
+        for i in range(self.grid_layout.count()):
+            widget = self.grid_layout.itemAt(i).widget()
+            if isinstance(widget, GameCard):
+                cards.append(widget)
+        return cards
+    
+    def _on_library_changed(self, diff):
+        """Apply an external edit of the library to the view"""
+        sort_key, _ = self.SORT_MAP.get(self.current_sort, ("name", False))
+        if diff.added or diff.removed or self._filtered() or sort_key in diff.fields():
+            # Membership or order changed, the grid has to be laid out again
+            self._load_games()
+        elif diff.changed:
+            cards = self._cards()
+            for card in cards:
+                game = self.db.get_game_by_id(card.game.get("id"))
+                if card.game.get("id") in diff.changed and game is not None:
+                    card.update_game_data(game)
+            if diff.fields() & {"tags", "playtime"}:
+                self.tag_filter.set_tags(self.db.get_tag_stats())
+            self._update_stats([card.game for card in cards])
+        
+        if self.sidebar_visible and self.sidebar.current_game is not None:
+            game_id = self.sidebar.current_game.get("id")
+            if game_id in diff.removed:
+                self._hide_sidebar()
+            elif game_id in diff.changed:
+                self._show_sidebar(self.db.get_game_by_id(game_id))
+        
+        if diff.conflicts:
+            count = len(diff.conflicts)
+            self.status_label.setText(
+                f"{count} {'jogo alterado' if count == 1 else 'jogos alterados'} também por outro "
+                "programa, alterações locais mantidas"
+            )
+        else:
+            self.status_label.setText("Biblioteca atualizada por outro programa")
+        QTimer.singleShot(5000, lambda: self._update_stats([c.game for c in self._cards()]))
+    
+    def _on_config_changed(self, keys):
+        """Apply an external edit of config.json"""
+        if "smart_collections" in keys:
+            self.db.set_collections(self.config.get("smart_collections", []))
+            self._fill_collections()
+            self._load_games()
+            return
+        if keys & {"grid_columns", "show_playtime"}:
+            self._load_games()
     
     def _on_search_changed(self, text):
         """Handle search input change"""
         self.current_filter = text
         self._load_games()
     
+    def _on_collection_changed(self, index):
+        """Handle smart collection selection"""
+        self.current_collection = self.collection_combo.itemData(index) or ""
+        self._load_games()
+    
     def _on_sort_changed(self, text):
         """Handle sort selection change"""
         self.current_sort = text
@@ -358,9 +602,17 @@ class MainWindow(QMainWindow):
         if self.config.get("close_on_launch"):
             QTimer.singleShot(2000, QApplication.quit)
     
+    def _on_session_finished(self, game, start, end, exit_code):
+        """Store a finished play session"""
+        self.db.record_session(game.get("id"), start, end, exit_code)
+        if self.sidebar_visible and self.sidebar.current_game is game:
+            self._show_sidebar(game)
+    
     def _show_sidebar(self, game):
         """Show sidebar with game details"""
-        self.sidebar.show_game(game)
+        game_id = game.get("id")
+        self.sidebar.show_game(game, self.db.get_play_history(game_id),
+                               self.db.get_details(game_id))
         if not self.sidebar_visible:
             self.sidebar.show()
             self.sidebar_visible = True
@@ -370,9 +622,9 @@ class MainWindow(QMainWindow):
         self.sidebar.hide()
         self.sidebar_visible = False
     
-    def _on_game_updated(self, game):
+    def _on_game_updated(self, game_id, updates):
         """Handle game update from sidebar"""
-        self.db.update_game(game.get("id"), game)
+        self.db.update_game(game_id, updates)
         self._load_games()
     
     def _on_game_removed(self, game_id):
@@ -429,13 +681,13 @@ class MainWindow(QMainWindow):
             QMessageBox.information(self, "Info", "Nenhum executável encontrado na pasta.")
             return
         
-        # Add all found games
-        added = 0
+        # Add all found games in a single write
+        games = []
         timestamp = int(time.time() * 1000)
         for i, exe_path in enumerate(executables):
             game_name = os.path.splitext(os.path.basename(exe_path))[0]
             
-            game_data = {
+            games.append({
                 "id": f"{timestamp}_{i}",
                 "name": game_name,
                 "path": exe_path,
@@ -446,10 +698,9 @@ class MainWindow(QMainWindow):
                 "favorite": False,
                 "tags": [],
                 "notes": ""
-            }
-            
-            if self.db.add_game(game_data):
-                added += 1
+            })
+        
+        added = self.db.add_games(games)
         
         self._load_games()
         QMessageBox.information(self, "Sucesso", f"{added} jogos adicionados à biblioteca!")
@@ -537,18 +788,25 @@ class MainWindow(QMainWindow):
     
     def closeEvent(self, event):
         """Handle window close"""
+        self.watcher.stop()
+        self._history_timer.stop()
+        
         # Save window size
         self.config.set("window_width", self.width())
         self.config.set("window_height", self.height())
         self.config.save()
         
+        # Changes are only written once the whole library is in memory
+        self._drain_loader()
+        
         # Save any pending playtime updates
         for i in range(self.grid_layout.count()):
             widget = self.grid_layout.itemAt(i).widget()
-            if isinstance(widget, GameCard) and widget.process:
-                if widget.start_time:
-                    elapsed = int(time.time() - widget.start_time)
-                    if elapsed > 5:
-                        self.db.update_playtime(widget.game.get("id"), elapsed)
+            if isinstance(widget, GameCard) and widget.process and widget.start_time:
+                widget.finish_session()
         
+        # Wait for the background writer before the window goes away
+        if not self.db.flush(timeout=10):
+            print("Warning: pending library writes did not finish")
+        self.db.close()
         event.accept()
\ No newline at end of file
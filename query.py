@@ -0,0 +1,501 @@
+"""
+Library query language for GxLauncher
+
+Examples:
+    tag:rpg fav:yes playtime>10h last:<30d "xenoverse"
+    -tag:mod added:<7d dark souls
+    last:never
+
+Plain words are a fuzzy search over name, notes and tags and quoted text
+must appear in the name. Clauses are combined with AND and a leading -
+negates one.
+"""
+
+import re
+import time
+from typing import List, Dict, Optional, Set, Any, Tuple
+from core.utils import normalize_path
+from core.indexes import Bitmap
+
+_TOKEN = re.compile(r'(-?)(?:(\w+)(:?[<>]=?|:|=)("[^"]*"|\S+)|"([^"]*)"|(\S+))')
+_DURATION_PART = re.compile(r"(\d+(?:[.,]\d+)?)([smhdwy]?)")
+
+UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800, "y": 31536000}
+
+TRUE_WORDS = {"yes", "y", "sim", "s", "true", "1", "on"}
+FALSE_WORDS = {"no", "n", "nao", "não", "false", "0", "off"}
+
+# Field aliases accepted in the search box
+FIELD_ALIASES = {
+    "tag": "tags", "tags": "tags",
+    "fav": "favorite", "favorite": "favorite", "favorito": "favorite",
+    "playtime": "playtime", "time": "playtime", "tempo": "playtime",
+    "last": "last_played", "last_played": "last_played", "jogado": "last_played",
+    "added": "added", "adicionado": "added",
+    "name": "name", "nome": "name",
+    "id": "id", "path": "path"
+}
+
+def parse_duration(text: str, default_unit: str) -> Optional[int]:
+    """Parse '10h', '1h30m' or '2.5' (in default_unit) into seconds"""
+    text = text.strip().lower()
+    if not text:
+        return None
+    
+    total = 0.0
+    pos = 0
+    while pos < len(text):
+        match = _DURATION_PART.match(text, pos)
+        if not match:
+            return None
+        value = float(match.group(1).replace(",", "."))
+        total += value * UNITS[match.group(2) or default_unit]
+        pos = match.end()
+    return int(total)
+
+
+class Clause:
+    """A single condition of a query"""
+    
+    negate = False
+    # Record fields the clause reads
+    FIELDS = frozenset()
+    
+    def local(self) -> bool:
+        """Whether test() alone decides the clause for a record"""
+        return True
+    
+    def expires(self, game: Dict[str, Any], now: float) -> Optional[float]:
+        """Time after now when test() may change for game without any edit"""
+        return None
+    
+    def indexed(self, db) -> bool:
+        """Whether candidates() can be answered from an index"""
+        return False
+    
+    def estimate(self, db) -> int:
+        """Expected number of matching games"""
+        return len(db.games)
+    
+    def candidates(self, db) -> Set[str]:
+        """Ids of matching games, only valid when indexed()"""
+        raise NotImplementedError
+    
+    def matches(self, game: Dict[str, Any]) -> bool:
+        raise NotImplementedError
+    
+    def test(self, game: Dict[str, Any]) -> bool:
+        """Evaluate the clause against one game, honoring negation"""
+        return self.matches(game) != self.negate
+    
+    def describe(self) -> str:
+        raise NotImplementedError
+
+
+class TagClause(Clause):
+    FIELDS = frozenset({"tags"})
+    
+    def __init__(self, tag: str):
+        self.tag = tag.casefold()
+    
+    def indexed(self, db) -> bool:
+        return not self.negate
+    
+    def estimate(self, db) -> int:
+        if self.negate:
+            return len(db.games)
+        return len(db.tag_index.bitmap(self.tag))
+    
+    def candidates(self, db) -> Set[str]:
+        return db.tag_index.games_with_tag(self.tag)
+    
+    def matches(self, game: Dict[str, Any]) -> bool:
+        return any(t.casefold() == self.tag for t in game.get("tags", []))
+    
+    def describe(self) -> str:
+        return f"tag = {self.tag!r}"
+
+
+class FavoriteClause(Clause):
+    FIELDS = frozenset({"favorite"})
+    
+    def __init__(self, favorite: bool):
+        self.favorite = favorite
+    
+    def indexed(self, db) -> bool:
+        return self.favorite != self.negate
+    
+    def estimate(self, db) -> int:
+        count = len(db.tag_index.favorite_bitmap)
+        return count if self.indexed(db) else len(db.games) - count
+    
+    def candidates(self, db) -> Set[str]:
+        return db.tag_index.favorites
+    
+    def matches(self, game: Dict[str, Any]) -> bool:
+        return bool(game.get("favorite", False)) == self.favorite
+    
+    def describe(self) -> str:
+        return f"favorite = {self.favorite}"
+
+
+class BitmapClause(Clause):
+    """Tag and favorite clauses (negated ones too) answered by one bitmap expression"""
+    
+    def __init__(self, clauses: List[Clause]):
+        self.clauses = clauses
+        self._bitmap = None
+    
+    def indexed(self, db) -> bool:
+        return True
+    
+    def bitmap(self, db):
+        if self._bitmap is None:
+            all_tags = [c.tag for c in self.clauses if isinstance(c, TagClause) and not c.negate]
+            no_tags = [c.tag for c in self.clauses if isinstance(c, TagClause) and c.negate]
+            favorite = None
+            for c in self.clauses:
+                if isinstance(c, FavoriteClause):
+                    wanted = c.favorite != c.negate
+                    if favorite is not None and favorite != wanted:
+                        # fav:yes -fav:yes can never match
+                        self._bitmap = Bitmap()
+                        return self._bitmap
+                    favorite = wanted
+            self._bitmap = db.tag_index.select(all_tags, no_tags=no_tags, favorite=favorite)
+        return self._bitmap
+    
+    def estimate(self, db) -> int:
+        return len(self.bitmap(db))
+    
+    def candidates(self, db) -> Set[str]:
+        return set(db.ordinals.ids(self.bitmap(db)))
+    
+    def matches(self, game: Dict[str, Any]) -> bool:
+        return all(c.test(game) for c in self.clauses)
+    
+    def describe(self) -> str:
+        return " AND ".join(("NOT " if c.negate else "") + c.describe() for c in self.clauses)
+
+
+class KeyClause(Clause):
+    """Exact id or path lookup"""
+    
+    def __init__(self, field: str, value: str):
+        self.field = field
+        self.value = value
+        self.FIELDS = frozenset({field})
+    
+    def _lookup(self, db) -> Optional[Dict[str, Any]]:
+        if self.field == "id":
+            return db.get_game_by_id(self.value)
+        return db.get_game_by_path(self.value)
+    
+    def indexed(self, db) -> bool:
+        return not self.negate
+    
+    def estimate(self, db) -> int:
+        return 1 if self._lookup(db) is not None else 0
+    
+    def candidates(self, db) -> Set[str]:
+        game = self._lookup(db)
+        return {game.get("id")} if game is not None else set()
+    
+    def matches(self, game: Dict[str, Any]) -> bool:
+        if self.field == "id":
+            return game.get("id") == self.value
+        return normalize_path(game.get("path", "")) == normalize_path(self.value)
+    
+    def describe(self) -> str:
+        return f"{self.field} = {self.value!r}"
+
+
+class RangeClause(Clause):
+    """Numeric comparison on playtime, or on the age of last_played/added"""
+    
+    def __init__(self, field: str, op: str, seconds: int, never: bool = False):
+        self.field = field
+        self.op = op
+        self.seconds = seconds
+        self.never = never
+        self.FIELDS = frozenset({field})
+    
+    def bounds(self, now: float) -> Tuple[float, float]:
+        """Get the inclusive [low, high] range of raw field values that match"""
+        inf = float("inf")
+        if self.never:
+            return 0, 0
+        if self.field == "playtime":
+            value = self.seconds
+            return {
+                ">": (value + 1, inf), ">=": (value, inf),
+                "<": (-inf, value - 1), "<=": (-inf, value), "=": (value, inf)
+            }[self.op]
+        
+        # Dates compare by age, '<30d' means less than 30 days ago
+        threshold = int(now - self.seconds)
+        low = 1  # never played (0) never counts as recent or old
+        return {
+            "<": (threshold + 1, inf), "<=": (threshold, inf), "=": (threshold, inf),
+            ">": (low, threshold - 1), ">=": (low, threshold)
+        }[self.op]
+    
+    def indexed(self, db) -> bool:
+        return not self.negate and self.field in db.sorted_indexes
+    
+    def estimate(self, db) -> int:
+        if not self.indexed(db):
+            return len(db.games)
+        return db.sorted_indexes[self.field].count_range(*self.bounds(time.time()))
+    
+    def candidates(self, db) -> Set[str]:
+        return db.sorted_indexes[self.field].range_ids(*self.bounds(time.time()))
+    
+    def matches(self, game: Dict[str, Any]) -> bool:
+        low, high = self.bounds(time.time())
+        return low <= game.get(self.field, 0) <= high
+    
+    def expires(self, game: Dict[str, Any], now: float) -> Optional[float]:
+        if self.never or self.field == "playtime":
+            return None
+        value = game.get(self.field, 0) or 0
+        if not value:
+            return None
+        # The age crosses the threshold once, a second after value + seconds at the latest
+        at = value + self.seconds + 1
+        return at if at > now else None
+    
+    def describe(self) -> str:
+        if self.never:
+            return f"{self.field} = never"
+        if self.field == "playtime":
+            return f"playtime {self.op} {self.seconds}s"
+        return f"age({self.field}) {self.op} {self.seconds}s"
+
+
+class TextClause(Clause):
+    """Fuzzy search, or exact name substring when quoted"""
+    
+    def __init__(self, text: str, exact: bool = False):
+        self.text = text
+        self.exact = exact
+        self._folded = text.casefold()
+        self._ranked: Optional[List[str]] = None
+        self.FIELDS = frozenset({"name"} if exact else {"name", "notes", "tags"})
+    
+    def local(self) -> bool:
+        # Fuzzy matches are ranked against the whole library
+        return self.exact or self.negate
+    
+    def ranked(self, db) -> List[str]:
+        """Ids returned by the trigram index, best first"""
+        if self._ranked is None:
+            self._ranked = [game_id for game_id, _ in db.text_index.search(self.text)]
+        return self._ranked
+    
+    def indexed(self, db) -> bool:
+        return not self.negate
+    
+    def estimate(self, db) -> int:
+        if self.negate:
+            return len(db.games)
+        return len(self.ranked(db))
+    
+    def candidates(self, db) -> Set[str]:
+        return set(self.ranked(db))
+    
+    def matches(self, game: Dict[str, Any]) -> bool:
+        if self.exact or self.negate:
+            return self._folded in game.get("name", "").casefold()
+        # Fuzzy matches are only known through the index
+        return True
+    
+    def describe(self) -> str:
+        kind = "name contains" if self.exact else "fuzzy"
+        return f"{kind} {self.text!r}"
+
+
+class Query:
+    """A parsed query that can be planned and executed against a Database"""
+    
+    # An index whose result is this many times larger than the current
+    # candidates is cheaper to test per candidate than to intersect
+    INTERSECT_RATIO = 4
+    
+    def __init__(self, text: str, clauses: List[Clause]):
+        self.text = text
+        self.clauses = clauses
+    
+    def fields(self) -> Set[str]:
+        """Record fields any clause reads"""
+        fields: Set[str] = set()
+        for clause in self.clauses:
+            fields |= clause.FIELDS
+        return fields
+    
+    def local(self) -> bool:
+        """Whether test() can decide the query one record at a time"""
+        return all(clause.local() for clause in self.clauses)
+    
+    def test(self, game: Dict[str, Any]) -> bool:
+        """Evaluate a local query against one game"""
+        return all(clause.test(game) for clause in self.clauses)
+    
+    def expires(self, game: Dict[str, Any], now: float) -> Optional[float]:
+        """Earliest time test() may change for game as time passes"""
+        times = [t for t in (c.expires(game, now) for c in self.clauses) if t is not None]
+        return min(times) if times else None
+    
+    def _plan(self, db) -> Tuple[List[Tuple[Clause, int]], List[Clause]]:
+        """Split clauses into index lookups (most selective first) and filters"""
+        for clause in self.clauses:
+            if isinstance(clause, TextClause):
+                clause._ranked = None
+        # Tag and favorite conditions collapse into a single bitmap expression
+        clauses = [c for c in self.clauses if not isinstance(c, (TagClause, FavoriteClause))]
+        bitmap_clauses = [c for c in self.clauses if isinstance(c, (TagClause, FavoriteClause))]
+        if bitmap_clauses:
+            clauses.append(BitmapClause(bitmap_clauses))
+        ranked = sorted(
+            ((c, c.estimate(db)) for c in clauses if c.indexed(db)),
+            key=lambda item: item[1]
+        )
+        filters = [c for c in clauses if not c.indexed(db)]
+        
+        lookups = ranked[:1]
+        remaining = ranked[0][1] if ranked else 0
+        for clause, estimate in ranked[1:]:
+            fuzzy = isinstance(clause, TextClause) and not clause.exact
+            if fuzzy or estimate <= remaining * self.INTERSECT_RATIO:
+                lookups.append((clause, estimate))
+                remaining = min(remaining, estimate)
+            else:
+                filters.append(clause)
+        return lookups, filters
+    
+    def execute(self, db) -> List[Dict[str, Any]]:
+        """Run the query, ranked by relevance when it has a text search"""
+        lookups, filters = self._plan(db)
+        
+        if lookups:
+            ids = set(lookups[0][0].candidates(db))
+            for clause, _ in lookups[1:]:
+                if not ids:
+                    break
+                ids &= clause.candidates(db)
+            games = [db.get_game_by_id(game_id) for game_id in ids]
+            games = [g for g in games if g is not None]
+        else:
+            games = db.games
+        
+        for clause in filters:
+            games = [g for g in games if clause.test(g)]
+        # Quoted text also needs checking after an index lookup
+        for clause, _ in lookups:
+            if isinstance(clause, TextClause) and clause.exact:
+                games = [g for g in games if clause.test(g)]
+        
+        text = next((c for c in self.clauses if isinstance(c, TextClause) and c.indexed(db)), None)
+        if text is not None:
+            rank = {game_id: i for i, game_id in enumerate(text.ranked(db))}
+            games = sorted(games, key=lambda g: rank.get(g.get("id"), len(rank)))
+        elif games is db.games:
+            games = list(games)
+        return games
+    
+    def explain(self, db) -> str:
+        """Describe how the query will be executed"""
+        lookups, filters = self._plan(db)
+        lines = [f"query: {self.text!r}"]
+        if not self.clauses:
+            lines.append("  scan all games")
+            return "\n".join(lines)
+        
+        step = 1
+        if lookups:
+            first, estimate = lookups[0]
+            if isinstance(first, RangeClause):
+                kind = "range scan"
+            elif isinstance(first, BitmapClause):
+                kind = "bitmap lookup"
+            else:
+                kind = "index lookup"
+            lines.append(f"  {step}. {kind} {first.describe()} (~{estimate} games)")
+            for clause, estimate in lookups[1:]:
+                step += 1
+                lines.append(f"  {step}. intersect index {clause.describe()} (~{estimate} games)")
+        else:
+            lines.append(f"  {step}. full scan ({len(db.games)} games)")
+        for clause in filters:
+            step += 1
+            prefix = "NOT " if clause.negate else ""
+            lines.append(f"  {step}. filter {prefix}{clause.describe()}")
+        return "\n".join(lines)
+
+
+def _make_clause(field: str, op: str, value: str) -> Optional[Clause]:
+    """Build the clause for field/op/value, or None if it is not valid"""
+    field = FIELD_ALIASES.get(field.lower())
+    if field is None:
+        return None
+    
+    # 'last:<30d' and 'last<30d' mean the same
+    if op.startswith(":") and len(op) > 1:
+        op = op[1:]
+    elif op in (":", "=") and value[:1] in "<>":
+        op = value[:2] if value[1:2] == "=" else value[:1]
+        value = value[len(op):]
+    if op == ":":
+        op = "="
+    
+    if field == "tags":
+        return TagClause(value) if op == "=" and value else None
+    if field == "favorite":
+        lowered = value.lower()
+        if lowered in TRUE_WORDS:
+            return FavoriteClause(True)
+        if lowered in FALSE_WORDS:
+            return FavoriteClause(False)
+        return None
+    if field in ("id", "path"):
+        return KeyClause(field, value) if op == "=" else None
+    if field == "name":
+        return TextClause(value, exact=True) if op == "=" else None
+    
+    if field == "last_played" and value.lower() in ("never", "nunca"):
+        return RangeClause(field, "=", 0, never=True)
+    seconds = parse_duration(value, "h" if field == "playtime" else "d")
+    if seconds is None:
+        return None
+    return RangeClause(field, op, seconds)
+
+def parse_query(text: str) -> Query:
+    """Parse search box text into a Query"""
+    clauses: List[Clause] = []
+    words: List[str] = []
+    
+    for match in _TOKEN.finditer(text):
+        negate, field, op, value, quoted, word = match.groups()
+        if field is not None:
+            clause = _make_clause(field, op, value.strip('"'))
+            if clause is None:
+                # Not a valid clause, search for it as text
+                words.append(match.group(0).lstrip("-"))
+                continue
+        elif quoted is not None:
+            if not quoted.strip():
+                continue
+            clause = TextClause(quoted, exact=True)
+        elif negate:
+            # '-word' hides games whose name contains word
+            clause = TextClause(word, exact=True)
+        else:
+            words.append(word)
+            continue
+        
+        clause.negate = bool(negate)
+        clauses.append(clause)
+    
+    if words:
+        clauses.append(TextClause(" ".join(words)))
+    return Query(text, clauses)
\ No newline at end of file
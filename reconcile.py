@@ -0,0 +1,42 @@
+"""
+External change detection for GxLauncher
+Record-level differences between the library in memory and on disk
+"""
+
+from typing import Any, Dict, List, Set
+
+_MISSING = object()
+
+class LibraryDiff:
+    """What an external edit of the library files changed
+    
+    changed maps each game id to the fields that differ. conflicts lists
+    games that were also edited here and not saved yet; those keep the
+    local version.
+    """
+    
+    def __init__(self):
+        self.added: List[str] = []
+        self.changed: Dict[str, Set[str]] = {}
+        self.removed: List[str] = []
+        self.conflicts: List[str] = []
+    
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed or self.conflicts)
+    
+    def fields(self) -> Set[str]:
+        """Every field changed in any record"""
+        fields: Set[str] = set()
+        for changed in self.changed.values():
+            fields |= changed
+        return fields
+    
+    def __repr__(self) -> str:
+        return (f"LibraryDiff(added={len(self.added)}, changed={len(self.changed)}, "
+                f"removed={len(self.removed)}, conflicts={len(self.conflicts)})")
+
+
+def changed_fields(old: Dict[str, Any], new: Dict[str, Any]) -> Set[str]:
+    """Fields added, removed or given a different value"""
+    return {key for key in old.keys() | new.keys()
+            if old.get(key, _MISSING) != new.get(key, _MISSING)}
\ No newline at end of file
@@ -0,0 +1,251 @@
+"""
+Compact game records for GxLauncher
+"""
+
+import sys
+import threading
+import time
+from collections.abc import MutableMapping
+from operator import attrgetter, itemgetter
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Key orders shared between records, most libraries only have a handful
+_ORDERS: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+_MISSING = object()
+
+# Fields every game has, in the order defaults are appended
+GAME_FIELDS = ("id", "name", "path", "cover", "playtime", "last_played",
+               "added", "favorite", "tags")
+_FIELDS = frozenset(GAME_FIELDS)
+
+# Large text fields only the details panel reads, kept out of the records
+# and stored in details.db (see DetailStore)
+COLD_FIELDS = ("notes",)
+
+# Version of the library file layout. Files stamped with it hold complete
+# records without cold fields; older ones (schema 1 was unstamped, schema 2
+# still held notes) are normalized and rewritten on load.
+SCHEMA_VERSION = 3
+
+_id_lock = threading.Lock()
+_last_id = 0
+
+def new_game_id(now: Optional[float] = None) -> str:
+    """Millisecond timestamp id, bumped so ids made in the same millisecond never collide"""
+    global _last_id
+    with _id_lock:
+        _last_id = max(int((now if now is not None else time.time()) * 1000), _last_id + 1)
+        return str(_last_id)
+
+def _order(keys: Tuple[str, ...]) -> Tuple[str, ...]:
+    return _ORDERS.setdefault(keys, keys)
+
+class GameRecord(MutableMapping):
+    """A game stored in __slots__ that behaves like the dict it replaces
+    
+    Known fields live in slots, anything else in a small extra dict. The
+    key order of the source dict is kept, so json.dump(record.to_dict())
+    writes exactly the bytes the plain dict would have.
+    """
+    
+    __slots__ = GAME_FIELDS + ("_keys", "_extra")
+    
+    def __init__(self, data: Optional[Dict[str, Any]] = None):
+        self._extra: Optional[Dict[str, Any]] = None
+        keys: Tuple[str, ...] = ()
+        if data:
+            keys = tuple(data)
+            for key, value in data.items():
+                if key in _FIELDS:
+                    if key == "tags" and isinstance(value, list):
+                        value = [sys.intern(t) if type(t) is str else t for t in value]
+                    setattr(self, key, value)
+                else:
+                    if self._extra is None:
+                        self._extra = {}
+                    self._extra[key] = value
+        self._keys = _order(keys)
+    
+    @classmethod
+    def with_defaults(cls, data: Dict[str, Any], now: Optional[float] = None) -> "GameRecord":
+        """Build a record from data, appending any missing field with its default"""
+        record = cls(data)
+        if len(record._keys) >= len(GAME_FIELDS) and _FIELDS.issubset(record._keys):
+            return record
+        if now is None:
+            now = time.time()
+        missing = tuple(key for key in GAME_FIELDS if key not in record)
+        for key in missing:
+            setattr(record, key, cls._default(key, now))
+        record._keys = _order(record._keys + missing)
+        return record
+    
+    @staticmethod
+    def _default(key: str, now: float) -> Any:
+        if key == "id":
+            return new_game_id(now)
+        if key == "name":
+            return "Unknown Game"
+        if key in ("playtime", "last_played"):
+            return 0
+        if key == "added":
+            return int(now)
+        if key == "favorite":
+            return False
+        if key == "tags":
+            return []
+        return ""
+    
+    def __getitem__(self, key: str) -> Any:
+        if key in _FIELDS:
+            value = getattr(self, key, _MISSING)
+        elif self._extra is not None:
+            value = self._extra.get(key, _MISSING)
+        else:
+            value = _MISSING
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in _FIELDS:
+            return getattr(self, key, default)
+        if self._extra is not None:
+            return self._extra.get(key, default)
+        return default
+    
+    def __contains__(self, key: object) -> bool:
+        if key in _FIELDS:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+    
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key not in self:
+            self._keys = _order(self._keys + (key,))
+        if key in _FIELDS:
+            if key == "tags" and isinstance(value, list):
+                value = [sys.intern(t) if type(t) is str else t for t in value]
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+    
+    def __delitem__(self, key: str) -> None:
+        if key not in self:
+            raise KeyError(key)
+        if key in _FIELDS:
+            delattr(self, key)
+        else:
+            del self._extra[key]
+            if not self._extra:
+                self._extra = None
+        self._keys = _order(tuple(k for k in self._keys if k != key))
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+    
+    def __len__(self) -> int:
+        return len(self._keys)
+    
+    def clear(self) -> None:
+        for key in self._keys:
+            if key in _FIELDS:
+                delattr(self, key)
+        self._keys = ()
+        self._extra = None
+    
+    def copy(self) -> "GameRecord":
+        return GameRecord(self.to_dict())
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the record as a plain dict in its original key order"""
+        return {key: self[key] for key in self._keys}
+    
+    def __repr__(self) -> str:
+        return f"GameRecord({self.to_dict()!r})"
+
+
+def pack_records(records: List[GameRecord]) -> Tuple[List[Tuple[str, ...]], List[tuple]]:
+    """Flatten records into (key orders, rows) for a binary snapshot"""
+    orders: Dict[Tuple[str, ...], int] = {}
+    rows = []
+    for r in records:
+        order = orders.setdefault(r._keys, len(orders))
+        rows.append((order, r.get("id"), r.get("name"), r.get("path"), r.get("cover"),
+                     r.get("playtime"), r.get("last_played"), r.get("added"),
+                     r.get("favorite"), r.get("tags"), r._extra))
+    return list(orders), rows
+
+
+_SLOT_VALUES = attrgetter(*GAME_FIELDS)
+_ITEM_VALUES = itemgetter(*GAME_FIELDS)
+_TAGS = GAME_FIELDS.index("tags")
+
+def _frozen(value: Any) -> Any:
+    if isinstance(value, (list, tuple)):
+        return tuple(_frozen(v) for v in value)
+    if isinstance(value, dict):
+        return frozenset((k, _frozen(v)) for k, v in value.items())
+    return value
+
+
+def content_hash(record: Dict[str, Any]) -> int:
+    """Hash of a record's fields and values, the same for a GameRecord and an equal dict
+    
+    Only meaningful within one process, str hashes are salted per run.
+    """
+    try:
+        if isinstance(record, GameRecord):
+            values, extra = _SLOT_VALUES(record), record._extra
+        else:
+            values = _ITEM_VALUES(record)
+            extra = None
+            if len(record) > len(GAME_FIELDS):
+                extra = {key: value for key, value in record.items() if key not in _FIELDS}
+        values = values[:_TAGS] + (_frozen(values[_TAGS]),) + values[_TAGS + 1:]
+        return hash((values, _frozen(extra) if extra else None))
+    except (AttributeError, KeyError, TypeError):
+        # Missing fields or unusual values
+        return hash(frozenset((key, _frozen(value)) for key, value in record.items()))
+
+
+def unpack_records(orders: List[Tuple[str, ...]], rows: List[tuple]) -> List[GameRecord]:
+    """Rebuild records from pack_records() output without re-validating them"""
+    orders = [_order(tuple(keys)) for keys in orders]
+    new = object.__new__
+    records = []
+    for row in rows:
+        r = new(GameRecord)
+        (order, r.id, r.name, r.path, r.cover, r.playtime, r.last_played,
+         r.added, r.favorite, r.tags, r._extra) = row
+        r._keys = orders[order]
+        if len(r._keys) != len(GAME_FIELDS) + len(r._extra or ()):
+            # Some field was deleted from this record
+            for key in _FIELDS.difference(r._keys):
+                delattr(r, key)
+        records.append(r)
+    return records
+
+
+def migrate_records(games: List[Dict[str, Any]]) -> List[GameRecord]:
+    """Normalize records read from a file older than SCHEMA_VERSION
+    
+    The whole batch shares one timestamp for its defaults, and games
+    without an id get distinct ones.
+    """
+    now = time.time()
+    return [GameRecord.with_defaults(g, now) for g in games]
+
+
+def cold_fields(game: Dict[str, Any]) -> Dict[str, Any]:
+    """Get the cold fields present in game"""
+    return {key: game[key] for key in COLD_FIELDS if key in game}
+
+
+def to_json(obj: Any) -> Any:
+    """json.dump default hook that writes records as the dicts they mimic"""
+    if isinstance(obj, GameRecord):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
\ No newline at end of file
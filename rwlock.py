@@ -0,0 +1,112 @@
+"""
+Reader-writer lock for GxLauncher
+Lets any number of threads read the library while one thread writes it
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+class RWLock:
+    """Many readers or one writer, both sides reentrant
+    
+    The writing thread may also read. A thread holding only a read lock
+    cannot upgrade to writing, that raises RuntimeError instead of
+    deadlocking. Waiting writers hold back new readers, so a steady
+    stream of reads cannot starve them. Used directly as a context
+    manager (or through acquire/release) it takes the write side.
+    """
+    
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        # Per thread: reads, writes (nesting depths) and counted (in _readers)
+        self._local = threading.local()
+        self._readers = 0
+        self._writer: Optional[int] = None
+        self._waiting_writers = 0
+    
+    def _state(self) -> threading.local:
+        local = self._local
+        try:
+            local.reads
+        except AttributeError:
+            local.reads = local.writes = 0
+            local.counted = False
+        return local
+    
+    def acquire_read(self) -> None:
+        local = self._state()
+        if local.reads or local.writes:
+            local.reads += 1
+            return
+        with self._cond:
+            while self._writer is not None or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        local.counted = True
+        local.reads = 1
+    
+    def release_read(self) -> None:
+        local = self._state()
+        if not local.reads:
+            raise RuntimeError("release_read() without a read lock")
+        local.reads -= 1
+        if not local.reads and local.counted:
+            local.counted = False
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+    
+    def acquire(self) -> None:
+        """Take the write side"""
+        local = self._state()
+        if local.writes:
+            local.writes += 1
+            return
+        if local.reads:
+            raise RuntimeError("cannot upgrade a read lock to a write lock")
+        with self._cond:
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = threading.get_ident()
+        local.writes = 1
+    
+    def release(self) -> None:
+        local = self._state()
+        if not local.writes:
+            raise RuntimeError("release() without the write lock")
+        local.writes -= 1
+        if local.writes:
+            return
+        with self._cond:
+            self._writer = None
+            if local.reads:
+                # Still inside a read taken while writing, keep reading
+                self._readers += 1
+                local.counted = True
+            self._cond.notify_all()
+    
+    def __enter__(self) -> "RWLock":
+        self.acquire()
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        self.release()
+    
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        """Hold the read side for a block"""
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+    
+    def write(self) -> "RWLock":
+        """Hold the write side for a block"""
+        return self
\ No newline at end of file
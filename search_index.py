@@ -0,0 +1,229 @@
+"""
+Fuzzy search index for GxLauncher
+Trigram inverted index over game names, notes and tags
+"""
+
+import heapq
+import math
+import re
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+_WORD_SPLIT = re.compile(r"[^\w]+|_")
+
+def tokenize(text: str) -> List[str]:
+    """Split text into case-folded words"""
+    return [w for w in _WORD_SPLIT.split(text.casefold()) if w]
+
+def trigrams(text: str) -> Set[str]:
+    """Get the padded trigrams of every word in text"""
+    grams = set()
+    for word in tokenize(text):
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+def inner_trigrams(text: str) -> Set[str]:
+    """Get the unpadded trigrams of text, used for plain substring matches"""
+    text = text.casefold()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def short_grams(text: str) -> Set[str]:
+    """Get every one and two character substring of text, for queries too short for trigrams"""
+    text = text.casefold()
+    return set(text) | {text[i:i + 2] for i in range(len(text) - 1)}
+
+class TrigramIndex:
+    """Incrementally maintained trigram index with similarity ranking
+    
+    Notes are not part of the game records, they are fed by id through
+    set_notes(). With a notes_loader the notes of the whole library are
+    only read on the first search.
+    """
+    
+    FIELDS = frozenset({"name", "tags"})
+    
+    # Minimum fraction of query trigrams a game must share to be returned
+    MIN_SCORE = 0.45
+    # Weak matches are dropped when much better ones exist
+    RELATIVE_CUTOFF = 0.8
+    # Matches in notes and tags count less than matches in the name
+    TEXT_WEIGHT = 0.6
+    
+    def __init__(self, notes_loader: Optional[Callable[[], Iterable[Tuple[str, str]]]] = None):
+        self._name_postings: Dict[str, Set[str]] = {}
+        self._text_postings: Dict[str, Set[str]] = {}
+        self._inner_postings: Dict[str, Set[str]] = {}
+        self._short_postings: Dict[str, Set[str]] = {}
+        # (name grams, notes and tag grams, inner name grams, folded name, tag grams)
+        self._entries: Dict[str, Tuple[Set[str], Set[str], Set[str], str, Set[str]]] = {}
+        # Notes trigrams by game id, they outlive the entries
+        self._notes: Dict[str, Set[str]] = {}
+        self.notes_loader = notes_loader
+        self._notes_loaded = False
+        # Concurrent first searches must not load the notes twice
+        self._load_lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def clear(self) -> None:
+        self._name_postings.clear()
+        self._text_postings.clear()
+        self._inner_postings.clear()
+        self._short_postings.clear()
+        self._entries.clear()
+    
+    def clear_notes(self) -> None:
+        """Forget every note, the loader runs again on the next search"""
+        for game_id in list(self._notes):
+            self._set_note_grams(game_id, set())
+        self._notes_loaded = False
+    
+    def set_notes(self, game_id: str, notes: str) -> None:
+        """Index the notes of a game, "" removes them"""
+        if self.notes_loader is not None and not self._notes_loaded:
+            # The loader will read the stored notes, this one included
+            return
+        self._set_note_grams(game_id, trigrams(notes or ""))
+    
+    def _set_note_grams(self, game_id: str, grams: Set[str]) -> None:
+        if grams:
+            self._notes[game_id] = grams
+        else:
+            self._notes.pop(game_id, None)
+        entry = self._entries.get(game_id)
+        if entry is None:
+            return
+        text_grams = entry[4] | grams
+        self._remove_postings(game_id, entry[1], self._text_postings)
+        for gram in text_grams:
+            self._text_postings.setdefault(gram, set()).add(game_id)
+        self._entries[game_id] = (entry[0], text_grams) + entry[2:]
+    
+    def _load_notes(self) -> None:
+        with self._load_lock:
+            if self._notes_loaded:
+                return
+            if self.notes_loader is not None:
+                for game_id, notes in self.notes_loader():
+                    self._set_note_grams(game_id, trigrams(notes or ""))
+            self._notes_loaded = True
+    
+    def add(self, game: Dict[str, Any]) -> None:
+        """Index a game's searchable text"""
+        game_id = game.get("id")
+        if game_id in self._entries:
+            self.discard(game_id)
+        
+        name = game.get("name", "") or ""
+        tag_grams = trigrams(" ".join(game.get("tags", []) or []))
+        entry = (trigrams(name), tag_grams | self._notes.get(game_id, set()),
+                 inner_trigrams(name), name.casefold(), tag_grams)
+        self._entries[game_id] = entry
+        
+        for grams, postings in zip(entry[:3] + (short_grams(entry[3]),), self._postings()):
+            for gram in grams:
+                postings.setdefault(gram, set()).add(game_id)
+    
+    def discard(self, game_id: str) -> None:
+        """Remove a game using the text it was indexed with"""
+        entry = self._entries.pop(game_id, None)
+        if entry is None:
+            return
+        
+        for grams, postings in zip(entry[:3] + (short_grams(entry[3]),), self._postings()):
+            self._remove_postings(game_id, grams, postings)
+    
+    @staticmethod
+    def _remove_postings(game_id: str, grams: Set[str], postings: Dict[str, Set[str]]) -> None:
+        for gram in grams:
+            ids = postings.get(gram)
+            if ids is not None:
+                ids.discard(game_id)
+                if not ids:
+                    del postings[gram]
+    
+    def _postings(self) -> Tuple[Dict[str, Set[str]], ...]:
+        return self._name_postings, self._text_postings, self._inner_postings, self._short_postings
+    
+    def search(self, query: str, limit: int = 0) -> List[Tuple[str, float]]:
+        """Find games similar to query, best matches first
+        
+        Returns (game_id, score) pairs. A game matches when it shares enough
+        trigrams with the query, or when its name contains the query text.
+        """
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+        if not self._notes_loaded:
+            self._load_notes()
+        
+        total = len(query_grams)
+        candidates = self._substring_candidates(query)
+        candidates |= self._candidates(self._name_postings, query_grams,
+                                       math.ceil(self.MIN_SCORE * total))
+        candidates |= self._candidates(self._text_postings, query_grams,
+                                       math.ceil(self.MIN_SCORE * total / self.TEXT_WEIGHT))
+        
+        text = query.casefold().strip()
+        results = []
+        for game_id in candidates:
+            name_grams, text_grams, _, name, _ = self._entries[game_id]
+            name_shared = len(name_grams & query_grams)
+            if text and text in name:
+                # No trigram score is higher, notes and tags need not be compared
+                score = 1.0
+            else:
+                text_shared = len(text_grams & query_grams)
+                score = max(name_shared, self.TEXT_WEIGHT * text_shared) / total
+                if score < self.MIN_SCORE:
+                    continue
+            # Prefer names that are close to the query in length too
+            overlap = name_shared / (total + len(name_grams) - name_shared or 1)
+            results.append((game_id, score, overlap))
+        
+        key = lambda r: (r[1], r[2])
+        if limit:
+            # Short queries match much of the library, only the best are sorted
+            results = heapq.nlargest(limit, results, key=key)
+        else:
+            results.sort(key=key, reverse=True)
+        if results:
+            cutoff = results[0][1] * self.RELATIVE_CUTOFF
+            results = [r for r in results if r[1] >= cutoff]
+        if limit:
+            results = results[:limit]
+        return [(game_id, score) for game_id, score, _ in results]
+    
+    @staticmethod
+    def _candidates(postings: Dict[str, Set[str]], grams: Set[str], needed: int) -> Set[str]:
+        """Collect ids that can share at least needed grams with the query
+        
+        Any such id must appear in one of the len(grams) - needed + 1 rarest
+        posting lists, so the very common trigrams never have to be walked.
+        """
+        if needed > len(grams):
+            return set()
+        lists = sorted((postings.get(g, ()) for g in grams), key=len)
+        candidates: Set[str] = set()
+        for ids in lists[:len(grams) - max(needed, 1) + 1]:
+            candidates.update(ids)
+        return candidates
+    
+    def _substring_candidates(self, query: str) -> Set[str]:
+        """Games whose name may contain query as a plain substring"""
+        text = query.casefold().strip()
+        grams = inner_trigrams(text)
+        if not grams:
+            # Too short for trigrams, the names are indexed by their shorter substrings too
+            return set(self._short_postings.get(text, ()))
+        
+        postings = sorted((self._inner_postings.get(g, set()) for g in grams), key=len)
+        candidates = set(postings[0])
+        for ids in postings[1:]:
+            candidates &= ids
+            if not candidates:
+                break
+        return candidates
\ No newline at end of file
@@ -0,0 +1,227 @@
+"""
+Play session history for GxLauncher
+Raw sessions plus daily and weekly rollups kept in SQLite
+"""
+
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+class SessionStore:
+    """Stores one row per play session and keeps per-day/per-week totals
+    
+    The rollup tables are updated in the same transaction as the session
+    insert, so history queries read a few rollup rows per game instead of
+    scanning every session. A session crossing midnight has its seconds
+    split between the days (and weeks) it covers and is counted once, on
+    the day it started. Days and weeks use local time, weeks start on
+    Monday.
+    """
+    
+    def __init__(self, path: str = "sessions.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "id INTEGER PRIMARY KEY, game_id TEXT NOT NULL, start INTEGER NOT NULL, "
+                "end INTEGER NOT NULL, duration INTEGER NOT NULL, exit_code INTEGER)"
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS sessions_game ON sessions (game_id, start)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS daily ("
+                "game_id TEXT NOT NULL, day TEXT NOT NULL, weekday INTEGER NOT NULL, "
+                "seconds INTEGER NOT NULL, sessions INTEGER NOT NULL, "
+                "PRIMARY KEY (game_id, day))"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS daily_day ON daily (day)")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS weekly ("
+                "game_id TEXT NOT NULL, week TEXT NOT NULL, "
+                "seconds INTEGER NOT NULL, sessions INTEGER NOT NULL, "
+                "PRIMARY KEY (game_id, week))"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS weekly_week ON weekly (week)")
+    
+    @staticmethod
+    def _week_of(day: date) -> date:
+        return day - timedelta(days=day.weekday())
+    
+    @staticmethod
+    def _split_days(start: int, end: int) -> Iterator[Tuple[date, int]]:
+        """Yield (local day, seconds) for every day a session overlaps"""
+        current = datetime.fromtimestamp(start)
+        finish = datetime.fromtimestamp(end)
+        while current < finish:
+            midnight = datetime.combine(current.date() + timedelta(days=1), datetime.min.time())
+            step_end = min(midnight, finish)
+            yield current.date(), int(round((step_end - current).total_seconds()))
+            current = step_end
+    
+    def add_session(self, game_id: str, start: int, end: int,
+                    exit_code: Optional[int] = None) -> bool:
+        """Store a finished session and fold it into the rollups"""
+        start, end = int(start), int(end)
+        if end < start:
+            return False
+        
+        daily: Dict[date, int] = {}
+        weekly: Dict[date, int] = {}
+        for day, seconds in self._split_days(start, end):
+            daily[day] = daily.get(day, 0) + seconds
+            week = self._week_of(day)
+            weekly[week] = weekly.get(week, 0) + seconds
+        first_day = datetime.fromtimestamp(start).date()
+        daily.setdefault(first_day, 0)
+        weekly.setdefault(self._week_of(first_day), 0)
+        
+        try:
+            with self._lock, self.conn:
+                self.conn.execute(
+                    "INSERT INTO sessions (game_id, start, end, duration, exit_code) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (game_id, start, end, end - start, exit_code)
+                )
+                self.conn.executemany(
+                    "INSERT INTO daily (game_id, day, weekday, seconds, sessions) "
+                    "VALUES (?, ?, ?, ?, ?) ON CONFLICT(game_id, day) DO UPDATE SET "
+                    "seconds = seconds + excluded.seconds, sessions = sessions + excluded.sessions",
+                    ((game_id, day.isoformat(), day.weekday(), seconds, int(day == first_day))
+                     for day, seconds in daily.items())
+                )
+                first_week = self._week_of(first_day)
+                self.conn.executemany(
+                    "INSERT INTO weekly (game_id, week, seconds, sessions) "
+                    "VALUES (?, ?, ?, ?) ON CONFLICT(game_id, week) DO UPDATE SET "
+                    "seconds = seconds + excluded.seconds, sessions = sessions + excluded.sessions",
+                    ((game_id, week.isoformat(), seconds, int(week == first_week))
+                     for week, seconds in weekly.items())
+                )
+            return True
+        except sqlite3.Error as e:
+            print(f"Error saving session: {e}")
+            return False
+    
+    def _query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        try:
+            with self._lock:
+                return self.conn.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            print(f"Error reading sessions: {e}")
+            return []
+    
+    @staticmethod
+    def _game_filter(game_id: Optional[str], params: list) -> str:
+        if game_id is None:
+            return ""
+        params.append(game_id)
+        return " AND game_id = ?"
+    
+    def recent_sessions(self, game_id: Optional[str] = None, limit: int = 10) -> List[Dict[str, Any]]:
+        """Get the latest sessions, newest first"""
+        params: list = []
+        where = self._game_filter(game_id, params)
+        params.append(limit)
+        rows = self._query(
+            "SELECT game_id, start, end, duration, exit_code FROM sessions "
+            f"WHERE 1 = 1{where} ORDER BY start DESC LIMIT ?", tuple(params)
+        )
+        return [{"game_id": r[0], "start": r[1], "end": r[2], "duration": r[3], "exit_code": r[4]}
+                for r in rows]
+    
+    def _since(self, days: int) -> str:
+        return (date.today() - timedelta(days=days - 1)).isoformat()
+    
+    def playtime_by_game(self, days: int = 30) -> Dict[str, int]:
+        """Get seconds played per game over the last days (today included)"""
+        rows = self._query(
+            "SELECT game_id, SUM(seconds) FROM daily WHERE day >= ? "
+            "GROUP BY game_id ORDER BY SUM(seconds) DESC", (self._since(days),)
+        )
+        return {game_id: seconds for game_id, seconds in rows}
+    
+    def daily(self, game_id: Optional[str] = None, days: int = 30) -> List[Tuple[str, int, int]]:
+        """Get (ISO day, seconds, sessions) for the last days, oldest first"""
+        params = [self._since(days)]
+        where = self._game_filter(game_id, params)
+        return self._query(
+            "SELECT day, SUM(seconds), SUM(sessions) FROM daily "
+            f"WHERE day >= ?{where} GROUP BY day ORDER BY day", tuple(params)
+        )
+    
+    def weekly(self, game_id: Optional[str] = None, weeks: int = 12) -> List[Tuple[str, int, int]]:
+        """Get (ISO Monday, seconds, sessions) for the last weeks, oldest first"""
+        since = self._week_of(date.today()) - timedelta(weeks=weeks - 1)
+        params = [since.isoformat()]
+        where = self._game_filter(game_id, params)
+        return self._query(
+            "SELECT week, SUM(seconds), SUM(sessions) FROM weekly "
+            f"WHERE week >= ?{where} GROUP BY week ORDER BY week", tuple(params)
+        )
+    
+    def by_weekday(self, game_id: Optional[str] = None) -> List[Tuple[int, int]]:
+        """Get (sessions, seconds) for each weekday, Monday first"""
+        params: list = []
+        where = self._game_filter(game_id, params)
+        totals = [(0, 0)] * 7
+        for weekday, sessions, seconds in self._query(
+                "SELECT weekday, SUM(sessions), SUM(seconds) FROM daily "
+                f"WHERE 1 = 1{where} GROUP BY weekday", tuple(params)):
+            totals[weekday] = (sessions, seconds)
+        return totals
+    
+    def totals(self, game_id: str) -> Tuple[int, int]:
+        """Get (sessions, seconds) ever recorded for a game"""
+        row = self._query(
+            "SELECT SUM(sessions), SUM(seconds) FROM weekly WHERE game_id = ?", (game_id,)
+        )
+        sessions, seconds = row[0] if row else (None, None)
+        return sessions or 0, seconds or 0
+    
+    def rename_game(self, old_id: str, new_id: str) -> bool:
+        """Move a game's history to its new id"""
+        try:
+            with self._lock, self.conn:
+                for table in ("sessions", "daily", "weekly"):
+                    self.conn.execute(f"DELETE FROM {table} WHERE game_id = ?", (new_id,))
+                    self.conn.execute(f"UPDATE {table} SET game_id = ? WHERE game_id = ?",
+                                      (new_id, old_id))
+            return True
+        except sqlite3.Error as e:
+            print(f"Error renaming sessions: {e}")
+            return False
+    
+    def remove_games(self, game_ids: List[str]) -> bool:
+        """Forget the history of removed games"""
+        try:
+            with self._lock, self.conn:
+                for table in ("sessions", "daily", "weekly"):
+                    self.conn.executemany(f"DELETE FROM {table} WHERE game_id = ?",
+                                          ((game_id,) for game_id in game_ids))
+            return True
+        except sqlite3.Error as e:
+            print(f"Error removing sessions: {e}")
+            return False
+    
+    def clear(self) -> bool:
+        """Forget every session"""
+        try:
+            with self._lock, self.conn:
+                for table in ("sessions", "daily", "weekly"):
+                    self.conn.execute(f"DELETE FROM {table}")
+            return True
+        except sqlite3.Error as e:
+            print(f"Error clearing sessions: {e}")
+            return False
+    
+    def close(self) -> None:
+        try:
+            self.conn.close()
+        except sqlite3.Error as e:
+            print(f"Error closing sessions: {e}")
\ No newline at end of file
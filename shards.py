@@ -0,0 +1,401 @@
+"""
+Library shards for GxLauncher
+Spreads the library over several files, one per drive or source
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Any, Callable, Iterator, Tuple
+from core.record import SCHEMA_VERSION
+from core.storage import StorageBackend, JsonStorage, SqliteStorage, Change, Batch
+from core.utils import normalize_path
+
+# Shard states
+ONLINE = "online"
+OFFLINE = "offline"
+LOADING = "loading"
+
+# Record field naming the shard that owns a game, absent for the main library
+SHARD_FIELD = "library"
+
+class LibraryShard:
+    """One library file, the folder its games live in and its state"""
+    
+    def __init__(self, name: str, path: str, root: str = "",
+                 storage: Optional[StorageBackend] = None):
+        self.name = name
+        self.path = path
+        # New games whose executable is under root belong to this shard
+        self.root = normalize_path(root).rstrip("/") if root else ""
+        self.storage = storage
+        self.status = LOADING
+        self.error = ""
+        # Games read from the file by the latest load
+        self.count = 0
+        # Changes were skipped while loading, the shard needs a full write
+        self.dirty = False
+    
+    def owns(self, key: str) -> bool:
+        """Check if a normalized game path is under this shard's folder"""
+        return bool(self.root) and (key == self.root or key.startswith(self.root + "/"))
+    
+    def source_files(self) -> List[str]:
+        if self.storage is not None:
+            return self.storage.source_files()
+        return [] if self.path.endswith(".db") else [self.path]
+    
+    def open(self) -> StorageBackend:
+        """Create the storage engine, called from the loading thread since it touches the drive"""
+        if self.storage is None:
+            folder = os.path.dirname(os.path.abspath(self.path))
+            if not os.path.isdir(folder):
+                raise OSError(f"folder not found: {folder}")
+            if self.path.endswith(".db"):
+                self.storage = SqliteStorage(self.path)
+            else:
+                self.storage = JsonStorage(self.path)
+        return self.storage
+
+
+class ShardedStorage(StorageBackend):
+    """Several library files merged into one library
+    
+    The main storage holds every game no other shard claims and loads on
+    the calling thread like a single file would. The other shards load
+    at the same time on a thread pool, JSON files or SQLite ones by their
+    .db extension. A shard whose folder cannot be reached is offline, and
+    one still loading SLOW_SECONDS after the load started finishes in the
+    background, its games handed to on_late_load. Games of other shards
+    carry the shard name in their "library" field; every write goes to
+    the shards owning the touched games and only online shards are written.
+    """
+    
+    SLOW_SECONDS = 3.0
+    # How long the load waits for other shards between progress reports
+    POLL_SECONDS = 0.05
+    
+    def __init__(self, main: StorageBackend, shards: List[LibraryShard]):
+        self.main = LibraryShard("", getattr(main, "path", ""), storage=main)
+        self.shards = [self.main] + shards
+        self._by_name = {shard.name: shard for shard in self.shards}
+        # Owner of every stored game id, deletes only carry the id
+        self._owner: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, len(shards)),
+                                        thread_name_prefix="shard-loader")
+        # Bumped by every load, results of older ones are dropped
+        self._token = 0
+        self._detached = False
+        # Called from the loading thread with (shard, games) once a slow shard
+        # is read, games is None if it turned out to be offline. A shard whose
+        # games came from the snapshot cache reports an empty list once opened
+        self.on_late_load: Optional[Callable[[LibraryShard, Optional[List[Dict[str, Any]]]], None]] = None
+        self.schema = main.schema
+    
+    def exists(self) -> bool:
+        return self.main.storage.exists()
+    
+    def source_files(self) -> List[str]:
+        files = []
+        for shard in self.shards:
+            sources = shard.source_files()
+            if not sources:
+                # A SQLite shard cannot be watched, neither can the whole library
+                return []
+            files.extend(sources)
+        return files
+    
+    def stale(self) -> bool:
+        return any(shard.status == ONLINE and shard.storage.stale() for shard in self.shards)
+    
+    def complete(self) -> bool:
+        """Check if every shard is loaded and online"""
+        return all(shard.status == ONLINE for shard in self.shards)
+    
+    def _tag(self, shard: LibraryShard, games: List[Any]) -> None:
+        """Mark loaded records with their shard, called with the lock held"""
+        for game in games:
+            if not isinstance(game, dict):
+                continue
+            if shard is self.main:
+                game.pop(SHARD_FIELD, None)
+            else:
+                game[SHARD_FIELD] = shard.name
+            self._owner[str(game.get("id"))] = shard.name
+    
+    def _name_of(self, game: Dict[str, Any]) -> str:
+        name = game.get(SHARD_FIELD) or ""
+        return name if name in self._by_name else ""
+    
+    def _route(self, path: str) -> LibraryShard:
+        """Get the shard with the deepest folder holding path, the main one if none does"""
+        key = normalize_path(path)
+        owners = [shard for shard in self.shards if shard.owns(key)]
+        return max(owners, key=lambda shard: len(shard.root)) if owners else self.main
+    
+    def claim(self, game: Dict[str, Any]) -> bool:
+        name = game.get(SHARD_FIELD) or ""
+        shard = self._by_name[name] if name in self._by_name and name else self._route(game.get("path", ""))
+        if shard is not self.main and shard.status != ONLINE:
+            print(f"Library {shard.name} is {shard.status}, cannot add {game.get('path')}")
+            return False
+        if shard is self.main:
+            game.pop(SHARD_FIELD, None)
+        else:
+            game[SHARD_FIELD] = shard.name
+        return True
+    
+    def _load_shard(self, shard: LibraryShard, token: int, results: queue.Queue) -> None:
+        """Read one shard on the pool and hand the games over"""
+        error = ""
+        try:
+            games = shard.open().load()
+            if games is None:
+                error = "could not read the library file"
+        except (OSError, sqlite3.Error) as e:
+            games, error = None, str(e)
+        
+        with self._lock:
+            if token != self._token:
+                return
+            if not self._detached:
+                results.put((shard, games, error))
+                return
+            if games is not None:
+                self._tag(shard, games)
+        # Arrived after the rest of the library was shown
+        if games is None:
+            self._fail(shard, error)
+        else:
+            shard.count = len(games)
+        if self.on_late_load is not None:
+            self.on_late_load(shard, games)
+    
+    def _fail(self, shard: LibraryShard, error: str) -> None:
+        shard.status = OFFLINE
+        shard.error = error
+        print(f"Library {shard.name or shard.path} is offline: {error}")
+    
+    def _arrived(self, item: Tuple[LibraryShard, Optional[List[Any]], str],
+                 batch_size: int) -> Iterator[Batch]:
+        """Yield a shard read on the pool in batches"""
+        shard, games, error = item
+        if games is None:
+            self._fail(shard, error)
+            return
+        with self._lock:
+            self._tag(shard, games)
+        shard.count = len(games)
+        shard.status = ONLINE
+        for start in range(0, len(games), batch_size):
+            self.schema = shard.storage.schema
+            yield games[start:start + batch_size], len(games)
+    
+    def iter_load(self, batch_size: int = 500) -> Iterator[Batch]:
+        """Stream the main library while the other shards load alongside
+        
+        Shards read meanwhile are mixed in between batches. Once the main
+        library is in, the load waits for the rest until SLOW_SECONDS
+        have passed, reporting progress every POLL_SECONDS.
+        """
+        with self._lock:
+            self._token += 1
+            token = self._token
+            self._detached = False
+            self._owner.clear()
+        for shard in self.shards:
+            shard.status, shard.error, shard.count, shard.dirty = LOADING, "", 0, False
+        results: queue.Queue = queue.Queue()
+        for shard in self.shards[1:]:
+            self._pool.submit(self._load_shard, shard, token, results)
+        
+        started = time.monotonic()
+        waiting = len(self.shards) - 1
+        loaded = 0
+        finished = False
+        try:
+            for batch, total in self.main.storage.iter_load(batch_size):
+                if batch is None:
+                    self._fail(self.main, "could not read the library file")
+                    yield None, 0
+                    return
+                with self._lock:
+                    self._tag(self.main, batch)
+                self.main.count += len(batch)
+                self.schema = self.main.storage.schema
+                yield batch, total + loaded
+                while waiting and not results.empty():
+                    waiting -= 1
+                    for part, _ in self._arrived(results.get(), batch_size):
+                        loaded += len(part)
+                        yield part, total + loaded
+            self.main.status = ONLINE
+            total = self.main.count
+            
+            while waiting and time.monotonic() - started < self.SLOW_SECONDS:
+                try:
+                    item = results.get(timeout=self.POLL_SECONDS)
+                except queue.Empty:
+                    # Nothing new, still lets the caller repaint; no records means no migration
+                    self.schema = SCHEMA_VERSION
+                    yield [], total + loaded
+                    continue
+                waiting -= 1
+                for part, _ in self._arrived(item, batch_size):
+                    loaded += len(part)
+                    yield part, total + loaded
+            
+            with self._lock:
+                self._detached = True
+            # Shards queued before the detach are still delivered here
+            while not results.empty():
+                for part, _ in self._arrived(results.get(), batch_size):
+                    loaded += len(part)
+                    yield part, total + loaded
+            for shard in self.shards:
+                if shard.status == LOADING:
+                    print(f"Library {shard.name} is slow, loading it in the background")
+            finished = True
+        finally:
+            if not finished:
+                with self._lock:
+                    # Failed or abandoned, late shards must not join a partial library
+                    self._token += 1
+    
+    def loaded_from_cache(self, games: List[Dict[str, Any]]) -> None:
+        """Note a load served by the snapshot cache instead of iter_load()
+        
+        The cache is only saved while every shard is online and only used
+        while every file is unchanged, so all of them can come online
+        again. Shards not opened yet are opened on the pool, as their
+        drive may be slow, and are loading until then.
+        """
+        with self._lock:
+            self._token += 1
+            token = self._token
+            self._owner = {str(game.get("id")): self._name_of(game) for game in games}
+        counts = Counter(self._owner.values())
+        for shard in self.shards:
+            shard.status = ONLINE if shard.storage is not None else LOADING
+            shard.error, shard.count, shard.dirty = "", counts[shard.name], False
+            if shard.status == LOADING:
+                self._pool.submit(self._open_shard, shard, token)
+    
+    def _open_shard(self, shard: LibraryShard, token: int) -> None:
+        """Open a shard whose games came from the snapshot cache, on the pool"""
+        error = ""
+        try:
+            shard.open()
+        except (OSError, sqlite3.Error) as e:
+            error = str(e)
+        with self._lock:
+            if token != self._token:
+                return
+        if error:
+            self._fail(shard, error)
+        if self.on_late_load is not None:
+            self.on_late_load(shard, None if error else [])
+    
+    def load(self) -> Optional[List[Dict[str, Any]]]:
+        """Read every online shard, or None while any of them cannot be read"""
+        if any(shard.status == LOADING or (shard.status == OFFLINE and shard.count)
+               for shard in self.shards if shard is not self.main):
+            return None
+        shards = [shard for shard in self.shards if shard is self.main or shard.status == ONLINE]
+        futures = [self._pool.submit(shard.storage.load) for shard in shards]
+        games: List[Dict[str, Any]] = []
+        parts = [future.result() for future in futures]
+        if any(part is None for part in parts):
+            return None
+        with self._lock:
+            self._owner.clear()
+            for shard, part in zip(shards, parts):
+                self._tag(shard, part)
+                games.extend(part)
+        return games
+    
+    def load_shard(self, name: str) -> Optional[List[Dict[str, Any]]]:
+        """Read one online shard again, None if it cannot be read"""
+        shard = self._by_name[name]
+        if shard.status != ONLINE:
+            return None
+        games = shard.storage.load()
+        if games is None:
+            return None
+        with self._lock:
+            self._owner = {game_id: owner for game_id, owner in self._owner.items() if owner != name}
+            self._tag(shard, games)
+        return games
+    
+    def _group(self, games: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        groups: Dict[str, List[Dict[str, Any]]] = {shard.name: [] for shard in self.shards}
+        for game in games:
+            groups[self._name_of(game)].append(game)
+        return groups
+    
+    def write(self, games: List[Dict[str, Any]], changes: Optional[List[Change]] = None) -> bool:
+        if changes is not None and any(c[0] == "update" and SHARD_FIELD in c[2] for c in changes):
+            # A game moved between shards, both files are rewritten
+            changes = None
+        
+        groups = None
+        targets: Dict[str, Optional[List[Change]]] = {}
+        with self._lock:
+            if changes is None:
+                groups = self._group(games)
+                self._owner = {str(game.get("id")): name
+                               for name, part in groups.items() for game in part}
+                targets = {shard.name: None for shard in self.shards}
+            else:
+                for change in changes:
+                    if change[0] == "delete":
+                        name = self._owner.pop(str(change[1]), None)
+                        if name is None:
+                            continue
+                    else:
+                        name = self._name_of(change[1])
+                        self._owner[str(change[1].get("id"))] = name
+                    targets.setdefault(name, []).append(change)
+        
+        ok = True
+        for name, shard_changes in targets.items():
+            shard = self._by_name[name]
+            if shard is not self.main and shard.status != ONLINE:
+                if shard.status == LOADING:
+                    shard.dirty = True
+                elif shard_changes or (groups is not None and groups[name]):
+                    print(f"Library {name} is offline, changes to it were not saved")
+                    ok = False
+                continue
+            if groups is None and not isinstance(shard.storage, SqliteStorage):
+                # JSON files are rewritten whole, they need every game they hold
+                groups = self._group(games)
+            part = groups[name] if groups is not None else []
+            if not shard.storage.write(part, shard_changes):
+                ok = False
+        return ok
+    
+    def target_files(self, changes: Optional[List[Change]] = None) -> List[str]:
+        """Files of the online shards write() would send these changes to"""
+        if changes is None or any(c[0] == "update" and SHARD_FIELD in c[2] for c in changes):
+            names = set(self._by_name)
+        else:
+            with self._lock:
+                names = {self._owner.get(str(c[1])) if c[0] == "delete" else self._name_of(c[1])
+                         for c in changes}
+        return [path for shard in self.shards
+                if shard.name in names and (shard is self.main or shard.status == ONLINE)
+                for path in shard.source_files()]
+    
+    def close(self) -> None:
+        with self._lock:
+            self._token += 1
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        for shard in self.shards:
+            if shard.storage is not None:
+                shard.storage.close()
\ No newline at end of file
@@ -3,9 +3,11 @@ Sidebar panel for game details
 """
 
 import os
+from datetime import date
+from typing import Any, Dict, Optional
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
                              QPushButton, QScrollArea, QTextEdit, QFileDialog,
-                             QMessageBox)
+                             QMessageBox, QLineEdit, QCheckBox)
 from PyQt6.QtCore import Qt, pyqtSignal
 from PyQt6.QtGui import QPixmap, QFont
 from core.theme import Theme
@@ -15,13 +17,16 @@ class GameDetailsSidebar(QWidget):
     """Sidebar showing detailed game information"""
     
     closed = pyqtSignal()
-    game_updated = pyqtSignal(dict)
+    # (game id, fields to change), applied by Database.update_game
+    game_updated = pyqtSignal(str, object)
     game_removed = pyqtSignal(str)
-    launch_requested = pyqtSignal(dict)
+    launch_requested = pyqtSignal(object)
     
     def __init__(self, parent=None):
         super().__init__(parent)
         self.current_game = None
+        # Cover picked but not saved yet
+        self._new_cover = None
         self.setFixedWidth(350)
         self._setup_ui()
         self._apply_styles()
@@ -113,6 +118,20 @@ class GameDetailsSidebar(QWidget):
         self.name_edit.setPlaceholderText("Nome do jogo...")
         self.content_layout.addWidget(self.name_edit)
         
+        # Favorite and tags
+        self.favorite_check = QCheckBox("★ Favorito")
+        self.favorite_check.setStyleSheet(f"color: {Theme.FG}; font-size: 13px;")
+        self.content_layout.addWidget(self.favorite_check)
+        
+        tags_label = QLabel("Tags")
+        tags_label.setStyleSheet(f"color: {Theme.FG_DIM}; font-size: 11px; font-weight: 600;")
+        self.content_layout.addWidget(tags_label)
+        
+        self.tags_edit = QLineEdit()
+        self.tags_edit.setPlaceholderText("rpg, coop, indie...")
+        self.tags_edit.setStyleSheet(Theme.get_input_style())
+        self.content_layout.addWidget(self.tags_edit)
+        
         # Statistics
         stats_label = QLabel("Estatísticas")
         stats_label.setStyleSheet(f"color: {Theme.FG_DIM}; font-size: 11px; font-weight: 600;")
@@ -133,6 +152,20 @@ class GameDetailsSidebar(QWidget):
         
         self.content_layout.addWidget(self.stats_widget)
         
+        # Session history
+        history_label = QLabel("Histórico")
+        history_label.setStyleSheet(f"color: {Theme.FG_DIM}; font-size: 11px; font-weight: 600;")
+        self.content_layout.addWidget(history_label)
+        
+        self.sessions_label = QLabel()
+        self.sessions_label.setStyleSheet(f"color: {Theme.FG}; font-size: 13px;")
+        self.content_layout.addWidget(self.sessions_label)
+        
+        self.history_label = QLabel()
+        self.history_label.setStyleSheet(f"color: {Theme.FG_DIM}; font-size: 12px; font-family: Consolas, monospace;")
+        self.history_label.setTextFormat(Qt.TextFormat.PlainText)
+        self.content_layout.addWidget(self.history_label)
+        
         # Notes
         notes_label = QLabel("Notas")
         notes_label.setStyleSheet(f"color: {Theme.FG_DIM}; font-size: 11px; font-weight: 600;")
@@ -207,9 +240,12 @@ class GameDetailsSidebar(QWidget):
             elif btn.text() == "Remover Jogo":
                 btn.setStyleSheet(remove_style)
     
-    def show_game(self, game: dict):
-        """Display game details"""
+    def show_game(self, game: dict, history: Optional[Dict[str, Any]] = None,
+                  details: Optional[Dict[str, Any]] = None):
+        """Display game details, with the session summary from Database.get_play_history
+        and the notes from Database.get_details"""
         self.current_game = game
+        self._new_cover = None
         
         # Load cover
         cover_path = game.get("cover", "")
@@ -226,6 +262,8 @@ class GameDetailsSidebar(QWidget):
         
         # Set name
         self.name_edit.setText(game.get("name", ""))
+        self.favorite_check.setChecked(bool(game.get("favorite", False)))
+        self.tags_edit.setText(", ".join(game.get("tags", [])))
         
         # Set statistics
         playtime = game.get("playtime", 0)
@@ -235,9 +273,44 @@ class GameDetailsSidebar(QWidget):
         self.playtime_label.setText(f"⏱ Tempo jogado: {format_playtime(playtime)}")
         self.last_played_label.setText(f"🕐 Último jogo: {format_date(last_played)}")
         self.added_label.setText(f"📅 Adicionado: {format_date(added)}")
+        self._show_history(history)
         
         # Set notes
-        self.notes_edit.setText(game.get("notes", ""))
+        self.notes_edit.setText((details or {}).get("notes", ""))
+    
+    def _show_history(self, history: Optional[Dict[str, Any]]):
+        """Show session count, weekly totals and the latest sessions"""
+        if not history or not history.get("sessions"):
+            self.sessions_label.setText("🎮 Nenhuma sessão registrada")
+            self.history_label.clear()
+            self.history_label.hide()
+            return
+        
+        count = history["sessions"]
+        self.sessions_label.setText(
+            f"🎮 {count} {'sessão' if count == 1 else 'sessões'}  •  Últimos 30 dias: "
+            f"{format_playtime(history['last_30_days'])}"
+        )
+        
+        lines = []
+        weekly = history.get("weekly", [])
+        longest = max((seconds for _, seconds, _ in weekly), default=0)
+        if longest:
+            lines.append("Por semana")
+            for week, seconds, _ in weekly:
+                bar = "█" * max(1, round(seconds / longest * 12)) if seconds else ""
+                lines.append(f"{date.fromisoformat(week).strftime('%d/%m')}  {bar:<12}  "
+                             f"{format_playtime(seconds)}")
+        recent = history.get("recent", [])
+        if recent:
+            if lines:
+                lines.append("")
+            lines.append("Últimas sessões")
+            for session in recent:
+                lines.append(f"{format_date(session['start'])}  •  "
+                             f"{format_playtime(session['duration'])}")
+        self.history_label.setText("\n".join(lines))
+        self.history_label.setVisible(bool(lines))
     
     def _change_cover(self):
         """Change game cover"""
@@ -250,7 +323,7 @@ class GameDetailsSidebar(QWidget):
         )
         
         if filepath:
-            self.current_game["cover"] = filepath
+            self._new_cover = filepath
             pixmap = QPixmap(filepath).scaled(
                 310, 400,
                 Qt.AspectRatioMode.KeepAspectRatio,
@@ -263,10 +336,22 @@ class GameDetailsSidebar(QWidget):
         if not self.current_game:
             return
         
-        self.current_game["name"] = self.name_edit.toPlainText().strip()
-        self.current_game["notes"] = self.notes_edit.toPlainText()
-        
-        self.game_updated.emit(self.current_game)
+        tags = []
+        for tag in self.tags_edit.text().split(","):
+            tag = tag.strip()
+            if tag and tag.casefold() not in (t.casefold() for t in tags):
+                tags.append(tag)
+        # The record is shared with the library, only update_game may change it
+        updates = {
+            "name": self.name_edit.toPlainText().strip(),
+            "favorite": self.favorite_check.isChecked(),
+            "tags": tags,
+            "notes": self.notes_edit.toPlainText()
+        }
+        if self._new_cover is not None:
+            updates["cover"] = self._new_cover
+            self._new_cover = None
+        self.game_updated.emit(self.current_game.get("id"), updates)
         
         QMessageBox.information(self, "Sucesso", "Alterações salvas!")
     
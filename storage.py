@@ -0,0 +1,687 @@
+"""
+Storage backends for GxLauncher
+Persist the game library as a JSON file or a SQLite database
+"""
+
+import codecs
+import hashlib
+import json
+import os
+import pickle
+import re
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Optional, Any, Tuple, Iterator
+from core.record import GameRecord, SCHEMA_VERSION, to_json, pack_records, unpack_records
+
+# A change is one of:
+#   ("put", game)                  added or fully replaced record
+#   ("update", game, fields)       fields changed on an existing record
+#   ("playtime", game, seconds)    playtime increased by seconds
+#   ("delete", game_id)            removed record
+Change = Tuple[Any, ...]
+
+# A loaded batch and the estimated number of games in the whole library,
+# a None batch means loading failed
+Batch = Tuple[Optional[List[Dict[str, Any]]], int]
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+def atomic_dump(path: str, data: Any) -> None:
+    """Write JSON to a temp file and rename it over path"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=4, ensure_ascii=False, default=to_json)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def library_document(games: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Wrap games in the versioned top-level object written to games.json"""
+    return {"schema": SCHEMA_VERSION, "games": games}
+
+class LibraryReader:
+    """Incremental parser for library and backup files
+    
+    Accepts the versioned {"schema": n, "games": [...]} object and the
+    plain array written before schemas existed (reported as schema 1).
+    Iterating yields (record, bytes read, file size) while holding only
+    one chunk of text and the current record in memory. Raises
+    json.JSONDecodeError on malformed files and IOError when the file
+    cannot be read.
+    """
+    
+    def __init__(self, path: str, chunk_size: int = 1 << 20):
+        self.path = path
+        self.chunk_size = chunk_size
+        # Known once the header has been read, None if the file never says
+        self.schema: Optional[int] = None
+        self._file = None
+        self._text = codecs.getincrementaldecoder("utf-8-sig")()
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._read = 0
+        self._eof = False
+    
+    def _more(self) -> bool:
+        """Append the next chunk to the unparsed text, False at end of file"""
+        if self._eof:
+            return False
+        chunk = self._file.read(self.chunk_size)
+        self._read += len(chunk)
+        self._eof = not chunk
+        self._buffer = self._buffer[self._pos:] + self._text.decode(chunk, final=self._eof)
+        self._pos = 0
+        return True
+    
+    def _peek(self) -> str:
+        """Skip whitespace and return the next character, "" at end of file"""
+        while True:
+            match = _WHITESPACE.match(self._buffer, self._pos)
+            self._pos = match.end()
+            if self._pos < len(self._buffer) or not self._more():
+                return self._buffer[self._pos:self._pos + 1]
+    
+    def _expect(self, chars: str) -> str:
+        char = self._peek()
+        if not char or char not in chars:
+            expected = " or ".join(repr(c) for c in chars)
+            raise json.JSONDecodeError(f"Expecting {expected}", self._buffer, self._pos)
+        self._pos += 1
+        return char
+    
+    def _value(self) -> Any:
+        """Decode the next complete JSON value"""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+                # A value touching the end of the text may continue in the next chunk
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._more()
+    
+    def _array(self) -> Iterator[Tuple[Any, int, int]]:
+        self._expect("[")
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self._value(), self._read, self._size
+            if self._expect(",]") == "]":
+                return
+    
+    def __iter__(self) -> Iterator[Tuple[Any, int, int]]:
+        self._size = os.path.getsize(self.path)
+        with open(self.path, 'rb') as f:
+            self._file = f
+            if self._peek() == "[":
+                self.schema = 1
+                yield from self._array()
+            else:
+                self._expect("{")
+                if self._peek() == "}":
+                    self._pos += 1
+                else:
+                    while True:
+                        key = self._value()
+                        self._expect(":")
+                        if key == "games":
+                            yield from self._array()
+                        else:
+                            value = self._value()
+                            if key == "schema":
+                                self.schema = value
+                        if self._expect(",}") == "}":
+                            break
+            if self._peek():
+                raise json.JSONDecodeError("Extra data", self._buffer, self._pos)
+
+def file_stats(paths: List[str]) -> List[Optional[Tuple[int, int]]]:
+    """(mtime, size) of every file, None for missing ones"""
+    stats = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            stats.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            stats.append(None)
+    return stats
+
+class StorageBackend:
+    """Base class for library storage engines"""
+    
+    # Schema version of the stored records, known after loading; records
+    # from older versions may lack fields
+    schema: Optional[int] = None
+    
+    def exists(self) -> bool:
+        """Check if the storage already holds a library"""
+        raise NotImplementedError
+    
+    def load(self) -> Optional[List[Dict[str, Any]]]:
+        """Load all games, or None on error"""
+        raise NotImplementedError
+    
+    def iter_load(self, batch_size: int = 500) -> Iterator[Batch]:
+        """Load games in batches of batch_size"""
+        games = self.load()
+        if games is None:
+            yield None, 0
+            return
+        for start in range(0, len(games), batch_size):
+            yield games[start:start + batch_size], len(games)
+    
+    def write(self, games: List[Dict[str, Any]], changes: Optional[List[Change]] = None) -> bool:
+        """Persist the library; changes lists the touched records, None rewrites everything"""
+        raise NotImplementedError
+    
+    def stale(self) -> bool:
+        """Check if the storage knows of newer data than it last loaded"""
+        return False
+    
+    def claim(self, game: Dict[str, Any]) -> bool:
+        """Decide where a new game will be stored, False if it cannot be right now"""
+        return True
+    
+    def source_files(self) -> List[str]:
+        """Files holding the library, used to validate a snapshot cache"""
+        return []
+    
+    def target_files(self, changes: Optional[List[Change]] = None) -> List[str]:
+        """Source files a write() of these changes (None for all) goes to"""
+        return self.source_files()
+    
+    def close(self) -> None:
+        """Release any open resources"""
+        pass
+
+
+class JsonStorage(StorageBackend):
+    """Stores the whole library as a single JSON file"""
+    
+    def __init__(self, path: str = "games.json"):
+        self.path = path
+        if not os.path.exists(self.path):
+            self.write([])
+    
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+    
+    def source_files(self) -> List[str]:
+        return [self.path]
+    
+    def load(self) -> Optional[List[Dict[str, Any]]]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"Error loading database: {e}")
+            return None
+        if isinstance(data, dict):
+            self.schema = data.get("schema")
+            return data.get("games", [])
+        self.schema = 1
+        return data
+    
+    def iter_load(self, batch_size: int = 500) -> Iterator[Batch]:
+        """Parse the library one record at a time
+        
+        The total is estimated from how much of the file has been read.
+        """
+        reader = LibraryReader(self.path)
+        batch: List[Dict[str, Any]] = []
+        count = 0
+        try:
+            for game, read, size in reader:
+                self.schema = reader.schema
+                batch.append(game)
+                count += 1
+                if len(batch) >= batch_size:
+                    yield batch, max(count, int(count * size / max(read, 1)))
+                    batch = []
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"Error loading database: {e}")
+            yield None, 0
+            return
+        self.schema = reader.schema
+        if batch:
+            yield batch, count
+    
+    def write(self, games: List[Dict[str, Any]], changes: Optional[List[Change]] = None) -> bool:
+        # JSON has no row-level updates, every change rewrites the file
+        try:
+            atomic_dump(self.path, library_document(games))
+            self.schema = SCHEMA_VERSION
+            return True
+        except IOError as e:
+            print(f"Error saving database: {e}")
+            return False
+
+
+class SqliteStorage(StorageBackend):
+    """Stores one row per game in a SQLite database running in WAL mode"""
+    
+    def __init__(self, path: str = "games.db"):
+        self.path = path
+        self._existed = os.path.exists(path)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS games ("
+            "id TEXT PRIMARY KEY, position INTEGER NOT NULL, data TEXT NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        self.conn.commit()
+        row = self.conn.execute("SELECT MAX(position) FROM games").fetchone()
+        self._next_position = (row[0] or 0) + 1
+        if not self._existed:
+            # Every row written to a new file is in the current schema
+            self.set_meta("schema", str(SCHEMA_VERSION))
+        self.schema = int(self.get_meta("schema", "1"))
+    
+    def exists(self) -> bool:
+        return self._existed
+    
+    def get_meta(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        """Read a value from the meta table"""
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+    
+    def set_meta(self, key: str, value: str) -> None:
+        """Store a value in the meta table"""
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, value)
+            )
+    
+    def load(self) -> Optional[List[Dict[str, Any]]]:
+        try:
+            rows = self.conn.execute("SELECT data FROM games ORDER BY position").fetchall()
+            return [json.loads(row[0]) for row in rows]
+        except (sqlite3.Error, json.JSONDecodeError) as e:
+            print(f"Error loading database: {e}")
+            return None
+    
+    def iter_load(self, batch_size: int = 500) -> Iterator[Batch]:
+        try:
+            total = self.conn.execute("SELECT COUNT(*) FROM games").fetchone()[0]
+            cursor = self.conn.execute("SELECT data FROM games ORDER BY position")
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [json.loads(row[0]) for row in rows], total
+        except (sqlite3.Error, json.JSONDecodeError) as e:
+            print(f"Error loading database: {e}")
+            yield None, 0
+    
+    def write(self, games: List[Dict[str, Any]], changes: Optional[List[Change]] = None) -> bool:
+        try:
+            with self.conn:
+                if changes is None:
+                    self._write_all(games)
+                    self.conn.execute(
+                        "INSERT INTO meta (key, value) VALUES ('schema', ?) "
+                        "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                        (str(SCHEMA_VERSION),)
+                    )
+                    self.schema = SCHEMA_VERSION
+                else:
+                    self._apply(changes)
+            return True
+        except sqlite3.Error as e:
+            print(f"Error saving database: {e}")
+            return False
+    
+    def _write_all(self, games: List[Dict[str, Any]]) -> None:
+        """Replace every row with the given games"""
+        self.conn.execute("DELETE FROM games")
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO games (id, position, data) VALUES (?, ?, ?)",
+            ((str(g.get("id")), i, json.dumps(g, ensure_ascii=False, default=to_json))
+             for i, g in enumerate(games, start=1))
+        )
+        self._next_position = len(games) + 1
+    
+    def _apply(self, changes: List[Change]) -> None:
+        """Upsert or delete only the rows that changed"""
+        for change in changes:
+            op, payload = change[0], change[1]
+            if op == "delete":
+                self.conn.execute("DELETE FROM games WHERE id = ?", (str(payload),))
+            else:
+                self.conn.execute(
+                    "INSERT INTO games (id, position, data) VALUES (?, ?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET data = excluded.data",
+                    (str(payload.get("id")), self._next_position,
+                     json.dumps(payload, ensure_ascii=False, default=to_json))
+                )
+                self._next_position += 1
+    
+    def close(self) -> None:
+        try:
+            self.conn.close()
+        except sqlite3.Error as e:
+            print(f"Error closing database: {e}")
+
+
+class JournalStorage(JsonStorage):
+    """JSON snapshot plus an append-only journal of mutations
+    
+    Every mutation appends one compact line to games.json.journal. Loading
+    replays the journal over the snapshot, and once the journal grows past
+    COMPACT_THRESHOLD a background thread folds it into a new snapshot.
+    Entries store absolute values, so replaying one twice is harmless.
+    """
+    
+    COMPACT_THRESHOLD = 256 * 1024
+    
+    def __init__(self, path: str = "games.json", compact_threshold: Optional[int] = None):
+        self.journal_path = path + ".journal"
+        self.rotated_path = self.journal_path + ".old"
+        self.compact_threshold = compact_threshold or self.COMPACT_THRESHOLD
+        self._lock = threading.Lock()
+        self._journal = None
+        self._compactor: Optional[threading.Thread] = None
+        # May write the initial empty snapshot, so the state above must exist
+        super().__init__(path)
+    
+    def load(self) -> Optional[List[Dict[str, Any]]]:
+        games = super().load()
+        if games is None:
+            return None
+        
+        replayed = False
+        by_id: Dict[Any, Dict[str, Any]] = {}
+        for path in (self.rotated_path, self.journal_path):
+            if not os.path.exists(path):
+                continue
+            if not replayed:
+                by_id = {g.get("id"): g for g in games}
+                replayed = True
+            self._replay(path, by_id)
+        
+        return list(by_id.values()) if replayed else games
+    
+    def source_files(self) -> List[str]:
+        return [self.path, self.rotated_path, self.journal_path]
+    
+    def iter_load(self, batch_size: int = 500) -> Iterator[Batch]:
+        # Journal entries may touch any record, so replay needs the full list
+        if os.path.exists(self.journal_path) or os.path.exists(self.rotated_path):
+            return StorageBackend.iter_load(self, batch_size)
+        return super().iter_load(batch_size)
+    
+    def _replay(self, path: str, by_id: Dict[Any, Dict[str, Any]]) -> None:
+        """Apply journal entries from path onto the games keyed by id"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn write from a crash, everything before it is intact
+                        print(f"Skipping damaged journal entry in {path}")
+                        continue
+                    self._apply_entry(entry, by_id)
+        except IOError as e:
+            print(f"Error reading journal: {e}")
+    
+    @staticmethod
+    def _apply_entry(entry: Dict[str, Any], by_id: Dict[Any, Dict[str, Any]]) -> None:
+        """Apply a single journal entry"""
+        op = entry.get("op")
+        if op == "put":
+            game = entry["game"]
+            by_id[game.get("id")] = game
+        elif op == "set":
+            game = by_id.get(entry["id"])
+            if game is not None:
+                game.update(entry["fields"])
+        elif op == "play":
+            game = by_id.get(entry["id"])
+            if game is not None:
+                game["playtime"] = entry["total"]
+                game["last_played"] = entry["at"]
+        elif op == "del":
+            by_id.pop(entry["id"], None)
+    
+    @staticmethod
+    def _entry(change: Change) -> Dict[str, Any]:
+        """Convert a change into its journal entry"""
+        op = change[0]
+        if op == "put":
+            return {"op": "put", "game": change[1]}
+        if op == "update":
+            return {"op": "set", "id": change[1].get("id"), "fields": change[2]}
+        if op == "playtime":
+            game = change[1]
+            return {"op": "play", "id": game.get("id"), "s": change[2],
+                    "total": game.get("playtime", 0), "at": game.get("last_played", 0)}
+        return {"op": "del", "id": change[1]}
+    
+    def write(self, games: List[Dict[str, Any]], changes: Optional[List[Change]] = None) -> bool:
+        if changes is None:
+            return self._write_snapshot(games)
+        if not changes:
+            return True
+        
+        lines = "".join(
+            json.dumps(self._entry(c), ensure_ascii=False, separators=(',', ':'), default=to_json) + "\n"
+            for c in changes
+        )
+        try:
+            with self._lock:
+                if self._journal is None:
+                    self._journal = self._open_journal()
+                self._journal.write(lines)
+                self._journal.flush()
+                size = self._journal.tell()
+        except IOError as e:
+            print(f"Error writing journal: {e}")
+            return False
+        
+        if size > self.compact_threshold:
+            self.compact(games)
+        return True
+    
+    def _write_snapshot(self, games: List[Dict[str, Any]]) -> bool:
+        """Write a full snapshot and drop the journal it supersedes"""
+        self.wait_for_compaction()
+        try:
+            with self._lock:
+                atomic_dump(self.path, library_document(games))
+                self.schema = SCHEMA_VERSION
+                self._close_journal()
+                for path in (self.journal_path, self.rotated_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+            return True
+        except IOError as e:
+            print(f"Error saving database: {e}")
+            return False
+    
+    def compact(self, games: List[Dict[str, Any]]) -> None:
+        """Fold the journal into a new snapshot on a background thread"""
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        
+        try:
+            with self._lock:
+                self._close_journal()
+                self._rotate_journal()
+                # Copy records now so later edits do not leak into this snapshot
+                snapshot = [dict(g) for g in games]
+        except IOError as e:
+            print(f"Error rotating journal: {e}")
+            return
+        
+        self._compactor = threading.Thread(
+            target=self._compact_worker, args=(snapshot,), name="journal-compactor", daemon=True
+        )
+        self._compactor.start()
+    
+    def _rotate_journal(self) -> None:
+        """Move the live journal aside so new entries start a fresh file"""
+        if not os.path.exists(self.journal_path):
+            return
+        if not os.path.exists(self.rotated_path):
+            os.replace(self.journal_path, self.rotated_path)
+            return
+        # A previous compaction never finished, keep both segments in order
+        with open(self.journal_path, 'r', encoding='utf-8') as src, \
+                open(self.rotated_path, 'a', encoding='utf-8') as dst:
+            dst.write(src.read())
+        os.remove(self.journal_path)
+    
+    def _compact_worker(self, snapshot: List[Dict[str, Any]]) -> None:
+        try:
+            atomic_dump(self.path, library_document(snapshot))
+            with self._lock:
+                if os.path.exists(self.rotated_path):
+                    os.remove(self.rotated_path)
+        except IOError as e:
+            print(f"Error compacting journal: {e}")
+    
+    def wait_for_compaction(self) -> None:
+        """Block until a running compaction finishes"""
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+    
+    def _open_journal(self):
+        """Open the journal for appending, terminating any torn last line"""
+        journal = open(self.journal_path, 'a+b')
+        if journal.tell() > 0:
+            journal.seek(-1, os.SEEK_END)
+            if journal.read(1) != b"\n":
+                journal.write(b"\n")
+        journal.close()
+        return open(self.journal_path, 'a', encoding='utf-8')
+    
+    def _close_journal(self) -> None:
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+    
+    def close(self) -> None:
+        self.wait_for_compaction()
+        with self._lock:
+            self._close_journal()
+
+
+class SnapshotCache:
+    """Binary copy of the loaded library kept next to games.json
+    
+    The snapshot stores records exactly as they are in memory, so loading
+    it skips JSON parsing and field normalization. It is only used while
+    every source file still has the mtime and size recorded when it was
+    written; games.json stays the file of record. A file modified just
+    before the snapshot could be edited again without its mtime moving,
+    so for those the content hash is recorded and checked as well.
+    """
+    
+    VERSION = 3
+    # Timestamps are this coarse on FAT and some network drives
+    RACY_NS = 2_000_000_000
+    
+    def __init__(self, path: str, sources: List[str]):
+        self.path = path
+        self.sources = sources
+        # Source signature the file on disk currently matches
+        self._valid_for = None
+        # Source stats right after our last load or write
+        self._synced = None
+    
+    def mark_synced(self, stats: Optional[List[Optional[Tuple[int, int]]]] = None) -> None:
+        """Note that the source files, with the given stats if known, now hold exactly the library in memory"""
+        self._synced = stats if stats is not None else file_stats(self.sources)
+    
+    @staticmethod
+    def _hash(path: str) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        try:
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+        except OSError:
+            # Matches no recorded hash
+            return ""
+        return digest.hexdigest()
+    
+    def _signature(self) -> List[Optional[Tuple[int, int, Optional[str]]]]:
+        """(mtime, size, hash) of every source file, None for missing ones
+        
+        Only files modified within RACY_NS of now are hashed, the hash of
+        the others is None.
+        """
+        racy = time.time_ns() - self.RACY_NS
+        return [(stat[0], stat[1], self._hash(source) if stat[0] >= racy else None)
+                if stat is not None else None
+                for source, stat in zip(self.sources, file_stats(self.sources))]
+    
+    def _matches(self, signature: List[Optional[Tuple[int, int, Optional[str]]]]) -> bool:
+        """True if the source files are still the ones a signature was taken from"""
+        if len(signature) != len(self.sources):
+            return False
+        for source, stat, recorded in zip(self.sources, file_stats(self.sources), signature):
+            if recorded is None or stat is None:
+                if recorded != stat:
+                    return False
+            elif tuple(recorded[:2]) != stat or (recorded[2] is not None
+                                                  and self._hash(source) != recorded[2]):
+                return False
+        return True
+    
+    def load(self) -> Optional[List[GameRecord]]:
+        """Load the snapshot, or None if it is missing or stale"""
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'rb') as f:
+                data = pickle.load(f)
+            if data.get("version") != self.VERSION:
+                return None
+            signature = data["sources"]
+            if not self._matches(signature):
+                return None
+            records = unpack_records(data["orders"], data["rows"])
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError,
+                ValueError, TypeError, KeyError) as e:
+            print(f"Ignoring damaged library cache: {e}")
+            return None
+        self._valid_for = signature
+        return records
+    
+    def save(self, games: List[GameRecord]) -> bool:
+        """Write the snapshot for the current source files"""
+        if self._synced is None or file_stats(self.sources) != self._synced:
+            # Changed by someone else since we last touched them
+            return False
+        if self._valid_for is not None and self._matches(self._valid_for):
+            return True
+        signature = self._signature()
+        orders, rows = pack_records(games)
+        data = {"version": self.VERSION, "sources": signature, "orders": orders, "rows": rows}
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(data, f, protocol=5)
+            os.replace(tmp_path, self.path)
+        except (OSError, pickle.PicklingError) as e:
+            print(f"Error saving library cache: {e}")
+            return False
+        self._valid_for = signature
+        return True
\ No newline at end of file
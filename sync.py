@@ -0,0 +1,574 @@
+"""
+Library sync for GxLauncher
+Exchanges library edits and playtime between two launchers over a socket
+"""
+
+import hashlib
+import hmac
+import json
+import secrets
+import socket
+import sqlite3
+import threading
+import uuid
+from typing import List, Dict, Optional, Any, Iterable, Tuple
+from core.record import COLD_FIELDS, to_json
+from core.reconcile import LibraryDiff
+from core.shards import SHARD_FIELD
+
+# Merged from per-device counters rather than versioned with the other fields
+PLAYTIME_FIELDS = ("playtime", "last_played")
+# Pseudo-device holding the playtime a record had when sync first saw it
+BASE = ""
+
+class SyncReport:
+    """Outcome of one sync session"""
+    
+    def __init__(self):
+        self.sent = 0
+        self.received = 0
+        self.conflicts = 0
+        # Games from the other launcher whose path is taken by another game here
+        self.skipped = 0
+        self.error = ""
+    
+    @property
+    def ok(self) -> bool:
+        return not self.error
+    
+    def summary(self) -> str:
+        return (f"{self.sent} enviados, {self.received} recebidos, "
+                f"{self.conflicts} conflitos, {self.skipped} ignorados")
+
+
+class SyncError(Exception):
+    """The other launcher refused the session or broke the protocol"""
+
+
+class SyncState:
+    """Sync bookkeeping, one row per game ever seen
+    
+    versions is the version vector of the game's fields ({device: edits})
+    and counters the playtime each device contributed, their sum is the
+    game's playtime. seq is this launcher's change counter when the row
+    last changed; a peer asks for the rows past the seq it last got.
+    digest fingerprints the fields and playtime is the game's playtime as
+    last synced, to spot local edits without reading every row. base
+    holds a digest per field as both sides last agreed on them, the
+    common ancestor concurrent edits are merged against.
+    """
+    
+    COLUMNS = "id, seq, versions, counters, digest, playtime, origin, deleted, base"
+    
+    def __init__(self, path: str = "sync.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS records ("
+                "id TEXT PRIMARY KEY, seq INTEGER NOT NULL, versions TEXT NOT NULL, "
+                "counters TEXT NOT NULL, digest TEXT, playtime INTEGER NOT NULL DEFAULT 0, "
+                "origin TEXT NOT NULL, deleted INTEGER NOT NULL DEFAULT 0, "
+                "base TEXT NOT NULL DEFAULT '{}')"
+            )
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(records)")}
+            if "base" not in columns:
+                # Sync state from before field merging, bases fill in as games sync
+                self.conn.execute("ALTER TABLE records ADD COLUMN base TEXT NOT NULL DEFAULT '{}'")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS records_seq ON records (seq)")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS peers (device TEXT PRIMARY KEY, received INTEGER NOT NULL)"
+            )
+        self.device = self._meta("device") or self._set_meta("device", uuid.uuid4().hex)
+        self.clock = int(self._meta("clock") or 0)
+    
+    def _meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+    
+    def _set_meta(self, key: str, value: str) -> str:
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+        return value
+    
+    def tick(self) -> int:
+        """Next value of the change counter, saved with the rows by save()"""
+        self.clock += 1
+        return self.clock
+    
+    @staticmethod
+    def _row(row: tuple) -> Dict[str, Any]:
+        return {"id": row[0], "seq": row[1], "versions": json.loads(row[2]),
+                "counters": json.loads(row[3]), "digest": row[4], "playtime": row[5],
+                "origin": row[6], "deleted": bool(row[7]), "base": json.loads(row[8])}
+    
+    def fingerprints(self) -> Dict[str, Tuple[Optional[str], int, bool]]:
+        """(digest, playtime, deleted) of every row, enough to tell which games changed"""
+        with self._lock:
+            rows = self.conn.execute("SELECT id, digest, playtime, deleted FROM records").fetchall()
+        return {row[0]: (row[1], row[2], bool(row[3])) for row in rows}
+    
+    def rows(self, ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            found = [self.conn.execute(f"SELECT {self.COLUMNS} FROM records WHERE id = ?",
+                                       (game_id,)).fetchone() for game_id in ids]
+        return {row[0]: self._row(row) for row in found if row is not None}
+    
+    def since(self, seq: int) -> List[Dict[str, Any]]:
+        """Rows changed after seq"""
+        with self._lock:
+            rows = self.conn.execute(f"SELECT {self.COLUMNS} FROM records WHERE seq > ? ORDER BY seq",
+                                     (seq,)).fetchall()
+        return [self._row(row) for row in rows]
+    
+    def save(self, rows: List[Dict[str, Any]]) -> None:
+        with self._lock, self.conn:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO records ({self.COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((r["id"], r["seq"], json.dumps(r["versions"]), json.dumps(r["counters"]),
+                  r["digest"], r["playtime"], r["origin"], int(r["deleted"]),
+                  json.dumps(r.get("base", {}))) for r in rows)
+            )
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('clock', ?)",
+                              (str(self.clock),))
+    
+    def received(self, device: str) -> int:
+        """The peer's change counter as of the last sync with it"""
+        with self._lock:
+            row = self.conn.execute("SELECT received FROM peers WHERE device = ?", (device,)).fetchone()
+        return row[0] if row else 0
+    
+    def set_received(self, device: str, seq: int) -> None:
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO peers (device, received) VALUES (?, ?)",
+                              (device, seq))
+    
+    def close(self) -> None:
+        try:
+            self.conn.close()
+        except sqlite3.Error as e:
+            print(f"Error closing sync state: {e}")
+
+
+class LibrarySync:
+    """Two-way sync of the library with another launcher
+    
+    A session sends only the games changed since the last one with that
+    launcher, as told by SyncState. Field edits are ordered by version
+    vectors: the newer version wins, and concurrent edits are merged by
+    the server field by field (see _merge()) and the result sent back.
+    A game edited on one side wins over its removal on the other.
+    Playtime is never overwritten: each launcher only ever writes its own
+    counter and the playtime shown is the sum, so hours played on both
+    sides between syncs all count.
+    Playtime already in the library when sync is first used goes to a
+    shared base counter merged by maximum, as both sides usually start
+    from a copy of the same games.json.
+    
+    The protocol is one JSON document per line on a plain TCP socket.
+    The hello exchange proves both sides hold the same key without
+    sending it: each sends a random nonce and answers the other's with
+    an HMAC over both nonces and device ids. Then the server tells the
+    change counter it has from the client, the client sends its changes
+    and the server answers with its own once the client's are applied.
+    Nothing is encrypted: the server listens on loopback unless given
+    another address, which should then be on a trusted network.
+    """
+    
+    DEFAULT_PORT = 47624
+    DEFAULT_HOST = "127.0.0.1"
+    TIMEOUT = 30
+    # Longest line read before the peer has proved the key
+    HELLO_LIMIT = 64 * 1024
+    
+    def __init__(self, db, path: str = "sync.db"):
+        self.db = db
+        self.state = SyncState(path)
+        # One session at a time, serving and syncing share the state
+        self._lock = threading.Lock()
+        self._server: Optional[socket.socket] = None
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def device(self) -> str:
+        return self.state.device
+    
+    @staticmethod
+    def _digest(fields: Dict[str, Any]) -> str:
+        text = json.dumps(fields, sort_keys=True, ensure_ascii=False, default=to_json)
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+    
+    @staticmethod
+    def _field_digests(fields: Dict[str, Any]) -> Dict[str, Optional[str]]:
+        return {k: LibrarySync._value_digest(v) for k, v in fields.items()}
+    
+    @staticmethod
+    def _value_digest(value: Any) -> Optional[str]:
+        """Short digest of one field value, None for a missing field"""
+        if value is None:
+            return None
+        text = json.dumps(value, sort_keys=True, ensure_ascii=False, default=to_json)
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+    
+    @staticmethod
+    def _split(game: Dict[str, Any]) -> Dict[str, Any]:
+        """The versioned fields of a game, empty cold fields and the local shard left out"""
+        return {k: v for k, v in game.items()
+                if k not in PLAYTIME_FIELDS and k != SHARD_FIELD and (v or k not in COLD_FIELDS)}
+    
+    def _record(self, game_id: str) -> Optional[Dict[str, Any]]:
+        """A game with its cold fields, as backups hold it"""
+        game = self.db.get_game_by_id(game_id)
+        if game is None:
+            return None
+        return dict(game, **self.db.details.get(game_id))
+    
+    def _scan(self) -> None:
+        """Record the edits made here since the last session"""
+        state = self.state
+        known = state.fingerprints()
+        adopting = not known
+        dirty: Dict[str, Dict[str, Any]] = {}
+        for game in self.db.backup_records():
+            game_id = str(game.get("id"))
+            digest = self._digest(self._split(game))
+            fingerprint = known.pop(game_id, None)
+            if fingerprint != (digest, game.get("playtime", 0), False):
+                dirty[game_id] = (game, digest)
+        # Rows left over are games no longer in the library
+        removed = [game_id for game_id, (_, _, deleted) in known.items() if not deleted]
+        if not dirty and not removed:
+            return
+        
+        rows = state.rows(list(dirty) + removed)
+        changed = []
+        for game_id, (game, digest) in dirty.items():
+            row = rows.get(game_id)
+            playtime = game.get("playtime", 0)
+            if row is None:
+                # Adopted games start from the copy both sides were given
+                row = {"id": game_id, "versions": {}, "digest": None,
+                       "counters": {BASE: playtime} if adopting else {}, "deleted": False,
+                       "base": self._field_digests(self._split(game)) if adopting else {}}
+            if digest != row["digest"] or row["deleted"]:
+                row["versions"][state.device] = row["versions"].get(state.device, 0) + 1
+            counters = row["counters"]
+            own = playtime - sum(v for d, v in counters.items() if d != state.device)
+            if own or state.device in counters:
+                counters[state.device] = own
+            row.update(digest=digest, playtime=playtime, deleted=False,
+                       origin=state.device, seq=state.tick())
+            changed.append(row)
+        for game_id in removed:
+            row = rows[game_id]
+            row["versions"][state.device] = row["versions"].get(state.device, 0) + 1
+            row.update(deleted=True, digest=None, base={}, origin=state.device, seq=state.tick())
+            changed.append(row)
+        state.save(changed)
+    
+    def _changes(self, peer: str, since: int) -> List[Dict[str, Any]]:
+        """The games changed here since the peer's last session, minus what came from it"""
+        changes = []
+        for row in self.state.since(since):
+            if row["origin"] == peer:
+                continue
+            game = None if row["deleted"] else self._record(row["id"])
+            if game is None and not row["deleted"]:
+                continue
+            changes.append({
+                "id": row["id"], "versions": row["versions"], "counters": row["counters"],
+                "origin": row["origin"], "deleted": row["deleted"],
+                "last_played": (game.get("last_played") or 0) if game else 0,
+                "fields": self._split(game) if game else None
+            })
+        return changes
+    
+    def _settle(self, changes: List[Dict[str, Any]]) -> None:
+        """Take the fields just sent as what both sides now agree on"""
+        rows = self.state.rows(str(change["id"]) for change in changes)
+        for change in changes:
+            row = rows.get(str(change["id"]))
+            if row is not None:
+                row["base"] = self._field_digests(change["fields"]) if change["fields"] else {}
+        self.state.save(list(rows.values()))
+    
+    @staticmethod
+    def _merge(base: Dict[str, str], mine: Dict[str, Any], theirs: Dict[str, Any],
+               theirs_win: bool) -> Dict[str, Any]:
+        """Three-way merge of concurrently edited fields
+        
+        A field only one side changed since base keeps that side's value.
+        One changed on both sides is taken from theirs if theirs_win, else
+        kept, except the tags which are combined.
+        """
+        merged = {}
+        for field in dict.fromkeys(list(mine) + list(theirs)):
+            ours, other = mine.get(field), theirs.get(field)
+            if ours == other or LibrarySync._value_digest(other) == base.get(field):
+                value = ours
+            elif LibrarySync._value_digest(ours) == base.get(field):
+                value = other
+            elif field == "tags":
+                value = list(dict.fromkeys(list(ours or []) + list(other or [])))
+            else:
+                value = other if theirs_win else ours
+            if value is not None:
+                merged[field] = value
+        return merged
+    
+    @staticmethod
+    def _compare(local: Dict[str, int], remote: Dict[str, int]) -> str:
+        """How two version vectors relate: equal, older (local < remote), newer or concurrent"""
+        devices = local.keys() | remote.keys()
+        behind = any(local.get(d, 0) < remote.get(d, 0) for d in devices)
+        ahead = any(local.get(d, 0) > remote.get(d, 0) for d in devices)
+        if behind and ahead:
+            return "concurrent"
+        return "older" if behind else "newer" if ahead else "equal"
+    
+    def _apply(self, peer: str, changes: List[Dict[str, Any]], report: SyncReport) -> None:
+        """Merge the peer's changes into the library and the sync state"""
+        state = self.state
+        db = self.db
+        rows = state.rows(str(change["id"]) for change in changes)
+        diff = LibraryDiff()
+        saved = []
+        with db.batch():
+            for change in changes:
+                game_id = str(change["id"])
+                row = rows.get(game_id) or {"id": game_id, "versions": {}, "counters": {},
+                                            "digest": None, "playtime": 0, "deleted": True}
+                local = db.get_game_by_id(game_id)
+                relation = self._compare(row["versions"], change["versions"])
+                fields = change["fields"]
+                if (relation == "concurrent" and local is not None and fields is not None
+                        and row["digest"] == self._digest(self._split(fields))):
+                    # Both sides made the same edit, or started from the same copy
+                    relation = "equal"
+                take = relation == "older"
+                merged = False
+                if relation == "concurrent":
+                    report.conflicts += 1
+                    if change["deleted"] or local is None:
+                        # An edit wins over a removal
+                        take = not change["deleted"]
+                        merged = True
+                    else:
+                        mine = (sum(row["versions"].values()), state.device)
+                        theirs = (sum(change["versions"].values()), change["origin"])
+                        fields = self._merge(row.get("base", {}), self._split(self._record(game_id)),
+                                             self._split(fields), theirs > mine)
+                        take = merged = True
+                
+                counters = dict(row["counters"])
+                for device, value in change["counters"].items():
+                    if device == peer:
+                        counters[device] = value
+                    elif device != state.device:
+                        counters[device] = max(value, counters.get(device, value))
+                playtime = sum(counters.values())
+                
+                if take and change["deleted"]:
+                    if local is not None:
+                        db.remove_game(game_id)
+                        diff.removed.append(game_id)
+                    local = None
+                elif take and local is None:
+                    game = dict(self._split(fields), playtime=playtime,
+                                last_played=change["last_played"])
+                    if not db.add_game(game):
+                        report.skipped += 1
+                        continue
+                    local = db.get_game_by_id(game_id)
+                    diff.added.append(game_id)
+                elif local is not None:
+                    updates = {}
+                    if take:
+                        current = self._split(self._record(game_id))
+                        incoming = self._split(fields)
+                        updates = {k: v for k, v in incoming.items()
+                                   if current.get(k) != v and k != "id"}
+                        # Cold fields are only sent when set, a missing one was cleared
+                        updates.update({k: "" for k in COLD_FIELDS if k in current and k not in incoming})
+                    if local.get("playtime", 0) != playtime:
+                        updates["playtime"] = playtime
+                    if change["last_played"] > (local.get("last_played") or 0):
+                        updates["last_played"] = change["last_played"]
+                    if updates and db.update_game(game_id, updates):
+                        diff.changed[game_id] = set(updates)
+                
+                versions = {d: max(row["versions"].get(d, 0), change["versions"].get(d, 0))
+                            for d in row["versions"].keys() | change["versions"].keys()}
+                if merged:
+                    # The merge is a new version neither side has seen
+                    versions[state.device] = versions.get(state.device, 0) + 1
+                if local is not None:
+                    current = self._split(self._record(game_id))
+                    row["digest"] = self._digest(current)
+                    if relation != "newer":
+                        # Both sides hold these fields now, unless ours was kept
+                        row["base"] = self._field_digests(current)
+                    row["playtime"] = local.get("playtime", 0)
+                    # Whatever the library holds beyond the sum stays this device's own
+                    own = local.get("playtime", 0) - sum(
+                        v for d, v in counters.items() if d != state.device)
+                    if own or state.device in counters:
+                        counters[state.device] = own
+                else:
+                    row.update(digest=None, base={})
+                # Sent back unless it is exactly what the peer has
+                echo = not merged and versions == change["versions"] and counters == change["counters"]
+                row.update(versions=versions, counters=counters, seq=state.tick(),
+                           origin=change["origin"] if echo else state.device,
+                           deleted=local is None)
+                saved.append(row)
+                report.received += 1
+        state.save(saved)
+        if diff and db.on_external_change is not None:
+            db.on_external_change(diff)
+    
+    @staticmethod
+    def _send(stream, message: Dict[str, Any]) -> None:
+        stream.write(json.dumps(message, ensure_ascii=False, default=to_json).encode("utf-8") + b"\n")
+        stream.flush()
+    
+    @staticmethod
+    def _receive(stream, limit: int = -1) -> Dict[str, Any]:
+        line = stream.readline(limit)
+        if not line:
+            raise SyncError("conexão encerrada")
+        if limit > 0 and not line.endswith(b"\n"):
+            raise SyncError("mensagem grande demais")
+        message = json.loads(line)
+        if not isinstance(message, dict):
+            raise SyncError("mensagem inválida")
+        if message.get("error"):
+            raise SyncError(message["error"])
+        return message
+    
+    @staticmethod
+    def _proof(key: str, role: str, client: str, server: str, client_nonce: str,
+               server_nonce: str) -> str:
+        """HMAC one side sends to show it holds the key, bound to this session"""
+        text = "\n".join((role, client, server, client_nonce, server_nonce))
+        return hmac.new(key.encode("utf-8"), text.encode("utf-8"), hashlib.sha256).hexdigest()
+    
+    def sync_with(self, host: str, port: int = DEFAULT_PORT, key: str = "") -> SyncReport:
+        """Run a session with the launcher serving at host:port"""
+        report = SyncReport()
+        if not key:
+            report.error = "defina uma chave de sincronização"
+            return report
+        try:
+            with self._lock, socket.create_connection((host, port), timeout=self.TIMEOUT) as conn:
+                stream = conn.makefile("rwb")
+                nonce = secrets.token_hex(16)
+                self._send(stream, {"hello": self.device, "nonce": nonce})
+                hello = self._receive(stream, self.HELLO_LIMIT)
+                peer, peer_nonce = str(hello["hello"]), str(hello["nonce"])
+                expected = self._proof(key, "server", self.device, peer, nonce, peer_nonce)
+                if not hmac.compare_digest(str(hello.get("proof", "")), expected):
+                    raise SyncError("chave de sincronização incorreta")
+                self._send(stream, {"proof": self._proof(key, "client", self.device, peer,
+                                                         nonce, peer_nonce)})
+                since = self._receive(stream).get("since", 0)
+                self._scan()
+                changes = self._changes(peer, since)
+                self._send(stream, {"changes": changes, "clock": self.state.clock,
+                                    "since": self.state.received(peer)})
+                self._settle(changes)
+                report.sent = len(changes)
+                answer = self._receive(stream)
+                # Resolved on the server, counted here so the user hears of them
+                report.conflicts += answer.get("conflicts", 0)
+                self._apply(peer, answer.get("changes", []), report)
+                self.state.set_received(peer, answer.get("clock", 0))
+        except (SyncError, OSError, sqlite3.Error, ValueError, KeyError, TypeError) as e:
+            print(f"Error syncing library with {host}:{port}: {e}")
+            report.error = str(e)
+        return report
+    
+    def _serve_one(self, conn: socket.socket, key: str) -> None:
+        report = SyncReport()
+        try:
+            with conn, self._lock:
+                conn.settimeout(self.TIMEOUT)
+                stream = conn.makefile("rwb")
+                hello = self._receive(stream, self.HELLO_LIMIT)
+                peer, peer_nonce = str(hello["hello"]), str(hello["nonce"])
+                nonce = secrets.token_hex(16)
+                self._send(stream, {"hello": self.device, "nonce": nonce,
+                                    "proof": self._proof(key, "server", peer, self.device,
+                                                         peer_nonce, nonce)})
+                answer = self._receive(stream, self.HELLO_LIMIT)
+                expected = self._proof(key, "client", peer, self.device, peer_nonce, nonce)
+                if not hmac.compare_digest(str(answer.get("proof", "")), expected):
+                    self._send(stream, {"error": "chave de sincronização incorreta"})
+                    return
+                self._send(stream, {"since": self.state.received(peer)})
+                request = self._receive(stream)
+                self._scan()
+                self._apply(peer, request.get("changes", []), report)
+                self.state.set_received(peer, request.get("clock", 0))
+                changes = self._changes(peer, request.get("since", 0))
+                self._send(stream, {"changes": changes, "clock": self.state.clock,
+                                    "conflicts": report.conflicts})
+                self._settle(changes)
+                report.sent = len(changes)
+        except (SyncError, OSError, sqlite3.Error, ValueError, KeyError, TypeError) as e:
+            print(f"Error serving library sync: {e}")
+            return
+        print(f"Library synced with {peer}: {report.summary()}")
+    
+    def serve(self, port: int = DEFAULT_PORT, host: str = DEFAULT_HOST, key: str = "") -> bool:
+        """Accept sessions from other launchers on a background thread"""
+        if self._server is not None:
+            return True
+        if not key:
+            print("Library sync not served: sync_key is empty")
+            return False
+        try:
+            self._server = socket.create_server((host, port))
+        except OSError as e:
+            print(f"Error listening for library sync on {host}:{port}: {e}")
+            return False
+        
+        def accept_loop(server):
+            while True:
+                try:
+                    conn, _ = server.accept()
+                except OSError:
+                    # Closed by stop()
+                    return
+                self._serve_one(conn, key)
+        
+        self._thread = threading.Thread(target=accept_loop, args=(self._server,),
+                                        name="library-sync", daemon=True)
+        self._thread.start()
+        return True
+    
+    @property
+    def port(self) -> Optional[int]:
+        """Port being served, None when not serving"""
+        return self._server.getsockname()[1] if self._server is not None else None
+    
+    def stop(self) -> None:
+        if self._server is not None:
+            try:
+                # Wakes the accept() blocked on another thread, close() alone does not on Linux
+                self._server.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._server.close()
+            self._server = None
+        if self._thread is not None:
+            self._thread.join(timeout=self.TIMEOUT)
+            self._thread = None
+    
+    def close(self) -> None:
+        self.stop()
+        self.state.close()
\ No newline at end of file
@@ -0,0 +1,149 @@
+"""
+Tag and favorite filter panel for GxLauncher
+"""
+
+from typing import Dict, List, Tuple
+from PyQt6.QtWidgets import (QWidget, QHBoxLayout, QLabel, QPushButton,
+                             QComboBox, QScrollArea)
+from PyQt6.QtCore import Qt, pyqtSignal
+from core.theme import Theme
+from core.utils import format_playtime
+
+class TagFilterBar(QWidget):
+    """Row of toggle chips for favorites and every library tag"""
+    
+    filters_changed = pyqtSignal()
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._chips: Dict[str, QPushButton] = {}
+        self.setFixedHeight(48)
+        self.setStyleSheet(f"background: {Theme.BG_ALT};")
+        self._setup_ui()
+    
+    def _setup_ui(self):
+        """Setup filter panel UI"""
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(32, 0, 32, 8)
+        layout.setSpacing(8)
+        
+        self.favorite_btn = self._make_chip("★ Favoritos")
+        layout.addWidget(self.favorite_btn)
+        
+        # Tag chips scroll sideways when there are many
+        scroll = QScrollArea()
+        scroll.setWidgetResizable(True)
+        scroll.setFixedHeight(40)
+        scroll.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
+        scroll.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        scroll.setStyleSheet(f"""
+            QScrollArea {{
+                background: transparent;
+                border: none;
+            }}
+            {Theme.get_scrollbar_style()}
+        """)
+        
+        chips = QWidget()
+        self.chips_layout = QHBoxLayout(chips)
+        self.chips_layout.setContentsMargins(0, 0, 0, 0)
+        self.chips_layout.setSpacing(8)
+        self.chips_layout.addStretch()
+        scroll.setWidget(chips)
+        layout.addWidget(scroll, 1)
+        
+        self.empty_label = QLabel("Sem tags")
+        self.empty_label.setStyleSheet(f"color: {Theme.FG_DISABLED}; font-size: 11px;")
+        self.chips_layout.insertWidget(0, self.empty_label)
+        
+        self.mode_combo = QComboBox()
+        self.mode_combo.addItem("Qualquer tag", False)
+        self.mode_combo.addItem("Todas as tags", True)
+        self.mode_combo.setFixedHeight(32)
+        self.mode_combo.setStyleSheet(Theme.get_input_style())
+        self.mode_combo.currentIndexChanged.connect(lambda _: self._on_changed())
+        layout.addWidget(self.mode_combo)
+        
+        clear_btn = QPushButton("Limpar")
+        clear_btn.setFixedHeight(32)
+        clear_btn.setCursor(Qt.CursorShape.PointingHandCursor)
+        clear_btn.setStyleSheet(Theme.get_button_style())
+        clear_btn.clicked.connect(self.clear)
+        layout.addWidget(clear_btn)
+    
+    def _make_chip(self, text: str) -> QPushButton:
+        chip = QPushButton(text)
+        chip.setCheckable(True)
+        chip.setFixedHeight(32)
+        chip.setCursor(Qt.CursorShape.PointingHandCursor)
+        chip.setStyleSheet(f"""
+            QPushButton {{
+                background: {Theme.CARD_BG};
+                color: {Theme.FG_DIM};
+                border: 1px solid {Theme.BORDER};
+                border-radius: 16px;
+                padding: 0 12px;
+                font-size: 12px;
+            }}
+            QPushButton:hover {{
+                color: {Theme.FG};
+                border-color: {Theme.ACCENT};
+            }}
+            QPushButton:checked {{
+                background: {Theme.ACCENT};
+                color: {Theme.FG};
+                border-color: {Theme.ACCENT};
+            }}
+        """)
+        chip.toggled.connect(lambda _: self._on_changed())
+        return chip
+    
+    def set_tags(self, stats: Dict[str, Tuple[int, int]]):
+        """Show one chip per tag, keeping the current selection
+        
+        stats maps each tag to its (game count, total playtime).
+        """
+        if set(stats) != set(self._chips):
+            selected = set(self.selected_tags())
+            for chip in self._chips.values():
+                self.chips_layout.removeWidget(chip)
+                chip.deleteLater()
+            self._chips.clear()
+            
+            for i, tag in enumerate(stats):
+                chip = self._make_chip(tag)
+                chip.blockSignals(True)
+                chip.setChecked(tag in selected)
+                chip.blockSignals(False)
+                self.chips_layout.insertWidget(i, chip)
+                self._chips[tag] = chip
+            self.empty_label.setVisible(not stats)
+        
+        for tag, (count, playtime) in stats.items():
+            chip = self._chips[tag]
+            chip.setText(f"{tag} ({count})")
+            chip.setToolTip(f"Tempo jogado: {format_playtime(playtime)}")
+    
+    def selected_tags(self) -> List[str]:
+        """Get the checked tags"""
+        return [tag for tag, chip in self._chips.items() if chip.isChecked()]
+    
+    def selection(self) -> Tuple[List[str], bool, bool]:
+        """Get (tags, favorites_only, match_all)"""
+        return (self.selected_tags(), self.favorite_btn.isChecked(),
+                bool(self.mode_combo.currentData()))
+    
+    def is_active(self) -> bool:
+        """Check if any filter is selected"""
+        return self.favorite_btn.isChecked() or bool(self.selected_tags())
+    
+    def clear(self):
+        """Uncheck every chip"""
+        for chip in [self.favorite_btn, *self._chips.values()]:
+            chip.blockSignals(True)
+            chip.setChecked(False)
+            chip.blockSignals(False)
+        self.filters_changed.emit()
+    
+    def _on_changed(self):
+        self.filters_changed.emit()
\ No newline at end of file
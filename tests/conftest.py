@@ -0,0 +1,27 @@
+"""
+Test setup for GxLauncher
+The repository root is the core package, imported as core.X like the app does
+"""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+if "core" not in sys.modules:
+    spec = importlib.util.spec_from_file_location(
+        "core", ROOT / "__init__.py", submodule_search_locations=[str(ROOT)]
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["core"] = module
+    spec.loader.exec_module(module)
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """Run every test in its own directory, the library files are relative to it"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
\ No newline at end of file
@@ -0,0 +1,248 @@
+"""
+Shared catalogs read from a share through a local copy and overlay
+"""
+
+import json
+import os
+import shutil
+
+import pytest
+
+from core.catalog import CatalogStorage
+from core.database import Database
+from core.shards import ONLINE, SHARD_FIELD
+from core.storage import JsonStorage
+
+SHARE_GAMES = [
+    {"name": "Cat A", "path": "Z:/a/a.exe", "cover": "covers/a.jpg", "notes": "from the share"},
+    {"id": "c2", "name": "Cat B", "path": "Z:/b/b.exe", "tags": ["rpg"]},
+]
+
+
+@pytest.fixture(autouse=True)
+def no_refresh_loop(monkeypatch):
+    # Refreshes run when the tests call them, the loop only does its first pass
+    monkeypatch.setattr(CatalogStorage, "REFRESH_SECONDS", 3600)
+
+
+def publish(games=SHARE_GAMES, version="1", share="share"):
+    """Write a catalog to the share, stamped with version unless it is None"""
+    os.makedirs(os.path.join(share, "covers"), exist_ok=True)
+    with open(os.path.join(share, "covers", "a.jpg"), "wb") as f:
+        f.write(b"cover")
+    with open(os.path.join(share, CatalogStorage.CATALOG_FILE), "w", encoding="utf-8") as f:
+        json.dump(games, f)
+    version_path = os.path.join(share, CatalogStorage.VERSION_FILE)
+    if version is not None:
+        with open(version_path, "w", encoding="utf-8") as f:
+            f.write(version)
+    elif os.path.exists(version_path):
+        os.remove(version_path)
+
+
+def open_catalog(cache="cache"):
+    return CatalogStorage("share", cache)
+
+
+def by_name(games):
+    return {g["name"]: g for g in games}
+
+
+def test_refresh_follows_the_version_stamp():
+    publish()
+    catalog = open_catalog()
+    try:
+        assert catalog.refresh()
+        assert not catalog.refresh()
+        # Same stamp, the share is not read again
+        publish([dict(SHARE_GAMES[1], name="Cat B2")], version="1")
+        assert not catalog.refresh()
+        assert set(by_name(catalog.load())) == {"Cat A", "Cat B"}
+        
+        publish([dict(SHARE_GAMES[1], name="Cat B2")], version="2")
+        assert catalog.refresh()
+        assert catalog.stale()
+        assert set(by_name(catalog.load())) == {"Cat B2"}
+        assert not catalog.stale()
+    finally:
+        catalog.close()
+
+
+def test_refresh_without_version_uses_size_and_mtime():
+    publish(version=None)
+    catalog = open_catalog()
+    try:
+        assert catalog.refresh()
+        assert not catalog.refresh()
+        publish(SHARE_GAMES + [{"name": "Cat C", "path": "Z:/c/c.exe"}], version=None)
+        assert catalog.refresh()
+        assert "Cat C" in by_name(catalog.load())
+    finally:
+        catalog.close()
+
+
+def test_cached_copy_is_namespaced_and_local():
+    publish()
+    first, second = open_catalog("machine1"), open_catalog("machine2")
+    try:
+        first.refresh()
+        second.refresh()
+        games = by_name(first.load())
+        assert games["Cat B"]["id"] == "cat-c2"
+        # Derived from the path, the same on every machine
+        assert games["Cat A"]["id"].startswith("cat-")
+        assert games["Cat A"]["id"] == by_name(second.load())["Cat A"]["id"]
+        # Notes are per machine, the cover is read from the local copy
+        assert "notes" not in games["Cat A"]
+        cover = games["Cat A"]["cover"]
+        assert os.path.exists(cover) and os.path.abspath("machine1") in cover
+    finally:
+        first.close()
+        second.close()
+
+
+def test_overlay_keeps_local_changes_across_updates():
+    publish()
+    catalog = open_catalog()
+    catalog.refresh()
+    games = by_name(catalog.load())
+    games["Cat B"].update(playtime=300, favorite=True)
+    local = {"id": "local", "name": "Mine", "path": "C:/mine.exe"}
+    assert catalog.write([games["Cat B"], local])
+    catalog.close()
+    
+    with open(os.path.join("cache", "overlay.json"), encoding="utf-8") as f:
+        overlay = json.load(f)
+    assert overlay["changed"] == {"cat-c2": {"playtime": 300, "favorite": True}}
+    assert overlay["removed"] == [games["Cat A"]["id"]]
+    assert [g["id"] for g in overlay["added"]] == ["local"]
+    # The share is never written
+    with open(os.path.join("share", CatalogStorage.CATALOG_FILE), encoding="utf-8") as f:
+        assert json.load(f) == SHARE_GAMES
+    
+    publish([dict(SHARE_GAMES[0]), dict(SHARE_GAMES[1], name="Cat B2")], version="2")
+    catalog = open_catalog()
+    try:
+        assert catalog.refresh()
+        games = by_name(catalog.load())
+        assert set(games) == {"Cat B2", "Mine"}
+        assert games["Cat B2"]["playtime"] == 300 and games["Cat B2"]["favorite"]
+    finally:
+        catalog.close()
+
+
+def test_offline_share_falls_back_to_the_cached_copy():
+    publish()
+    catalog = open_catalog()
+    catalog.refresh()
+    catalog.close()
+    shutil.rmtree("share")
+    
+    catalog = open_catalog()
+    try:
+        assert not catalog.refresh()
+        assert catalog.error
+        assert set(by_name(catalog.load())) == {"Cat A", "Cat B"}
+    finally:
+        catalog.close()
+
+
+def open_library(**kwargs):
+    return Database(libraries=[{"name": "Rede", "catalog": "share"}], **kwargs)
+
+
+def prepare_library(main_games):
+    """Main library file plus a catalog already copied to the cache the library uses"""
+    with open(Database.DB_FILE, "w", encoding="utf-8") as f:
+        json.dump(main_games, f)
+    publish()
+    catalog = CatalogStorage("share", os.path.join(Database.CATALOG_DIR, "Rede"))
+    catalog.refresh()
+    catalog.close()
+
+
+def test_library_mounts_the_catalog_and_works_offline():
+    prepare_library([{"id": "1", "name": "Local", "path": "C:/local.exe"}])
+    db = open_library()
+    try:
+        game = by_name(db.get_all_games())["Cat B"]
+        assert game[SHARD_FIELD] == "Rede"
+        assert db.update_playtime(game["id"], 60)
+        assert db.flush()
+    finally:
+        db.close()
+    
+    shutil.rmtree("share")
+    os.remove(Database.DB_FILE + ".cache")
+    db = open_library()
+    try:
+        games = by_name(db.get_all_games())
+        assert set(games) == {"Local", "Cat A", "Cat B"}
+        assert games["Cat B"]["playtime"] == 60
+        status = {lib["name"]: lib for lib in db.library_status()}
+        assert status["Rede"]["status"] == ONLINE
+    finally:
+        db.close()
+
+
+def test_catalog_id_taken_by_the_main_library():
+    # The main library already holds a game under the catalog game's id
+    prepare_library([{"id": "cat-c2", "name": "Local", "path": "C:/local.exe"}])
+    db = open_library()
+    try:
+        games = by_name(db.get_all_games())
+        assert games["Local"]["id"] == "cat-c2"
+        renamed = games["Cat B"]["id"]
+        assert renamed != "cat-c2"
+        assert db.update_playtime(renamed, 60)
+        assert db.flush()
+    finally:
+        db.close()
+    
+    with open(os.path.join(Database.CATALOG_DIR, "Rede", "overlay.json"), encoding="utf-8") as f:
+        overlay = json.load(f)
+    # Still the catalog game, not a removed one plus a local copy
+    assert overlay["removed"] == [] and overlay["added"] == []
+    assert overlay["changed"]["cat-c2"]["id"] == renamed
+    with open(Database.DB_FILE, encoding="utf-8") as f:
+        assert [g["id"] for g in json.load(f)["games"]] == ["cat-c2"]
+    
+    os.remove(Database.DB_FILE + ".cache")
+    db = open_library()
+    try:
+        games = by_name(db.get_all_games())
+        assert games["Local"]["id"] == "cat-c2"
+        assert games["Cat B"]["id"] == renamed
+        assert games["Cat B"]["playtime"] == 60
+    finally:
+        db.close()
+
+
+def test_new_catalog_copy_only_reconciles_the_catalog(monkeypatch):
+    prepare_library([{"id": "1", "name": "Local", "path": "C:/local.exe"},
+                     {"id": "cat-3", "name": "Local 3", "path": "C:/local3.exe"}])
+    db = open_library()
+    try:
+        catalog = next(shard.storage for shard in db.shards.shards if shard.name == "Rede")
+        changed = []
+        db.on_external_change = changed.append
+        
+        read = []
+        original = JsonStorage.load
+        monkeypatch.setattr(JsonStorage, "load", lambda self: read.append(self.path) or original(self))
+        publish([SHARE_GAMES[0], dict(SHARE_GAMES[1], name="Cat B2"),
+                 {"id": "3", "name": "Cat C", "path": "Z:/c/c.exe"}], version="2")
+        assert catalog.refresh() and catalog.stale()
+        catalog.on_refresh()
+        
+        assert read == []
+        assert not catalog.stale()
+        games = by_name(db.get_all_games())
+        assert set(games) == {"Local", "Local 3", "Cat A", "Cat B2", "Cat C"}
+        # A new catalog id taken by the main library is renamed as on a full load
+        assert games["Local 3"]["id"] == "cat-3" and games["Cat C"]["id"] != "cat-3"
+        assert len(changed) == 1 and changed[0].added == [games["Cat C"]["id"]]
+        assert db.flush()
+        assert db.check_external() is None
+    finally:
+        db.close()
\ No newline at end of file
@@ -0,0 +1,131 @@
+"""
+Concurrent readers and writers against one GxLauncher library
+"""
+
+import random
+import threading
+import time
+
+import pytest
+
+from core.database import Database
+
+SEEDS = 1000
+WRITERS = 4
+READERS = 6
+DURATION = 1.5
+
+
+def writer(db, number, stop, errors):
+    rnd = random.Random(number)
+    while not stop.is_set():
+        game_id = f"w{number}_{rnd.randrange(200)}"
+        op = rnd.random()
+        try:
+            if op < 0.3:
+                db.add_game({"id": game_id, "name": f"Game {game_id}", "path": f"C:/w/{game_id}.exe",
+                             "tags": ["action"] if rnd.random() < 0.5 else [],
+                             "notes": "dragon" if rnd.random() < 0.2 else ""})
+            elif op < 0.5:
+                db.update_game(game_id, {"name": f"Renamed {rnd.random()}", "notes": "dragon lair"})
+            elif op < 0.7:
+                db.update_playtime(f"s{rnd.randrange(SEEDS)}", rnd.randrange(1, 100))
+            elif op < 0.8:
+                with db.batch():
+                    db.add_tags([game_id, f"s{rnd.randrange(SEEDS)}"], ["coop"])
+                    db.set_favorite([game_id])
+            elif op < 0.9:
+                db.remove_game(game_id)
+            else:
+                db.remove_many([f"w{number}_{rnd.randrange(200)}" for _ in range(5)])
+        except Exception as e:
+            errors.append(("writer", repr(e)))
+            raise
+
+
+def reader(db, number, stop, errors):
+    rnd = random.Random(100 + number)
+    while not stop.is_set():
+        try:
+            ids = [g["id"] for g in db.snapshot().games]
+            assert len(ids) == len(set(ids))
+            games = db.sort_games(rnd.choice(["name", "playtime", "added", "last_played"]), rnd.random() < 0.5)
+            assert len(games) == len({id(g) for g in games})
+            db.query(rnd.choice(["tag:rpg", "dragon", "fav:yes playtime>10", "game w1"]))
+            db.search_games("dragon")
+            db.filter_games(True, ["action"])
+            db.get_stats()
+            db.get_tag_stats()
+            db.columns()
+            game = db.get_game_by_id(f"s{rnd.randrange(SEEDS)}")
+            assert game is not None
+            db.get_details(game["id"])
+        except Exception as e:
+            errors.append(("reader", repr(e)))
+            raise
+
+
+def library(db):
+    """Every record with its cold fields, as a reload would see it"""
+    return {g["id"]: dict(g, **db.get_details(g["id"])) for g in db.get_all_games()}
+
+
+@pytest.mark.parametrize("write_behind", [False, True], ids=["sync", "write_behind"])
+@pytest.mark.parametrize("backend", ["json", "journal", "sqlite"])
+def test_concurrent_readers_and_writers(backend, write_behind):
+    db = Database(backend, write_behind=write_behind)
+    db.add_games([{"id": f"s{i}", "name": f"Seed {i}", "path": f"C:/s/{i}.exe", "tags": ["rpg"]}
+                  for i in range(SEEDS)])
+    stop = threading.Event()
+    errors = []
+    threads = [threading.Thread(target=writer, args=(db, i, stop, errors)) for i in range(WRITERS)]
+    threads += [threading.Thread(target=reader, args=(db, i, stop, errors)) for i in range(READERS)]
+    for thread in threads:
+        thread.start()
+    time.sleep(DURATION)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    assert not errors, errors[:3]
+    
+    assert db.flush()
+    expected = library(db)
+    # The indexes agree with the records after the run
+    assert len(db.sort_games("name")) == len(expected)
+    assert set(db.filter_ids(False, ["coop"])) == {i for i, g in expected.items() if "coop" in g["tags"]}
+    db.close()
+    
+    reloaded = Database(backend)
+    try:
+        assert library(reloaded) == expected
+    finally:
+        reloaded.close()
+
+
+def test_background_write_publishes_under_the_lock():
+    db = Database(write_behind=True)
+    try:
+        db.add_game({"id": "1", "name": "Game", "path": "C:/game.exe"})
+        assert db.flush()
+        written, go = threading.Event(), threading.Event()
+        original = db.storage.write
+        
+        def write(games, changes):
+            ok = original(games, changes)
+            written.set()
+            go.wait(5)
+            return ok
+        
+        db.storage.write = write
+        before = db._disk_stats
+        db.update_game("1", {"name": "Renamed"})
+        assert written.wait(5)
+        with db._lock:
+            go.set()
+            time.sleep(0.2)
+            # check_external() under the lock never sees half published stats
+            assert db._disk_stats is before
+        assert db.flush()
+        assert db._disk_stats != before
+    finally:
+        db.close()
\ No newline at end of file
@@ -0,0 +1,148 @@
+"""
+Library history snapshots, retention and delta composition
+"""
+
+import random
+
+from core.database import Database
+from core.history import LibraryHistory, _apply, _compose
+
+DAY = LibraryHistory.DAY_SECONDS
+START = 1_700_000_000
+
+
+def game(game_id, **fields):
+    return dict({"id": game_id, "name": f"Game {game_id}", "path": f"C:/{game_id}.exe",
+                 "playtime": 0, "tags": []}, **fields)
+
+
+def replay(*deltas):
+    state = {}
+    for delta in deltas:
+        _apply(state, delta)
+    return state
+
+
+def test_compose_matches_applying_in_order():
+    first = {"put": [game("a"), game("b", playtime=1)], "delete": ["c", "d"]}
+    second = {"put": [game("b", playtime=2), game("c")], "delete": ["a", "e"]}
+    composed = _compose(first, second)
+    assert replay(composed) == replay(first, second)
+    # Deleted then put back is a put, put then deleted a delete
+    assert sorted(composed["delete"]) == ["a", "d", "e"]
+    assert sorted(r["id"] for r in composed["put"]) == ["b", "c"]
+    
+    rnd = random.Random(1)
+    base = {str(i): game(str(i)) for i in range(20)}
+    for _ in range(200):
+        deltas = [{"put": [game(str(rnd.randrange(30)), playtime=rnd.randrange(5)) for _ in range(4)],
+                   "delete": [str(rnd.randrange(30)) for _ in range(3)]} for _ in range(3)]
+        composed = _compose(_compose(deltas[0], deltas[1]), deltas[2])
+        start = dict(base)
+        _apply(start, composed)
+        expected = dict(base)
+        for delta in deltas:
+            _apply(expected, delta)
+        assert start == expected
+
+
+def test_take_stores_only_what_changed():
+    history = LibraryHistory()
+    games = [game(str(i)) for i in range(10)]
+    assert history.take(games, "manual", now=START)
+    games[3]["playtime"] = 60
+    games[5]["tags"].append("rpg")
+    del games[7]
+    assert history.take(games, "manual", now=START + 10)
+    # Nothing changed, nothing written
+    assert history.take(games, "manual", now=START + 20)
+    
+    snapshots = history.snapshots()
+    assert [s["full"] for s in snapshots] == [False, True]
+    delta = history._read(history._entries[-1])
+    assert sorted(r["id"] for r in delta["put"]) == ["3", "5"]
+    assert delta["delete"] == ["7"]
+    assert history.restore(START) == [game(str(i)) for i in range(10)]
+    assert sorted(history.restore(START + 10), key=lambda r: int(r["id"])) == games
+
+
+def test_digests_are_read_back_after_restart():
+    games = [game(str(i)) for i in range(10)]
+    LibraryHistory().take(games, "manual", now=START)
+    
+    history = LibraryHistory()
+    history.prime()
+    assert history.take(games, "manual", now=START + 10)
+    assert len(history.snapshots()) == 1
+    games[0]["name"] = "Renamed"
+    assert history.take(games, "manual", now=START + 20)
+    assert [r["id"] for r in history._read(history._entries[-1])["put"]] == ["0"]
+
+
+def test_prune_keeps_days_then_weeks_and_every_kept_snapshot_restores():
+    history = LibraryHistory()
+    games = [game(str(i)) for i in range(5)]
+    expected = {}
+    times = range(START, START + 200 * DAY, DAY // 2)
+    for step, now in enumerate(times):
+        games[step % 5]["playtime"] += 1
+        if step % 50 == 0:
+            games.append(game(f"n{step}"))
+        assert history.take(games, "auto", now=now)
+        expected[now] = {g["id"]: dict(g, tags=list(g["tags"])) for g in games}
+    
+    now = times[-1]
+    kept = [s["time"] for s in history.snapshots()]
+    days = [t for t in kept if now - t >= LibraryHistory.KEEP_ALL_DAYS * DAY]
+    assert all(now - t < LibraryHistory.KEEP_WEEKLY_DAYS * DAY for t in kept)
+    assert {t for t in kept if now - t < LibraryHistory.KEEP_ALL_DAYS * DAY} == \
+        {t for t in times if now - t < LibraryHistory.KEEP_ALL_DAYS * DAY}
+    daily = [t // DAY for t in days if now - t < LibraryHistory.KEEP_DAILY_DAYS * DAY]
+    weekly = [t // (7 * DAY) for t in days if now - t >= LibraryHistory.KEEP_DAILY_DAYS * DAY]
+    assert len(daily) == len(set(daily)) and len(weekly) == len(set(weekly))
+    assert len(kept) < len(times) / 3
+    # The oldest kept snapshot starts a chain of its own
+    assert history._entries[0]["full"]
+    for snapshot_time in kept:
+        restored = {r["id"]: r for r in history.restore(snapshot_time)}
+        assert restored == expected[snapshot_time]
+
+
+def test_dropped_full_snapshot_is_folded_into_the_next():
+    history = LibraryHistory()
+    games = [game("a"), game("b")]
+    history.take(games, "auto", now=START)
+    games[0]["playtime"] = 5
+    history.take(games, "auto", now=START + 1)
+    games.append(game("c"))
+    history.take(games, "auto", now=START + 2)
+    expected = history.restore(START + 1)
+    
+    history._entries[0]["time"] -= 300 * DAY
+    history._entries[1]["time"] -= 20 * DAY
+    dropped = history._prune(START + 2)
+    assert [e["file"] for e in dropped] == [f"{START}.snap"]
+    assert history._entries[0]["full"]
+    assert history._read(history._entries[0])["delete"] == []
+    assert sorted(history.restore(START + 1 - 20 * DAY), key=lambda r: r["id"]) == \
+        sorted(expected, key=lambda r: r["id"])
+
+
+def test_auto_snapshot_runs_in_the_background():
+    db = Database(history=True)
+    db.add_games([game(str(i)) for i in range(3)])
+    assert db.auto_snapshot()
+    db._history_thread.join()
+    assert [s["reason"] for s in db.history.snapshots()] == ["daily"]
+    # Not due again today, only the newest snapshot is read
+    assert not db.auto_snapshot()
+    db.update_playtime("1", 60)
+    db.close()
+    
+    db = Database(history=True)
+    try:
+        assert [s["reason"] for s in db.history.snapshots()] == ["shutdown", "daily"]
+        assert next(g for g in db.history.restore(db.history.snapshots()[0]["time"])
+                    if g["id"] == "1")["playtime"] == 60
+    finally:
+        db.close()
\ No newline at end of file
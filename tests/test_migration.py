@@ -0,0 +1,115 @@
+"""
+Loading GxLauncher 1.0 library files into the current schema
+"""
+
+import json
+import os
+import sqlite3
+
+import pytest
+
+from core.database import Database
+from core.record import GAME_FIELDS, SCHEMA_VERSION
+from core.storage import SqliteStorage
+
+BACKENDS = ["json", "journal", "sqlite"]
+
+# A library as GxLauncher 1.0 wrote it: a bare array, ids optional
+V1_GAMES = [
+    {"id": "1700000000000", "name": "Hollow Knight", "path": "C:/Games/HK/hollow_knight.exe",
+     "cover": "", "playtime": 3600, "last_played": 1700000500},
+    {"name": "Celeste", "path": "C:/Games/Celeste/Celeste.exe", "playtime": 120},
+    {"name": "Hades", "path": "C:/Games/Hades/Hades.exe"},
+    {"id": "1700000000001", "name": "Portal", "path": "C:/Games/Portal/portal.exe"},
+    {"id": "1700000000001", "name": "Portal 2", "path": "C:/Games/Portal 2/portal2.exe"},
+]
+
+
+def write_v1(games=V1_GAMES):
+    with open(Database.DB_FILE, "w", encoding="utf-8") as f:
+        json.dump(games, f, indent=4)
+
+
+def reopen(backend):
+    """Open the library again, skipping the binary snapshot cache"""
+    if os.path.exists(Database.DB_FILE + ".cache"):
+        os.remove(Database.DB_FILE + ".cache")
+    return Database(backend, write_behind=False)
+
+
+def stored_schema(backend):
+    if backend == "sqlite":
+        conn = sqlite3.connect(Database.SQLITE_FILE)
+        try:
+            return int(conn.execute("SELECT value FROM meta WHERE key = 'schema'").fetchone()[0])
+        finally:
+            conn.close()
+    with open(Database.DB_FILE, encoding="utf-8") as f:
+        data = json.load(f)
+    return data["schema"] if isinstance(data, dict) else 1
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_v1_games_get_ids_and_defaults(backend):
+    write_v1()
+    db = Database(backend, write_behind=False)
+    try:
+        ids = [g["id"] for g in db.games]
+        assert len(ids) == len(V1_GAMES)
+        assert all(ids) and len(set(ids)) == len(ids)
+        # Existing ids are kept, the second holder of a duplicate is renamed
+        assert ids[0] == "1700000000000"
+        assert ids[3] == "1700000000001"
+        assert ids[4] == "1700000000001_1"
+        for game in db.games:
+            assert set(GAME_FIELDS) <= set(game)
+        assert db.get_game_by_id(ids[0])["playtime"] == 3600
+        assert db.get_game_by_id(ids[4])["name"] == "Portal 2"
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_v1_library_is_rewritten_once(backend):
+    write_v1()
+    db = Database(backend, write_behind=False)
+    ids = [g["id"] for g in db.games]
+    db.close()
+    assert stored_schema(backend) == SCHEMA_VERSION
+    if backend != "sqlite":
+        with open(Database.DB_FILE, encoding="utf-8") as f:
+            data = json.load(f)
+        assert [g["id"] for g in data["games"]] == ids
+    
+    path = Database.SQLITE_FILE if backend == "sqlite" else Database.DB_FILE
+    written = os.stat(path).st_mtime_ns
+    db = reopen(backend)
+    try:
+        assert db.storage.schema == SCHEMA_VERSION
+        # Ids generated during the migration are the stored ones now
+        assert [g["id"] for g in db.games] == ids
+    finally:
+        db.close()
+    assert os.stat(path).st_mtime_ns == written
+
+
+def test_old_sqlite_library_is_rewritten():
+    # A SQLite library from before schemas were stamped holds raw 1.0 records
+    storage = SqliteStorage(Database.SQLITE_FILE)
+    storage.conn.executemany(
+        "INSERT INTO games (id, position, data) VALUES (?, ?, ?)",
+        [(str(i), i, json.dumps(dict(game, id=str(i)))) for i, game in enumerate(V1_GAMES)]
+    )
+    storage.conn.commit()
+    storage.set_meta("schema", "1")
+    storage.set_meta("migrated_from_json", "1")
+    storage.close()
+    
+    db = Database("sqlite", write_behind=False)
+    try:
+        assert len(db.games) == len(V1_GAMES)
+        for game in db.games:
+            assert set(GAME_FIELDS) <= set(game)
+    finally:
+        db.close()
+    assert stored_schema("sqlite") == SCHEMA_VERSION
\ No newline at end of file
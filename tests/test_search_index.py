@@ -0,0 +1,36 @@
+"""
+Trigram search index
+"""
+
+from core.search_index import TrigramIndex
+
+
+def index(*names):
+    idx = TrigramIndex()
+    for i, name in enumerate(names):
+        idx.add({"id": str(i), "name": name, "tags": []})
+    return idx
+
+
+def ids(results):
+    return [game_id for game_id, _ in results]
+
+
+def test_short_queries_use_the_index():
+    idx = index("Xenoblade", "Halo", "Max Payne", "Axiom Verge")
+    assert sorted(ids(idx.search("x"))) == ["0", "2", "3"]
+    assert sorted(ids(idx.search("XE"))) == ["0"]
+    assert ids(idx.search("q")) == []
+    
+    # Renamed and removed games leave the short postings too
+    idx.add({"id": "0", "name": "Halo 2", "tags": []})
+    idx.discard("3")
+    assert sorted(ids(idx.search("x"))) == ["2"]
+    assert sorted(ids(idx.search("lo"))) == ["0", "1"]
+
+
+def test_limit_keeps_the_best_matches():
+    idx = index(*[f"Game {'x' * (i % 7)} {i}" for i in range(200)])
+    full = idx.search("x")
+    assert idx.search("x", limit=10) == full[:10]
+    assert len(full) > 10
\ No newline at end of file
@@ -0,0 +1,86 @@
+"""
+Library shards: opening from the snapshot cache and per-shard file checks
+"""
+
+import json
+import os
+import threading
+import time
+
+import core.database
+from core.database import Database
+from core.shards import LibraryShard, ONLINE
+
+LIBRARIES = [{"name": "Extra", "path": "extra/lib.json", "root": "E:/"}]
+
+
+def write_libraries():
+    os.makedirs("extra", exist_ok=True)
+    with open("games.json", "w", encoding="utf-8") as f:
+        json.dump([{"id": "1", "name": "Main", "path": "C:/main.exe"}], f)
+    with open("extra/lib.json", "w", encoding="utf-8") as f:
+        json.dump([{"id": "2", "name": "Extra", "path": "E:/extra.exe"}], f)
+
+
+def wait_online(db, name, timeout=5.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if all(s["status"] == ONLINE for s in db.library_status() if s["name"] == name):
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_cache_hit_opens_shards_on_the_pool(monkeypatch):
+    write_libraries()
+    Database(libraries=LIBRARIES).close()
+    assert os.path.exists(Database.DB_FILE + ".cache")
+    
+    opened = []
+    gate = threading.Event()
+    original = LibraryShard.open
+    
+    def slow_open(shard):
+        opened.append(threading.current_thread().name)
+        gate.wait(5)
+        return original(shard)
+    
+    monkeypatch.setattr(LibraryShard, "open", slow_open)
+    db = Database(libraries=LIBRARIES)
+    try:
+        assert {g["id"] for g in db.get_all_games()} == {"1", "2"}
+        # Edited while its drive is still being opened
+        assert db.update_game("2", {"name": "Renamed"})
+        gate.set()
+        assert wait_online(db, "Extra")
+        assert opened and all(name.startswith("shard-loader") for name in opened)
+        db.flush()
+        with open("extra/lib.json", encoding="utf-8") as f:
+            assert "Renamed" in f.read()
+    finally:
+        gate.set()
+        db.close()
+
+
+def test_writes_only_stat_the_shard_written(monkeypatch):
+    write_libraries()
+    db = Database(libraries=LIBRARIES)
+    try:
+        stated = []
+        original = core.database.file_stats
+        monkeypatch.setattr(core.database, "file_stats",
+                            lambda paths: stated.extend(paths) or original(paths))
+        assert db.update_game("1", {"name": "Main edited"})
+        assert stated and not any("extra" in path for path in stated)
+        
+        # Only the reported files are looked at for external edits
+        stated.clear()
+        assert db.check_external([os.path.abspath("games.json")]) is None
+        assert not any("extra" in path for path in stated)
+        
+        with open("extra/lib.json", "w", encoding="utf-8") as f:
+            json.dump([{"id": "2", "name": "Edited elsewhere", "path": "E:/extra.exe"}], f)
+        diff = db.check_external([os.path.abspath("extra")])
+        assert diff is not None and diff.changed == {"2": {"name"}}
+    finally:
+        db.close()
\ No newline at end of file
@@ -0,0 +1,70 @@
+"""
+Binary snapshot cache validation
+"""
+
+import json
+import os
+
+from core.record import GameRecord
+from core.storage import SnapshotCache
+
+HOUR_NS = 3600 * 1_000_000_000
+
+
+def write_library(names):
+    with open("games.json", "w", encoding="utf-8") as f:
+        json.dump([{"id": str(i), "name": name, "path": f"C:/{i}.exe"}
+                   for i, name in enumerate(names)], f)
+
+
+def snapshot(names):
+    cache = SnapshotCache("games.json.cache", ["games.json"])
+    cache.mark_synced()
+    records = [GameRecord.with_defaults({"id": str(i), "name": name, "path": f"C:/{i}.exe"})
+               for i, name in enumerate(names)]
+    assert cache.save(records)
+    return cache
+
+
+def age(path, ns=HOUR_NS):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns - ns, stat.st_mtime_ns - ns))
+
+
+def test_settled_sources_are_trusted_by_stats_alone(monkeypatch):
+    write_library(["Alpha", "Beta"])
+    age("games.json")
+    snapshot(["Alpha", "Beta"])
+    
+    hashed = []
+    original = SnapshotCache._hash
+    monkeypatch.setattr(SnapshotCache, "_hash", staticmethod(lambda path: hashed.append(path) or original(path)))
+    records = SnapshotCache("games.json.cache", ["games.json"]).load()
+    assert [r["name"] for r in records] == ["Alpha", "Beta"]
+    assert hashed == []
+    
+    # Any edit moves the mtime or the size
+    write_library(["Alpha", "Gamma"])
+    assert SnapshotCache("games.json.cache", ["games.json"]).load() is None
+
+
+def test_recently_modified_sources_are_hashed():
+    write_library(["Alpha", "Beta"])
+    snapshot(["Alpha", "Beta"])
+    stat = os.stat("games.json")
+    
+    # Same size and mtime, as a second edit within a coarse timestamp tick
+    write_library(["Alpha", "Bota"])
+    os.utime("games.json", ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert SnapshotCache("games.json.cache", ["games.json"]).load() is None
+    
+    write_library(["Alpha", "Beta"])
+    os.utime("games.json", ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert SnapshotCache("games.json.cache", ["games.json"]).load() is not None
+
+
+def test_missing_sources_invalidate_the_snapshot():
+    write_library(["Alpha"])
+    snapshot(["Alpha"])
+    os.remove("games.json")
+    assert SnapshotCache("games.json.cache", ["games.json"]).load() is None
\ No newline at end of file
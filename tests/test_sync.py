@@ -0,0 +1,160 @@
+"""
+Library sync between two launchers over a loopback socket
+"""
+
+import json
+import sqlite3
+
+import pytest
+
+from core.database import Database
+from core.sync import SyncState
+
+KEY = "segredo"
+
+
+def game(game_id, **fields):
+    return dict({"id": game_id, "name": f"Game {game_id}", "path": f"C:/{game_id}.exe"}, **fields)
+
+
+@pytest.fixture
+def launchers(workdir):
+    """Two launchers started from the same games.json, the first one serving"""
+    games = [game("1", playtime=100, tags=["rpg"]), game("2"), game("3")]
+    opened = []
+    
+    def open_db(name):
+        folder = workdir / name
+        folder.mkdir(exist_ok=True)
+        if not (folder / "games.json").exists():
+            (folder / "games.json").write_text(json.dumps(games), encoding="utf-8")
+        paths = {attr: str(folder / file) for attr, file in (
+            ("DB_FILE", "games.json"), ("SQLITE_FILE", "games.db"), ("SESSIONS_FILE", "sessions.db"),
+            ("DETAILS_FILE", "details.db"), ("SYNC_FILE", "sync.db"))}
+        db = type(name, (Database,), paths)(sync=True)
+        opened.append(db)
+        return db
+    
+    def start():
+        desk, hand = open_db("desk"), open_db("hand")
+        assert desk.sync.serve(0, key=KEY)
+        return desk, hand
+    
+    yield start
+    for db in opened:
+        db.close()
+
+
+def sync(desk, hand, key=KEY):
+    report = hand.sync.sync_with("127.0.0.1", desk.sync.port, key)
+    assert report.ok, report.error
+    return report
+
+
+def playtime(db, game_id):
+    return db.get_game_by_id(game_id)["playtime"]
+
+
+def test_playtime_and_edits_reach_both_sides(launchers):
+    desk, hand = launchers()
+    sync(desk, hand)
+    assert playtime(desk, "1") == playtime(hand, "1") == 100
+    
+    desk.update_playtime("1", 50)
+    hand.update_playtime("1", 30)
+    hand.update_game("3", {"name": "Renamed"})
+    desk.add_game(game("4"))
+    desk.remove_game("2")
+    sync(desk, hand)
+    for db in (desk, hand):
+        assert playtime(db, "1") == 180
+        assert db.get_game_by_id("3")["name"] == "Renamed"
+        assert db.get_game_by_id("4") is not None
+        assert db.get_game_by_id("2") is None
+    
+    # Nothing changed, nothing sent
+    report = sync(desk, hand)
+    assert report.sent == report.received == 0
+
+
+def test_concurrent_edits_keep_fields_only_one_side_changed(launchers):
+    desk, hand = launchers()
+    sync(desk, hand)
+    
+    desk.update_game("1", {"notes": "hi", "tags": []})
+    hand.update_game("1", {"name": "Mão", "favorite": True})
+    hand.update_game("3", {"name": "Hand"})
+    desk.update_game("3", {"name": "Desk", "tags": ["a"]})
+    hand.update_game("3", {"tags": ["b"]})
+    report = sync(desk, hand)
+    assert report.conflicts == 2
+    
+    for db in (desk, hand):
+        first = db.get_game_by_id("1")
+        assert first["name"] == "Mão" and first["favorite"] and first["tags"] == []
+        assert db.get_details("1")["notes"] == "hi"
+        # Changed on both sides: one name is kept, tags are combined
+        third = db.get_game_by_id("3")
+        assert third["name"] in ("Hand", "Desk")
+        assert sorted(third["tags"]) == ["a", "b"]
+    assert desk.get_game_by_id("3")["name"] == hand.get_game_by_id("3")["name"]
+    
+    report = sync(desk, hand)
+    assert report.sent == report.received == 0
+    
+    # Clearing a cold field on one side is an edit too
+    hand.update_game("1", {"notes": ""})
+    desk.update_game("1", {"favorite": False})
+    sync(desk, hand)
+    for db in (desk, hand):
+        assert db.get_details("1")["notes"] == ""
+        assert not db.get_game_by_id("1")["favorite"]
+
+
+def test_sessions_need_the_same_key(launchers):
+    desk, hand = launchers()
+    assert desk.sync._server.getsockname()[0] == "127.0.0.1"
+    hand.update_game("1", {"name": "Não enviado"})
+    
+    report = hand.sync.sync_with("127.0.0.1", desk.sync.port, "outra")
+    assert not report.ok
+    report = hand.sync.sync_with("127.0.0.1", desk.sync.port, "")
+    assert not report.ok
+    assert desk.get_game_by_id("1")["name"] == "Game 1"
+    
+    desk.sync.stop()
+    assert not desk.sync.serve(0, key="")
+    assert desk.sync.port is None
+
+
+def test_state_survives_restart(launchers):
+    desk, hand = launchers()
+    sync(desk, hand)
+    desk.close()
+    hand.close()
+    
+    desk, hand = launchers()
+    hand.update_playtime("2", 5)
+    report = sync(desk, hand)
+    assert report.sent == 1 and report.received == 0
+    assert playtime(desk, "2") == 5
+
+
+def test_old_sync_state_gets_field_bases(workdir):
+    conn = sqlite3.connect("sync.db")
+    with conn:
+        conn.execute(
+            "CREATE TABLE records (id TEXT PRIMARY KEY, seq INTEGER NOT NULL, versions TEXT NOT NULL, "
+            "counters TEXT NOT NULL, digest TEXT, playtime INTEGER NOT NULL DEFAULT 0, "
+            "origin TEXT NOT NULL, deleted INTEGER NOT NULL DEFAULT 0)"
+        )
+        conn.execute("INSERT INTO records VALUES ('1', 1, '{\"a\": 1}', '{}', 'x', 0, 'a', 0)")
+    conn.close()
+    
+    state = SyncState("sync.db")
+    row = state.rows(["1"])["1"]
+    assert row["base"] == {} and row["versions"] == {"a": 1}
+    row["base"] = {"name": "y"}
+    state.save([row])
+    assert state.rows(["1"])["1"]["base"] == {"name": "y"}
+    state.close()
\ No newline at end of file
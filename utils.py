@@ -3,8 +3,9 @@ Utility functions for GxLauncher
 """
 
 import os
+import re
 import subprocess
-from typing import Optional
+from typing import Optional, Tuple
 
 try:
     import win32com.client
@@ -28,6 +29,22 @@ def resolve_shortcut(path: str) -> str:
         print(f"Error resolving shortcut: {e}")
         return path
 
+def normalize_path(path: str) -> str:
+    """Normalize a game path for duplicate detection and lookups"""
+    if not path:
+        return ""
+    
+    resolved = resolve_shortcut(path).replace('\\', '/')
+    return os.path.normpath(resolved).replace('\\', '/').casefold()
+
+_DIGITS = re.compile(r'(\d+)')
+
+def natural_key(text: str) -> Tuple:
+    """Case-folded collation key that orders numbers by value ("Game 2" < "Game 10")"""
+    parts = _DIGITS.split(text.casefold())
+    # Even positions are text and odd positions are numbers, so tuples always compare
+    return tuple(int(part) if i % 2 else part for i, part in enumerate(parts))
+
 def format_playtime(seconds: int) -> str:
     """Format playtime seconds into readable string"""
     if seconds < 60:
@@ -0,0 +1,83 @@
+"""
+File watcher for GxLauncher
+Notices when another program edits the library or config files
+"""
+
+import os
+from typing import List, Set
+from PyQt6.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+from core.database import Database
+from core.config import Config
+
+class LibraryWatcher(QObject):
+    """Watches games.json (and its journal) and config.json for external edits
+    
+    Notifications are debounced, then Database.check_external() and
+    Config.reload() work out what actually changed; our own writes are
+    recognized there and produce no signal.
+    """
+    
+    # LibraryDiff, possibly found by the background writer
+    library_changed = pyqtSignal(object)
+    # Set of changed config keys
+    config_changed = pyqtSignal(object)
+    # A library shard came online or went offline after loading
+    shards_changed = pyqtSignal()
+    
+    DEBOUNCE_MS = 300
+    
+    def __init__(self, db: Database, config: Config, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.config = config
+        self._files = [os.path.abspath(p) for p in db.storage.source_files()]
+        self._files.append(os.path.abspath(config.CONFIG_FILE))
+        # Paths reported since the last check, only their files are looked at
+        self._changed: Set[str] = set()
+        
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(self.DEBOUNCE_MS)
+        self._timer.timeout.connect(self.check)
+        
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.fileChanged.connect(self._on_changed)
+        self._watcher.directoryChanged.connect(self._on_changed)
+        self._watch()
+        
+        # Emitting is safe from any thread, the slots run on the UI thread
+        db.on_external_change = self.library_changed.emit
+        db.on_shard_change = self.shards_changed.emit
+    
+    def _watch(self):
+        """(Re)add watched paths, atomic replaces drop files from the watch list"""
+        watched = set(self._watcher.files()) | set(self._watcher.directories())
+        wanted: List[str] = [p for p in self._files if os.path.exists(p)]
+        # Directories tell us when a file is created or replaced, offline drives are skipped
+        wanted += sorted({os.path.dirname(p) for p in self._files if os.path.isdir(os.path.dirname(p))})
+        missing = [p for p in wanted if p not in watched]
+        if missing:
+            self._watcher.addPaths(missing)
+    
+    def _on_changed(self, path):
+        self._changed.add(os.path.abspath(path))
+        self._timer.start()
+    
+    def check(self):
+        """Look for external changes now, in every file unless the watcher reported some"""
+        self._watch()
+        keys = self.config.reload()
+        if keys:
+            self.config_changed.emit(keys)
+        paths, self._changed = self._changed, set()
+        # Reports through library_changed via db.on_external_change
+        self.db.check_external(paths or None)
+    
+    def stop(self):
+        """Stop watching"""
+        self._timer.stop()
+        self.db.on_external_change = None
+        self.db.on_shard_change = None
+        paths = self._watcher.files() + self._watcher.directories()
+        if paths:
+            self._watcher.removePaths(paths)
\ No newline at end of file
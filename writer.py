@@ -0,0 +1,132 @@
+"""
+Background writer for GxLauncher
+Coalesces database writes on a dedicated thread
+"""
+
+import threading
+import time
+from typing import Callable, List, Optional, Dict, Any
+from core.storage import Change
+
+class BackgroundWriter:
+    """Debounced write-behind queue for the game database
+    
+    Mutations only mark the store dirty. Once no new mutation has arrived
+    for quiet_period seconds (or max_delay has passed since the first
+    one) all pending changes are handed to write_func in one call.
+    """
+    
+    def __init__(self, write_func: Callable[[Optional[List[Change]]], bool],
+                 quiet_period: float = 0.5, max_delay: float = 5.0):
+        self.write_func = write_func
+        self.quiet_period = quiet_period
+        self.max_delay = max_delay
+        
+        self._cond = threading.Condition()
+        self._changes: List[Change] = []
+        self._full = False
+        self._dirty = False
+        self._first_mark = 0.0
+        self._last_mark = 0.0
+        self._flush_requested = False
+        self._stopping = False
+        self._busy = False
+        
+        # Metrics
+        self.pending_writes = 0
+        self.writes_completed = 0
+        self.last_write_duration = 0.0
+        self.last_write_ok = True
+        
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+    
+    def submit(self, changes: Optional[List[Change]] = None) -> None:
+        """Queue changes for writing, None means rewrite everything"""
+        with self._cond:
+            if changes is None:
+                # A full write covers every queued change
+                self._full = True
+                self._changes = []
+            elif not self._full:
+                self._changes.extend(changes)
+            
+            now = time.monotonic()
+            if not self._dirty:
+                self._first_mark = now
+            self._dirty = True
+            self._last_mark = now
+            self.pending_writes += 1
+            self._cond.notify_all()
+    
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._dirty and not self._stopping:
+                    self._cond.wait()
+                if not self._dirty:
+                    return
+                
+                # Wait for a quiet period so bursts become one write
+                while not self._flush_requested and not self._stopping:
+                    deadline = min(self._last_mark + self.quiet_period,
+                                   self._first_mark + self.max_delay)
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                
+                changes = None if self._full else self._changes
+                self._changes = []
+                self._full = False
+                self._dirty = False
+                self._flush_requested = False
+                self._busy = True
+                self.pending_writes = 0
+            
+            start = time.perf_counter()
+            try:
+                ok = self.write_func(changes)
+            except Exception as e:
+                print(f"Error in background write: {e}")
+                ok = False
+            
+            with self._cond:
+                self.last_write_duration = time.perf_counter() - start
+                self.last_write_ok = ok
+                self.writes_completed += 1
+                self._busy = False
+                self._cond.notify_all()
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Write pending changes now and wait until they are on disk"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._flush_requested = self._dirty
+            self._cond.notify_all()
+            while self._dirty or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return self.last_write_ok
+    
+    def stop(self, timeout: Optional[float] = None) -> bool:
+        """Flush pending changes and stop the writer thread"""
+        ok = self.flush(timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        return ok
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Get writer statistics"""
+        with self._cond:
+            return {
+                "pending_writes": self.pending_writes,
+                "writes_completed": self.writes_completed,
+                "last_write_duration": self.last_write_duration,
+                "last_write_ok": self.last_write_ok,
+                "busy": self._busy
+            }
\ No newline at end of file